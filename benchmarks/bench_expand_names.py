@@ -0,0 +1,82 @@
+"""Micro-benchmark of expand_names against the original, uncompiled implementation.
+
+Run from the repository root:
+
+    python benchmarks/bench_expand_names.py
+"""
+
+import logging
+import random
+import re
+import sys
+import timeit
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from survivalist_gamedata.common import NameExpander
+from survivalist_gamedata.config import load_config
+
+log = logging.getLogger(__name__)
+
+
+def expand_names_reference(text: str, replacements: dict[str, str]) -> str:
+    text = re.sub(r'[a-z][A-Z]', lambda x: x.group(0)[0] + ' ' + x.group(0)[1], text)
+    text = re.sub(r'_([a-zA-Z0-9 ]+)', lambda x: f' ({x.group(1)})', text)
+    for orig, repl in replacements.items():
+        text = text.replace(orig, repl)
+    return text
+
+
+def make_cells(n: int) -> list[str]:
+    """Make table cells with as many repeated values as a typical run has."""
+    rnd = random.Random(42)
+    values = ['Cooking', 'Construction', 'Medicine', 'Campfire', 'Workbench', 'Inventory']
+    values += ['CookedMeat_Large', 'SharpObject', 'BluntObject', '4:Clothing/Hats', '12']
+    values += ['Common at Farmhouse, PoliceStation\nRare at Hospital', 'WaterBottle (3)']
+    values += ['5:Food/Dishes', '0.5 / FlOz', 'Very Rare at GasStation', 'IronIngot (2)']
+    values += [f'CraftedThing{i}_Mk{i % 4}' for i in range(200)]
+    return [rnd.choice(values) for _ in range(n)]
+
+
+def bench(name: str, replacements: dict[str, str], cells: list[str]) -> None:
+    expected = [expand_names_reference(c, replacements) for c in cells]
+
+    expander = NameExpander(replacements)
+    assert [expander.expand(c) for c in cells] == expected  # noqa: S101
+
+    t_ref = min(
+        timeit.repeat(lambda: [expand_names_reference(c, replacements) for c in cells],
+                      number=1,
+                      repeat=5))
+
+    def run_cold() -> list[str]:
+        cold_expander = NameExpander(replacements)
+        return [cold_expander.expand(c) for c in cells]
+
+    t_new = min(timeit.repeat(run_cold, number=1, repeat=5))
+    no_memo = NameExpander(replacements, maxsize=0)
+    t_no_memo = min(
+        timeit.repeat(lambda: [no_memo.expand(c) for c in cells], number=1, repeat=5))
+    t_warm = min(
+        timeit.repeat(lambda: [expander.expand(c) for c in cells], number=1, repeat=5))
+
+    log.info('%s (single pass: %s)', name, expander.single_pass)
+    log.info('  reference         %8.2f ms', t_ref * 1000)
+    for label, t in [('no memo', t_no_memo), ('cold', t_new), ('warm', t_warm)]:
+        log.info('  compiled, %-7s %8.2f ms  (%.1fx)', label, t * 1000, t_ref / t)
+
+
+def main() -> None:
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+    cells = make_cells(100_000)
+    # the replacements of config_default.yaml
+    conf = load_config(config_file=Path(__file__).parent.parent / 'survivalist_gamedata' /
+                       'config_default.yaml')
+    bench('default replacements', dict(conf.replacements), cells)
+    no_empty = {k: v for k, v in conf.replacements.items() if v}
+    bench('replacements without deletions', no_empty, cells)
+
+
+if __name__ == '__main__':
+    main()
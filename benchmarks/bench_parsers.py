@@ -0,0 +1,95 @@
+"""Micro-benchmark of the XML parser backends, with and without filtering fields.
+
+Parses the item and recipe files of a synthetic game data tree with each backend
+that is installed, checks that they give the same documents as xmltodict, and
+prints the time taken. Run from the repository root:
+
+    python benchmarks/bench_parsers.py --items 5000 --recipes 5000
+"""
+
+import argparse
+import logging
+import sys
+import tempfile
+import timeit
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from gamedata import generate
+
+from survivalist_gamedata.common import ExtractsError
+from survivalist_gamedata.config import load_config, use_config
+from survivalist_gamedata.items import item_files, item_parser
+from survivalist_gamedata.parsers import BACKENDS
+from survivalist_gamedata.recipes import recipe_files, recipe_parser
+
+log = logging.getLogger(__name__)
+
+
+def bench(game_dir: Path, repeat: int) -> None:
+    # the files are read once, to time the parsing only
+    base_dir = f'{game_dir.as_posix()}/'
+    conf = load_config(overrides={'base_dir': base_dir})
+    with use_config(conf):
+        data = {
+            'items': [path.read_bytes() for path in item_files()],
+            'recipes': [path.read_bytes() for path in recipe_files()],
+        }
+    log.info('%s item files, %s recipe files', len(data['items']), len(data['recipes']))
+    log.info('%-12s%-10s%10s%12s%9s', 'backend', 'fields', 'items ms', 'recipes ms',
+             'speedup')
+
+    reference: dict[tuple[str, bool], list] = {}
+    t_ref: dict[str, float] = {}
+    for filter_fields in (False, True):
+        for backend in BACKENDS:
+            parser_conf = {'backend': backend, 'filter_fields': filter_fields}
+            conf = load_config(overrides={'base_dir': base_dir, 'parser': parser_conf})
+            with use_config(conf):
+                try:
+                    parsers = {'items': item_parser(), 'recipes': recipe_parser()}
+                except ExtractsError as err:
+                    log.info('%-12sskipped: %s', backend, err)
+                    continue
+
+            times = {}
+            for name, parser in parsers.items():
+                docs = [parser.parse(doc) for doc in data[name]]
+                expected = reference.setdefault((name, filter_fields), docs)
+                assert docs == expected, f'{backend} parses {name} differently'  # noqa: S101
+                times[name] = min(
+                    timeit.repeat(lambda p=parser, n=name: [p.parse(d) for d in data[n]],
+                                  number=1,
+                                  repeat=repeat))
+
+            total = times['items'] + times['recipes']
+            base = t_ref.setdefault('total', total)
+            fields = 'used' if filter_fields else 'all'
+            log.info('%-12s%-10s%10.1f%12.1f%8.1fx', backend, fields,
+                     times['items'] * 1000, times['recipes'] * 1000, base / total)
+
+
+def main() -> None:
+    # only the results, and warnings of the pipelines
+    logging.basicConfig(format='%(message)s')
+    log.setLevel(logging.INFO)
+    argp = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    argp.add_argument('--items', type=int, default=2000, help='number of equipment files')
+    argp.add_argument('--liquids', type=int, default=100, help='number of liquid files')
+    argp.add_argument('--recipes', type=int, default=2000, help='number of recipes')
+    argp.add_argument('--seed', type=int, default=0, help='random seed for the data')
+    argp.add_argument('--repeat', type=int, default=3, help='timing runs per backend')
+    args = argp.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix='survivalist-bench-') as tmp_dir:
+        game_dir = generate(Path(tmp_dir) / 'game',
+                            n_items=args.items,
+                            n_liquids=args.liquids,
+                            n_recipes=args.recipes,
+                            seed=args.seed)
+        bench(game_dir, args.repeat)
+
+
+if __name__ == '__main__':
+    main()
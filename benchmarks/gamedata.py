@@ -0,0 +1,192 @@
+"""Generate synthetic game data trees for benchmarking.
+
+The generated files follow the layout of the game's StreamingAssets directory, and
+cover the single-vs-list cases the extractor handles, such as a single LootableFrom,
+Ingredient or GiftFor entry versus several of them.
+"""
+
+import random
+from pathlib import Path
+
+GAMEDATA_DIRS = ['BaseStory', 'Common', 'Sandbox', 'MainStory']
+
+CATEGORIES = ['1:Valuables', '2:Weapons/Ammo', '2:Weapons/Melee', '2:Weapons/Ranged']
+CATEGORIES += ['2:Weapons/Throwable', '3:Medical', '4:Clothing/Hats']
+CATEGORIES += ['4:Clothing/Backpacks', '5:Food/Dishes', '5:Food/Seeds', '6:Crafting']
+CATEGORIES += ['7:Containers', '8:Books', '9:Special']
+SCARCITIES = ['Common', 'Uncommon', 'Rare', 'Very Rare', 'Legendary']
+LOCATIONS = ['Farmhouse', 'PoliceStation', 'Hospital', 'GasStation', 'ArmyBase', 'Shack']
+SKILL_TYPES = ['Cooking', 'Construction', 'Medicine']
+RECIPE_TYPES = ['Inventory', 'Toolbox', 'Shovel', 'Workbench', 'Forge', 'Kiln', 'Nitrary']
+RECIPE_TYPES += ['Still', 'Campfire_SpitRoast', 'Stove', '']
+
+_XML_HEADER = '<?xml version="1.0" encoding="utf-8"?>\n'
+_XMLNS = ('xmlns:xsd="http://www.w3.org/2001/XMLSchema" '
+          'xmlns:xsi="http://www.w3.org/2001/XMLSchema-instance"')
+
+
+def _strings(tag: str, child: str, values: list[str]) -> str:
+    return f'<{tag}>' + ''.join(f'<{child}>{v}</{child}>' for v in values) + f'</{tag}>'
+
+
+def _equipment(rnd: random.Random, i: int) -> str:
+    cat = rnd.choice(CATEGORIES)
+    parts = [
+        f'<NativeName>Item{i}Thing_Mk{i % 3}</NativeName>',
+        f'<NativeDescription>A synthetic item number {i}. ' + 'Lorem ipsum. ' * 8 +
+        '</NativeDescription>',
+        f'<Category>{cat}</Category>',
+        f'<Weight>{rnd.uniform(0.01, 20):.2f}</Weight>',
+        f'<BasePrice>{rnd.randint(1, 500)}</BasePrice>',
+        f'<Scarcity>{rnd.choice(SCARCITIES)}</Scarcity>',
+        f'<TypicalLootAmount>{rnd.randint(1, 5)}</TypicalLootAmount>',
+        '<ColorVariations>' + '<Color><r>0.5</r><g>0.5</g><b>0.5</b></Color>' * 4 +
+        '</ColorVariations>',
+    ]
+
+    # zero, one or several loot locations
+    loot = []
+    for _ in range(rnd.choice([0, 1, 1, 2, 3])):
+        override = ''
+        if rnd.random() < 0.3:  # noqa: PLR2004
+            override = f'<OverrideScarcity>{rnd.choice(SCARCITIES)}</OverrideScarcity>'
+        loot.append(f'<LootableFrom><Name>{rnd.choice(LOCATIONS)}</Name>{override}'
+                    '</LootableFrom>')
+    if loot:
+        parts.append(f"<LootableFromLocations>{''.join(loot)}</LootableFromLocations>")
+
+    # empty, single and list values of the lists that are flattened
+    for tag, child in (('GiftFor', 'string'), ('BadGiftFor', 'string'),
+                       ('FoodForAnimal', 'BaseObjectType'), ('AmmoTypes', 'string')):
+        roll = rnd.random()
+        if roll < 0.1:  # noqa: PLR2004
+            parts.append(f'<{tag} />')
+        elif roll < 0.3:  # noqa: PLR2004
+            values = [f'{child}{n}' for n in range(rnd.randint(1, 3))]
+            parts.append(_strings(tag, child, values))
+
+    if cat.startswith('2:Weapons'):
+        parts += [
+            f'<Damage>{rnd.randint(1, 80)}</Damage>',
+            (f'<DamageBonusPerSkillLevel>{rnd.uniform(0, 2):.2f}'
+             '</DamageBonusPerSkillLevel>'),
+            f'<Range>{rnd.randint(1, 100)}</Range>',
+            '<RangeBonusPerSkillLevel>1</RangeBonusPerSkillLevel>',
+            f'<AccurateRange>{rnd.randint(1, 50)}</AccurateRange>',
+            '<AccurateRangeBonusPerSkillLevel>0.5</AccurateRangeBonusPerSkillLevel>',
+            '<InjuryType>SharpObject</InjuryType>',
+        ]
+    elif cat.startswith('4:Clothing'):
+        parts += [
+            f'<CarryWeight>{rnd.randint(10, 60)}</CarryWeight>',
+            '<CarryWeightBonusPerSkillLevel>2</CarryWeightBonusPerSkillLevel>',
+            f'<SkillBonus>{rnd.randint(1, 3)}</SkillBonus>',
+            '<SkillBonusType>Strength</SkillBonusType>',
+        ]
+    elif cat.startswith('5:Food'):
+        parts += [
+            f'<Nutrition>{rnd.randint(10, 800)}</Nutrition>',
+            f'<Tastiness>{rnd.randint(-2, 3)}</Tastiness>',
+            '<SkillOnConsumptionProgression>0.1</SkillOnConsumptionProgression>',
+            '<SkillOnConsumptionType>Cooking</SkillOnConsumptionType>',
+        ]
+
+    return (f'{_XML_HEADER}<EquipmentPrototype {_XMLNS}>' + ''.join(parts) +
+            '</EquipmentPrototype>')
+
+
+def _liquid(rnd: random.Random, i: int) -> str:
+    name = f'<NativeName>Liquid{i}</NativeName>' if i % 50 else ''  # like Kerosene.xml
+    return (f'{_XML_HEADER}<LiquidPrototype {_XMLNS}>{name}'
+            f'<Category>{rnd.choice(["5:Food/Drink", "6:Crafting"])}</Category>'
+            f'<BasePricePerFlOz>{rnd.uniform(0, 2):.2f}</BasePricePerFlOz>'
+            f'<NutritionPerFlOz>{rnd.randint(0, 20)}</NutritionPerFlOz>'
+            '<SkillOnConsumptionProgressionPerFlOz>0.2'
+            '</SkillOnConsumptionProgressionPerFlOz>'
+            '<SkillOnConsumptionType>Medicine</SkillOnConsumptionType>'
+            '</LiquidPrototype>')
+
+
+def _recipe(rnd: random.Random, uid: str, n_items: int, n_liquids: int) -> str:
+    parts = [
+        f'<UniqueID>{uid}</UniqueID>',
+        f'<NativeName>{uid}Name</NativeName>',
+        f'<SkillType>{rnd.choice(SKILL_TYPES)}</SkillType>',
+        f'<CraftingTime>{rnd.randint(1, 120)}</CraftingTime>',
+        f'<SkillProgression>{rnd.uniform(0, 1):.2f}</SkillProgression>',
+    ]
+    recipe_type = rnd.choice(RECIPE_TYPES)
+    if recipe_type:
+        parts.append(f'<RecipeType>{recipe_type}</RecipeType>')
+    if rnd.random() < 0.8:  # noqa: PLR2004
+        parts.append(f'<SkillLevel>{rnd.randint(0, 15)}</SkillLevel>')
+
+    # no, a single or several ingredients
+    ingredients = []
+    for _ in range(rnd.choice([0, 1, 1, 2, 3, 4])):
+        if n_liquids and rnd.random() < 0.25:  # noqa: PLR2004
+            ingredients.append(
+                '<Ingredient><LiquidTypeNames><string>'
+                f'Liquid{rnd.randrange(n_liquids)}</string></LiquidTypeNames>'
+                f'<LiquidAmount>{rnd.randint(1, 16)}</LiquidAmount>'
+                '</Ingredient>')
+        else:
+            ingredients.append('<Ingredient><PrototypeNames><string>'
+                               f'Item{rnd.randrange(n_items)}Thing_Mk0</string>'
+                               f'</PrototypeNames><Amount>{rnd.randint(1, 5)}</Amount>'
+                               '</Ingredient>')
+    parts.append('<Ingredients>' + ''.join(ingredients) +
+                 '</Ingredients>' if ingredients else '<Ingredients />')
+
+    roll = rnd.random()
+    if roll < 0.6:  # noqa: PLR2004
+        parts.append(f'<ProductPrototypeName>Item{rnd.randrange(n_items)}Thing_Mk0'
+                     f'</ProductPrototypeName><ProductAmount>{rnd.randint(1, 3)}'
+                     '</ProductAmount>')
+    elif roll < 0.8 and n_liquids:  # noqa: PLR2004
+        parts.append('<ProductLiquidPrototypeName>'
+                     f'Liquid{rnd.randrange(n_liquids)}</ProductLiquidPrototypeName>'
+                     '<ProductLiquidAmount>8</ProductLiquidAmount>'
+                     '<ProductLiquidNutritionMultiplier>1.5'
+                     '</ProductLiquidNutritionMultiplier>')
+    elif roll < 0.98:  # noqa: PLR2004
+        parts.append('<ProductType>Campfire</ProductType>')
+    if rnd.random() < 0.05:  # noqa: PLR2004
+        parts.append('<Deprecated>true</Deprecated>')
+
+    return '<Recipe>' + ''.join(parts) + '</Recipe>'
+
+
+def generate(root: Path,
+             *,
+             n_items: int = 1000,
+             n_liquids: int = 50,
+             n_recipes: int = 1000,
+             seed: int = 0,
+             version: str = 'v999 benchmark') -> Path:
+    """Write a synthetic game data tree to root and return root."""
+    rnd = random.Random(seed)
+
+    for gamedata_dir in GAMEDATA_DIRS:
+        (root / gamedata_dir / 'Equipment').mkdir(parents=True, exist_ok=True)
+        (root / gamedata_dir / 'Liquid').mkdir(parents=True, exist_ok=True)
+    (root / GAMEDATA_DIRS[0] / 'Version.txt').write_text(f'{version}\n')
+
+    for i in range(n_items):
+        gamedata_dir = root / rnd.choice(GAMEDATA_DIRS)
+        (gamedata_dir / 'Equipment' / f'Item{i}.xml').write_text(_equipment(rnd, i))
+    for i in range(n_liquids):
+        gamedata_dir = root / rnd.choice(GAMEDATA_DIRS)
+        (gamedata_dir / 'Liquid' / f'Liquid{i}.xml').write_text(_liquid(rnd, i))
+
+    # most recipes in the first directory, and a file with a single recipe
+    per_dir = [n_recipes - 1, 1] if n_recipes > 1 else [n_recipes]
+    for gamedata_dir, cnt in zip(GAMEDATA_DIRS, per_dir, strict=False):
+        recipes = ''.join(
+            _recipe(rnd, f'{gamedata_dir}Recipe{i}', max(n_items, 1), n_liquids)
+            for i in range(cnt))
+        (root / gamedata_dir / 'Recipes.xml').write_text(
+            f'{_XML_HEADER}<RecipeList {_XMLNS}>'
+            f'<Recipes>{recipes}</Recipes></RecipeList>')
+
+    return root
@@ -0,0 +1,215 @@
+"""Time each stage of the recipes and items pipelines on synthetic game data.
+
+Run from the repository root, for example:
+
+    python benchmarks/run_benchmarks.py --items 5000 --recipes 5000 --output new.json
+    python benchmarks/run_benchmarks.py --compare old.json --output new.json
+
+Results are written as JSON so that runs on different commits can be compared.
+"""
+
+import argparse
+import importlib
+import json
+import logging
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from collections.abc import Callable
+from pathlib import Path
+from types import ModuleType
+from typing import Any
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from gamedata import generate
+
+log = logging.getLogger(__name__)
+
+
+def _git_commit() -> str:
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'],  # noqa: S607
+            capture_output=True,
+            text=True,
+            check=True,
+            cwd=Path(__file__).parent).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+
+def _measure(func: Callable[[], Any], *, trace: bool) -> tuple[Any, float, int]:
+    if trace:
+        tracemalloc.reset_peak()
+        base = tracemalloc.get_traced_memory()[0]
+    start = time.perf_counter()
+    result = func()
+    elapsed = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1] - base if trace else 0
+    return result, elapsed, peak
+
+
+def _sort(rows: Any) -> Any:  # noqa: ANN401
+    # the processed rows are sorted by their precomputed sort keys
+    rows.sort()
+    return rows
+
+
+def _run_pipeline(mod: ModuleType, name: str, version: str, *, trace: bool) -> dict:
+    """Run the stages of a pipeline once, returning the time and memory per stage."""
+    common = importlib.import_module('survivalist_gamedata.common')
+    conf = importlib.import_module('survivalist_gamedata.config').get_conf()
+    # start with an empty expand_names memo, like a fresh run
+    common._expander = None  # noqa: SLF001
+    common._name_expander.cache_clear()  # noqa: SLF001
+
+    if name == 'recipes':
+        section = conf.recipes
+        stages = [
+            ('load', lambda _: mod.load_recipes()),
+            ('process', mod.process_recipes),
+            ('sort', _sort),
+            ('csv', lambda rows: mod.save_recipes_as_csv(rows, csv_file)),
+            ('steamml', lambda rows: mod.save_recipes_as_steamml(rows, steam_file)),
+        ]
+    else:
+        section = conf.game_items
+        stages = [
+            ('load', lambda _: mod.load_items()),
+            ('process', mod.process_items),
+            ('sort', _sort),
+            ('csv', lambda rows: mod.save_items_as_csv(rows, csv_file)),
+            ('steamml', lambda rows: mod.save_items_as_steamml(rows, steam_file)),
+        ]
+    csv_file = section.csv_file.format(version=version)
+    steam_file = section.steam_file.format(version=version)
+
+    results = {}
+    rows: Any = None
+    for stage, func in stages:
+        rows_in = len(rows) if isinstance(rows, list) else 0
+        result, elapsed, peak = _measure(lambda f=func, r=rows: f(r), trace=trace)
+        if stage in ('load', 'process', 'sort'):
+            rows = result
+        bytes_out = 0
+        if stage == 'csv':
+            bytes_out = Path(csv_file).stat().st_size
+        elif stage == 'steamml':
+            bytes_out = Path(steam_file).stat().st_size
+        results[f'{name}.{stage}'] = {
+            'seconds': elapsed,
+            'peak_bytes': peak,
+            'rows_in': rows_in,
+            'rows_out': len(rows),
+            'bytes_out': bytes_out,
+        }
+    return results
+
+
+def _run_stages(args: argparse.Namespace, game_dir: Path) -> dict:
+    config = importlib.import_module('survivalist_gamedata.config')
+    conf = config.load_config(overrides={'base_dir': f'{game_dir.as_posix()}/'})
+    common = importlib.import_module('survivalist_gamedata.common')
+    modules = {
+        'recipes': importlib.import_module('survivalist_gamedata.recipes'),
+        'items': importlib.import_module('survivalist_gamedata.items'),
+    }
+    version = common.load_game_version(conf)
+
+    stages: dict[str, dict] = {}
+    with config.use_config(conf):
+        tracemalloc.start()
+        for name, mod in modules.items():
+            stages.update(_run_pipeline(mod, name, version, trace=True))
+        tracemalloc.stop()
+
+        # time without tracemalloc, which slows down allocation-heavy code
+        for _ in range(args.repeat):
+            for name, mod in modules.items():
+                for key, res in _run_pipeline(mod, name, version, trace=False).items():
+                    if 'best_seconds' not in stages[key] or (
+                            res['seconds'] < stages[key]['best_seconds']):
+                        stages[key]['best_seconds'] = res['seconds']
+    return stages
+
+
+def run(args: argparse.Namespace) -> dict:
+    cwd = Path.cwd()
+    with tempfile.TemporaryDirectory(prefix='survivalist-bench-') as tmp_dir:
+        root = Path(tmp_dir)
+        game_dir = generate(root / 'game',
+                            n_items=args.items,
+                            n_liquids=args.liquids,
+                            n_recipes=args.recipes,
+                            seed=args.seed)
+        # the outputs are written relative to the working directory
+        os.chdir(root)
+        try:
+            stages = _run_stages(args, game_dir)
+        finally:
+            os.chdir(cwd)
+
+    for res in stages.values():
+        res['seconds'] = res.pop('best_seconds', res['seconds'])
+        res['rows_per_second'] = res['rows_out'] / res['seconds'] if res['seconds'] else 0
+
+    return {
+        'commit': _git_commit(),
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'params': {
+            'items': args.items,
+            'liquids': args.liquids,
+            'recipes': args.recipes,
+            'seed': args.seed,
+            'repeat': args.repeat,
+        },
+        'stages': stages,
+    }
+
+
+def report(results: dict, baseline: dict | None) -> None:
+    log.info('commit %s, params %s', results['commit'], results['params'])
+    header = f"{'stage':<18}{'seconds':>10}{'rows/s':>12}{'peak MB':>10}{'rows':>8}"
+    if baseline:
+        header += f"{'vs ' + baseline['commit']:>14}"
+    log.info(header)
+    for key, res in results['stages'].items():
+        line = (f"{key:<18}{res['seconds']:>10.4f}{res['rows_per_second']:>12.0f}"
+                f"{res['peak_bytes'] / 1e6:>10.1f}{res['rows_out']:>8}")
+        if baseline and key in baseline['stages'] and res['seconds']:
+            ratio = baseline['stages'][key]['seconds'] / res['seconds']
+            line += f'{ratio:>13.2f}x'
+        log.info(line)
+
+
+def main() -> None:
+    # only the results, and warnings of the pipelines
+    logging.basicConfig(format='%(message)s')
+    log.setLevel(logging.INFO)
+    argp = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    argp.add_argument('--items', type=int, default=2000, help='number of equipment files')
+    argp.add_argument('--liquids', type=int, default=100, help='number of liquid files')
+    argp.add_argument('--recipes', type=int, default=2000, help='number of recipes')
+    argp.add_argument('--seed', type=int, default=0, help='random seed for the data')
+    argp.add_argument('--repeat', type=int, default=3, help='timing runs per stage')
+    argp.add_argument('--output', type=Path, help='write the results to this JSON file')
+    argp.add_argument('--compare', type=Path, help='JSON results to compare against')
+    args = argp.parse_args()
+
+    output = args.output.absolute() if args.output else None
+    baseline = json.loads(args.compare.read_text()) if args.compare else None
+
+    results = run(args)
+    report(results, baseline)
+    if output:
+        output.write_text(json.dumps(results, indent=2))
+
+
+if __name__ == '__main__':
+    main()
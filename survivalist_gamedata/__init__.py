@@ -1,12 +1,25 @@
 """Initialise the package."""
 
-import logging.config
 from pathlib import Path
 
-import yaml
+_logging_initialised = False
 
 
-def _init_logging() -> None:
+def init_logging() -> None:
+    """Configure logging from logging.yaml, once.
+
+    Not done on import, so that using the package as a library leaves the logging
+    configuration of the application alone.
+    """
+    global _logging_initialised  # noqa: PLW0603
+    if _logging_initialised:
+        return
+    _logging_initialised = True
+
+    import logging.config
+
+    import yaml
+
     # Load yaml file
     logconf_path = Path(__file__).parent / 'logging.yaml'
     with logconf_path.open() as y:
@@ -21,6 +34,3 @@ def _init_logging() -> None:
 
     # Initialise the logging system
     logging.config.dictConfig(c)
-
-
-_init_logging()
@@ -1,15 +1,49 @@
 """Make the package runnable."""
 
-from .common import load_game_version
-from .items import extract_items
-from .recipes import extract_recipes
+import sys
+from pathlib import Path
 
+from . import init_logging
+from .config import dump_config, load_config, parse_args, use_config
 
-def run() -> None:
-    version = load_game_version()
-    extract_recipes(version)
-    extract_items(version)
+
+def run(argv: list[str] | None = None) -> int:
+    args = parse_args(argv)
+    init_logging()
+    conf = load_config(args, create=True)
+
+    # Dump config
+    if conf.dump_config:
+        dump_config(conf)
+        return 0
+
+    # the pipelines import the XML parser and friends, so only load them when needed
+    if args.batch:
+        from .batch import run_batch
+        return 0 if run_batch([Path(root) for root in args.batch], args) else 1
+
+    from .common import load_game_version
+    from .runner import run_pipelines
+
+    with use_config(conf):
+        if args.diff_versions:
+            from .diff import write_changelog
+            write_changelog(*args.diff_versions)
+            return 0
+
+        if conf.serve.enabled:
+            from .serve import serve
+            serve()
+            return 0
+
+        if conf.watch.enabled:
+            from .watch import watch
+            watch()
+            return 0
+
+        version = load_game_version()
+        return 0 if run_pipelines(version) else 1
 
 
 if __name__ == '__main__':
-    run()
+    sys.exit(run())
@@ -0,0 +1,116 @@
+"""Extract several game versions at once, parsing files they share only once."""
+
+import argparse
+import logging
+import pickle
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+from .cache import ParseCache, file_digest, open_parse_cache
+from .common import ExtractsError, iter_xml_files, load_game_version
+from .config import load_config, use_config
+from .items import item_files, item_parser
+from .parsers import XmlParser
+from .recipes import recipe_files, recipe_parser
+from .runner import run_versions
+
+if TYPE_CHECKING:
+    from .config import Config
+
+log = logging.getLogger(__name__)
+
+
+def load_version_config(root: Path, args: argparse.Namespace | None = None) -> 'Config':
+    """Load the config for the game installed in root.
+
+    root is used as base_dir if it has the version file, otherwise the
+    StreamingAssets directory of the game installed in it is.
+    """
+    for base_dir in (root, *sorted(root.glob('*_Data/StreamingAssets'))):
+        conf = load_config(args, overrides={'base_dir': str(base_dir.absolute())})
+        if Path(conf.version_file).exists():
+            return conf
+
+    msg = f'No game version found in {root}'
+    raise ExtractsError(msg)
+
+
+def load_versions(roots: list[Path],
+                  args: argparse.Namespace | None = None) -> dict[str, 'Config']:
+    """Get the game version and config of each install root."""
+    versions: dict[str, Config] = {}
+    roots_by_version: dict[str, Path] = {}
+    for root in roots:
+        conf = load_version_config(root, args)
+        version = load_game_version(conf)
+        if version in versions:
+            # they would write to the same output files
+            other = roots_by_version[version]
+            msg = f'{root} and {other} have the same version {version}'
+            raise ExtractsError(msg)
+        versions[version] = conf
+        roots_by_version[version] = root
+    return versions
+
+
+def _input_files(conf: 'Config') -> dict[str, tuple[list[Path], XmlParser]]:
+    """Get the files each pipeline loads through its parse cache, and their parser."""
+    with use_config(conf):
+        files = {'items': (item_files(), item_parser())}
+        if not conf.recipes.streaming:
+            files['recipes'] = (recipe_files(), recipe_parser())
+    return files
+
+
+def prime_parse_caches(versions: dict[str, 'Config']) -> dict[str, dict[str, ParseCache]]:
+    """Get the parse caches of each version, with all their files parsed.
+
+    Files that are not cached yet are parsed once per distinct content and parser,
+    and the parsed document is shared by every version that has the same file.
+    """
+    caches: dict[str, dict[str, ParseCache]] = {}
+    # the files to parse by their parser and content, with the caches to put them in
+    to_parse: dict[tuple[str, str], dict[str, list[tuple[Path, ParseCache]]]] = {}
+    parsers: dict[tuple[str, str], XmlParser] = {}
+    n_files = 0
+    for version, conf in versions.items():
+        caches[version] = {}
+        for name, (xml_paths, parser) in _input_files(conf).items():
+            with use_config(conf):
+                # the caches of all versions are used, so do not evict any
+                cache = open_parse_cache(name, version, evict=False) or ParseCache()
+            cache.use_parser(parser.key)
+            caches[version][name] = cache
+            parser_id = (name, parser.key)
+            parsers.setdefault(parser_id, parser)
+            for xml_path in xml_paths:
+                if xml_path not in cache:
+                    targets = to_parse.setdefault(parser_id, {}).setdefault(
+                        file_digest(xml_path), [])
+                    targets.append((xml_path, cache))
+                    n_files += 1
+
+    log.info('Parsing %s distinct files for %s uncached files in %s versions',
+             sum(map(len, to_parse.values())), n_files, len(versions))
+    for parser_id, by_digest in to_parse.items():
+        digests = {targets[0][0]: digest for digest, targets in by_digest.items()}
+        for xml_path, doc in iter_xml_files(list(digests), parser=parsers[parser_id]):
+            digest = digests[xml_path]
+            doc_bytes = pickle.dumps(doc, protocol=pickle.HIGHEST_PROTOCOL)
+            for path, cache in by_digest[digest]:
+                cache.put_pickled(path, doc_bytes, digest)
+
+    return caches
+
+
+def run_batch(roots: list[Path], args: argparse.Namespace | None = None) -> bool:
+    """Extract the game versions installed in roots, each to its own data directory.
+
+    Returns whether all succeeded.
+    """
+    versions = load_versions(roots, args)
+    # parallel parsing and the number of workers are configured the same for all
+    with use_config(next(iter(versions.values()))):
+        caches = prime_parse_caches(versions)
+        jobs = [(version, conf, caches[version]) for version, conf in versions.items()]
+        return run_versions(jobs)
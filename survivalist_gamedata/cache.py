@@ -0,0 +1,172 @@
+"""Persistent cache of parsed game XML files."""
+
+import hashlib
+import logging
+import pickle
+from pathlib import Path
+from typing import NamedTuple
+
+from .config import get_conf
+
+log = logging.getLogger(__name__)
+
+# bump when the shape of the cached documents changes
+_CACHE_FORMAT = 2
+
+
+class _Entry(NamedTuple):
+    mtime_ns: int
+    size: int
+    digest: str
+    doc: bytes  # pickled, so that every get() returns a copy the caller may modify
+
+
+def file_digest(path: Path) -> str:
+    with path.open('rb') as f:
+        return hashlib.file_digest(f, 'sha256').hexdigest()
+
+
+class ParseCache:
+    """Parsed XML documents keyed by file path.
+
+    An entry is used when the file's mtime and size are unchanged, or when its
+    content hash is unchanged even though the mtime is not. Without a cache_path
+    the cache is kept in memory only.
+    """
+
+    def __init__(self, cache_path: Path | None = None) -> None:
+        self.cache_path = cache_path
+        self._entries: dict[str, _Entry] = {}
+        self._used: set[str] = set()
+        # the key of the parser the documents were parsed with
+        self.parser_key = ''
+        self.hits = 0
+        self.misses = 0
+        if cache_path is not None:
+            self._load()
+
+    def _load(self) -> None:
+        if not self.cache_path or not self.cache_path.exists():
+            return
+        try:
+            with self.cache_path.open('rb') as f:
+                data = pickle.load(f)  # noqa: S301
+        except (OSError, EOFError, pickle.UnpicklingError, AttributeError) as err:
+            log.warning('Ignoring unreadable parse cache %s: %s', self.cache_path, err)
+            return
+        if not isinstance(data, dict) or data.get('format') != _CACHE_FORMAT:
+            log.info('Ignoring parse cache %s of another format', self.cache_path)
+            return
+        self._entries = data['entries']
+        self.parser_key = data.get('parser', '')
+        log.debug('Loaded %s entries from %s', len(self._entries), self.cache_path)
+
+    def use_parser(self, parser_key: str) -> None:
+        """Drop the documents if they were parsed with another parser key.
+
+        A parser with another key keeps other fields.
+        """
+        if parser_key != self.parser_key:
+            if self._entries:
+                log.info('Parsing files again to keep other fields')
+            self._entries = {}
+            self._used = set()
+            self.parser_key = parser_key
+
+    def _lookup(self, path: Path) -> _Entry | None:
+        key = str(path)
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+
+        st = path.stat()
+        if entry.size != st.st_size:
+            return None
+        if entry.mtime_ns != st.st_mtime_ns:
+            if file_digest(path) != entry.digest:
+                return None
+            entry = entry._replace(mtime_ns=st.st_mtime_ns)
+            self._entries[key] = entry
+
+        return entry
+
+    def __contains__(self, path: Path) -> bool:
+        return self._lookup(path) is not None
+
+    def get(self, path: Path) -> dict | None:
+        entry = self._lookup(path)
+        if entry is None:
+            return None
+
+        self._used.add(str(path))
+        self.hits += 1
+        return pickle.loads(entry.doc)  # noqa: S301
+
+    def put(self, path: Path, doc: dict, digest: str) -> None:
+        doc_bytes = pickle.dumps(doc, protocol=pickle.HIGHEST_PROTOCOL)
+        self.put_pickled(path, doc_bytes, digest)
+
+    def put_pickled(self, path: Path, doc_bytes: bytes, digest: str) -> None:
+        """Like put(), for a document that is already pickled, e.g. to share it."""
+        key = str(path)
+        st = path.stat()
+        self._entries[key] = _Entry(st.st_mtime_ns, st.st_size, digest, doc_bytes)
+        self._used.add(key)
+        self.misses += 1
+
+    def keep(self, paths: list[Path]) -> None:
+        """Keep the entries of paths at the next save, though they were not used."""
+        self._used.update(str(path) for path in paths)
+
+    def save(self) -> None:
+        """Keep the entries used since the last save, dropping entries for removed files.
+
+        Writes them to cache_path, if the cache has one.
+        """
+        entries = {k: v for k, v in self._entries.items() if k in self._used}
+        self._entries = entries
+        self._used = set()
+        if self.cache_path is None:
+            return
+        log.debug('Saving %s entries to %s (%s hits, %s misses)', len(entries),
+                  self.cache_path, self.hits, self.misses)
+
+        self.cache_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.cache_path.with_suffix('.tmp')
+        data = {'format': _CACHE_FORMAT, 'parser': self.parser_key, 'entries': entries}
+        with tmp_path.open('wb') as f:
+            pickle.dump(data, f, protocol=pickle.HIGHEST_PROTOCOL)
+        tmp_path.replace(self.cache_path)
+
+
+def _evict_stale_versions(name: str, keep_path: Path) -> None:
+    """Delete the caches of all but the most recently used game versions."""
+    conf = get_conf()
+    pattern = Path(conf.parse_cache.file.format(version='*', name=name))
+    if pattern.is_absolute():
+        root = Path(pattern.anchor)
+        pattern = pattern.relative_to(root)
+    else:
+        root = Path()
+
+    others = [p for p in root.glob(str(pattern)) if p.resolve() != keep_path.resolve()]
+    others.sort(key=lambda p: p.stat().st_mtime, reverse=True)
+    for stale_path in others[max(0, conf.parse_cache.keep_versions - 1):]:
+        log.info('Removing stale parse cache %s', stale_path)
+        stale_path.unlink()
+
+
+def open_parse_cache(name: str, version: str, *, evict: bool = True) -> ParseCache | None:
+    """Open the parse cache called name for a game version, if caching is enabled.
+
+    Unless evict is false, the caches of older game versions are removed.
+    """
+    conf = get_conf()
+    if not conf.parse_cache.enabled:
+        return None
+
+    cache_path = Path(conf.parse_cache.file.format(version=version, name=name))
+    if evict:
+        _evict_stale_versions(name, cache_path)
+
+    return ParseCache(cache_path)
@@ -1,18 +1,39 @@
+import csv
+import functools
+import hashlib
 import logging
+import os
 import re
+from collections.abc import Callable, Iterable, Iterator, Mapping, Sequence
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from contextlib import ExitStack
 from pathlib import Path
-from typing import Any
+from typing import TYPE_CHECKING, Any
+from xml.parsers.expat import ExpatError
 
-from .config import conf
+import xmltodict
+
+from .cache import ParseCache
+from .config import get_conf
+from .store import Record
+
+if TYPE_CHECKING:
+    from .config import Config
+    from .parsers import XmlParser
 
 log = logging.getLogger(__name__)
 
+# write CSV files in chunks of this many characters
+_CSV_BUFFER_SIZE = 1 << 16
+
 
 class ExtractsError(Exception):
     """General error class for Survivalist Extracts script."""
 
 
-def load_game_version() -> str:
+def load_game_version(conf: 'Config | None' = None) -> str:
+    if conf is None:
+        conf = get_conf()
     version_path = Path(conf.version_file)
 
     with version_path.open() as version_file:
@@ -23,17 +44,264 @@ def load_game_version() -> str:
     return version
 
 
+def parse_xml_file(xml_path: Path, parser: 'XmlParser | None' = None) -> tuple[dict, str]:
+    """Parse an XML file and return it with the SHA-256 digest of its content.
+
+    Uses xmltodict unless a parser is given.
+    """
+    data = xml_path.read_bytes()
+    doc = parser.parse(data) if parser is not None else xmltodict.parse(data)
+    return doc, hashlib.sha256(data).hexdigest()
+
+
+def _try_parse_xml_file(
+        xml_path: Path,
+        parser: 'XmlParser | None' = None) -> tuple[dict | None, str, Exception | None]:
+    try:
+        return *parse_xml_file(xml_path, parser), None
+    except (OSError, ExpatError, SyntaxError) as err:
+        # ElementTree and lxml raise subclasses of SyntaxError
+        return None, '', err
+
+
+def _make_executor(workers: int) -> Executor:
+    conf = get_conf()
+    if conf.parallel.mode == 'process':
+        return ProcessPoolExecutor(max_workers=workers)
+    return ThreadPoolExecutor(max_workers=workers)
+
+
+def iter_xml_files(xml_paths: list[Path],
+                   cache: ParseCache | None = None,
+                   parser: 'XmlParser | None' = None,
+                   failed: list[Path] | None = None) -> Iterator[tuple[Path, dict]]:
+    """Parse XML files, in parallel if configured, yielding them in xml_paths order.
+
+    Files found in the cache are not parsed again, unless they were parsed with
+    other fields than parser keeps. Files that cannot be read or parsed are logged
+    and skipped, and added to failed if it is given. Unless parsing in parallel,
+    only one parsed file is held at a time.
+    """
+    conf = get_conf()
+    if cache is not None:
+        cache.use_parser(parser.key if parser is not None else '')
+    to_parse = [
+        xml_path for xml_path in xml_paths if cache is None or xml_path not in cache
+    ]
+
+    parse: Callable[[Path], tuple[dict | None, str, Exception | None]]
+    parse = functools.partial(_try_parse_xml_file, parser=parser)
+    cnt_failed = 0
+    with ExitStack() as stack:
+        if conf.parallel.mode == 'serial' or len(to_parse) < 2:  # noqa: PLR2004
+            results = map(parse, to_parse)
+        else:
+            workers = conf.parallel.workers or os.cpu_count() or 1
+            chunksize = max(1, len(to_parse) // (workers * 4))
+            log.debug('Parsing %s files with %s %s workers', len(to_parse), workers,
+                      conf.parallel.mode)
+            executor = stack.enter_context(_make_executor(workers))
+            results = executor.map(parse, to_parse, chunksize=chunksize)
+        parsed = zip(to_parse, results, strict=True)
+        to_parse_set = set(to_parse)
+
+        for xml_path in xml_paths:
+            if xml_path in to_parse_set:
+                _, (doc, digest, err) = next(parsed)
+            else:
+                doc = cache.get(xml_path) if cache is not None else None
+                if doc is not None:
+                    yield xml_path, doc
+                    continue
+                # changed since it was looked up in the cache
+                doc, digest, err = parse(xml_path)
+
+            if err is not None:
+                log.error('Could not parse %s: %s', xml_path, err)
+                cnt_failed += 1
+                if failed is not None:
+                    failed.append(xml_path)
+                continue
+            if cache is not None:
+                cache.put(xml_path, doc, digest)
+            yield xml_path, doc
+
+    if cnt_failed:
+        log.warning('%s out of %s XML files could not be parsed', cnt_failed,
+                    len(xml_paths))
+
+
+def parse_xml_files(xml_paths: list[Path],
+                    cache: ParseCache | None = None,
+                    parser: 'XmlParser | None' = None) -> list[tuple[Path, dict]]:
+    """Parse XML files like iter_xml_files, returning a list."""
+    return list(iter_xml_files(xml_paths, cache, parser))
+
+
+def write_csv(csv_path: Path, fieldnames: Sequence[str], rows: Iterable[Mapping]) -> None:
+    """Write rows to a CSV file as they are iterated, with the given columns in order.
+
+    Fields of a row that are not in fieldnames are left out, missing fields are
+    left empty.
+    """
+    fieldnames = list(fieldnames)
+
+    def values(row: Mapping) -> list:
+        if isinstance(row, Record):
+            return row.pick(fieldnames, '')
+        return [row.get(field, '') for field in fieldnames]
+
+    with csv_path.open('w', newline='\n', buffering=_CSV_BUFFER_SIZE) as csv_file:
+        writer = csv.writer(csv_file)
+        writer.writerow(fieldnames)
+        writer.writerows(map(values, rows))
+
+
 def unique(seq: list) -> list:
     seen: set = set()
     seen_add = seen.add
     return [x for x in seq if not (x in seen or seen_add(x))]
 
 
+_CAMEL_CASE_RE = re.compile(r'([a-z])([A-Z])')
+_SUFFIX_RE = re.compile(r'_([a-zA-Z0-9 ]+)')
+
+
+def _overlaps(a: str, b: str) -> bool:
+    """Check if a proper suffix of a is a proper prefix of b."""
+    return any(a.endswith(b[:n]) for n in range(1, min(len(a), len(b))))
+
+
+def _single_pass_safe(replacements: list[tuple[str, str]]) -> bool:
+    """Check if replacing all keys in one pass gives the same result as chained replaces.
+
+    This is the case when no earlier replacement can break up, create or overlap a
+    match of a later key.
+    """
+    for i, (orig, repl) in enumerate(replacements):
+        if not orig or not repl:
+            return False
+        for later_orig, _ in replacements[i + 1:]:
+            if (orig in later_orig or later_orig in repl or repl in later_orig or
+                    _overlaps(orig, later_orig) or _overlaps(later_orig, orig) or
+                    _overlaps(repl, later_orig) or _overlaps(later_orig, repl)):
+                return False
+    return True
+
+
+class NameExpander:
+    """Compiled and memoized version of expand_names for a set of replacements."""
+
+    def __init__(self, replacements: dict[str, str], maxsize: int = 8192) -> None:
+        self.replacements = list(replacements.items())
+        self.single_pass = _single_pass_safe(self.replacements)
+        self._lookup = dict(self.replacements)
+        # one regex that finds any of the strings to replace
+        keys = '|'.join(re.escape(k) for k, _ in self.replacements)
+        self._keys_re = re.compile(keys if self.replacements else r'(?!)')
+        self.expand = functools.lru_cache(maxsize=maxsize)(self._expand)
+
+    def _replace(self, text: str) -> str:
+        if self.single_pass:
+            return self._keys_re.sub(lambda m: self._lookup[m.group(0)], text)
+
+        # the replacements interact, so apply them one after the other, but only
+        # when there is anything to replace at all
+        if self._keys_re.search(text):
+            for orig, repl in self.replacements:
+                text = text.replace(orig, repl)
+        return text
+
+    def _expand(self, text: str) -> str:
+        text = _CAMEL_CASE_RE.sub(lambda m: f'{m.group(1)} {m.group(2)}', text)
+        if '_' in text:
+            text = _SUFFIX_RE.sub(lambda m: f' ({m.group(1)})', text)
+        return self._replace(text)
+
+
+@functools.lru_cache(maxsize=8)
+def _name_expander(replacements: tuple[tuple[str, str], ...]) -> NameExpander:
+    return NameExpander(dict(replacements))
+
+
+# the expander of the config last used, to skip the lookup above for every cell
+_expander: tuple[Any, NameExpander] | None = None
+
+
+def name_expander() -> NameExpander:
+    """Get the NameExpander for the replacements of the current config."""
+    global _expander  # noqa: PLW0603
+    conf = get_conf()
+    if _expander is None or _expander[0] is not conf:
+        replacements = tuple((conf.replacements or {}).items())
+        _expander = (conf, _name_expander(replacements))
+    return _expander[1]
+
+
 def expand_names(text: Any) -> Any:  # noqa: ANN401
     if isinstance(text, str):
-        text = re.sub(r'[a-z][A-Z]', lambda x: x.group(0)[0] + ' ' + x.group(0)[1], text)
-        text = re.sub(r'_([a-zA-Z0-9 ]+)', lambda x: f' ({x.group(1)})', text)
-        for orig, repl in conf.replacements.items():
-            text = text.replace(orig, repl)
+        text = name_expander().expand(text)
 
     return text
+
+
+class TableTemplate:
+    """The Steam markup layout of a table with given columns and headers.
+
+    The header and a format string for the rows are built once, so rendering a
+    row is a single format call.
+    """
+
+    def __init__(self, cols: dict[str, str]) -> None:
+        self.cols = tuple(cols)
+        header = ''.join(f'  [th]{val}[/th]\n' for val in cols.values())
+        self.head = f'[table]\n [tr]\n{header} [/tr]\n'
+        self.row = ' [tr]\n' + '  [td]{}[/td]\n' * len(self.cols) + ' [/tr]\n'
+        self.tail = '[/table]\n\n'
+
+    def render(self, rows: Iterable[Mapping]) -> str:
+        expand = name_expander().expand
+        row_format = self.row.format
+        cols = self.cols
+        markup = [self.head]
+        for row in rows:
+            if isinstance(row, Record):
+                values = row.pick(cols, '')
+            else:
+                values = [row.get(col, '') for col in cols]
+            markup.append(
+                row_format(*[expand(v) if isinstance(v, str) else v for v in values]))
+        markup.append(self.tail)
+        return ''.join(markup)
+
+
+@functools.lru_cache(maxsize=64)
+def _table_template(cols: tuple[tuple[str, str], ...]) -> TableTemplate:
+    return TableTemplate(dict(cols))
+
+
+def render_table(cols: dict[str, str], rows: Iterable[Mapping]) -> str:
+    """Render rows as a Steam markup table with the given columns and headers."""
+    return _table_template(tuple(cols.items())).render(rows)
+
+
+_TABLE_RE = re.compile(r'\[table\]\n.*?\[/table\]\n\n', re.DOTALL)
+
+
+def splice_tables(markup_path: Path, markups: Sequence[str | None]) -> str:
+    """Put the rendered tables in place of the tables of a Steam markup file.
+
+    A table that is None keeps the markup the file has for it. If the file does
+    not have the same number of tables, only the rendered tables are kept.
+    """
+    previous: list[str] = []
+    if markup_path.exists():
+        text = markup_path.read_text()
+        previous = _TABLE_RE.findall(text)
+        if ''.join(previous) != text or len(previous) != len(markups):
+            log.warning('The tables in %s do not match the config', markup_path.name)
+            previous = []
+    if not previous:
+        return ''.join(markup for markup in markups if markup is not None)
+    return ''.join(markup if markup is not None else old
+                   for markup, old in zip(markups, previous, strict=True))
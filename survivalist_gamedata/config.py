@@ -1,16 +1,18 @@
-"""Dostring."""
+"""Command line arguments and configuration."""
 
 import argparse
+import functools
 import json
 import logging
-import os
 import shutil
-import sys
+from collections.abc import Iterator
+from contextlib import contextmanager
+from contextvars import ContextVar
 from pathlib import Path
-from typing import Any
+from typing import TYPE_CHECKING, Any
 
-import confuse  # type: ignore  # noqa: PGH003
-import toml
+if TYPE_CHECKING:
+    from confuse.templates import AttrDict as Config  # type: ignore  # noqa: PGH003
 
 log = logging.getLogger(__name__)
 
@@ -26,87 +28,356 @@ def path2str(data: Any) -> Any:  # noqa: ANN401
         return data
 
 
-_template = {
-    'dump_config': bool,
-    'base_dir': confuse.Path(cwd=Path.cwd()),
-    'version_file': confuse.Path(relative_to='base_dir'),
-    'gamedata_dirs': confuse.StrSeq(split=False),
-    'replacements': confuse.Optional(confuse.MappingValues(str)),
-    'recipes': {
-        'skip_deprecated': bool,
-        'order_by': confuse.StrSeq(split=True),
-        'csv_file': str,
-        'csv_fields': confuse.StrSeq(split=False),
-        'steam_file': str,
-        'steam_tables': {
-            'default_columns':
-                confuse.MappingValues(str),
-            'tables':
-                confuse.Sequence({
-                    'SkillType': str,
-                    'RecipeType': confuse.Optional(str, default='*'),
-                    'columns': confuse.Optional(confuse.MappingValues(str)),
-                }),
+def _template() -> dict:
+    import confuse  # type: ignore  # noqa: PGH003
+
+    rules = confuse.Sequence({
+        'field': str,
+        'equals': confuse.Optional(str),
+        'startswith': confuse.Optional(str),
+        'unless': confuse.Optional(str),
+        'map': confuse.Optional(confuse.MappingValues(str)),
+        'join': confuse.Optional(str),
+        'level': confuse.Optional(confuse.Number()),
+        'of': confuse.Optional(str),
+        'set': confuse.Optional(confuse.MappingValues(str)),
+    })
+    order_by_category = confuse.MappingValues(confuse.StrSeq(split=True))
+    return {
+        'dump_config': confuse.TypeTemplate(bool, default=False),
+        'base_dir': confuse.Path(cwd=Path.cwd()),
+        'version_file': confuse.Path(relative_to='base_dir'),
+        'gamedata_dirs': confuse.StrSeq(split=False),
+        'replacements': confuse.Optional(confuse.MappingValues(str)),
+        'parallel': {
+            'mode': confuse.Choice(['serial', 'thread', 'process']),
+            'workers': confuse.Optional(int),
+            'pipelines': bool,
+        },
+        'parse_cache': {
+            'enabled': bool,
+            'file': str,
+            'keep_versions': int,
+        },
+        'parser': {
+            'backend': confuse.Choice(['xmltodict', 'etree', 'lxml']),
+            'filter_fields': bool,
+        },
+        'incremental': {
+            'enabled': bool,
+            'manifest_file': str,
+        },
+        'watch': {
+            'enabled': bool,
+            'interval': confuse.Number(),
+            'debounce': confuse.Number(),
+        },
+        'serve': {
+            'enabled': bool,
+            'host': str,
+            'port': int,
+            'page_size': int,
+            'max_page_size': int,
+            'cache_size': int,
+            'reload': bool,
+        },
+        'outputs': {
+            'formats': confuse.Sequence(confuse.Choice(['sqlite', 'parquet'])),
+            'sqlite_file': str,
+            'parquet_dir': str,
+            'batch_size': int,
+        },
+        'diff': {
+            'csv_file': str,
+            'steam_file': str,
+            'ignore_fields': confuse.StrSeq(split=False),
+        },
+        'select': {
+            'categories': confuse.StrSeq(split=False),
+            'skill_types': confuse.StrSeq(split=False),
+            'recipe_types': confuse.StrSeq(split=False),
+            'files': confuse.StrSeq(split=False),
         },
-    },
-    'game_items': {
-        'skip_files': confuse.StrSeq(split=False),
-        'csv_file': str,
-        'remove_keys': confuse.StrSeq(split=False),
-        'steam_file': str,
-        'steam_tables': {
-            'default_columns':
-                confuse.MappingValues(str),
-            'tables':
-                confuse.Sequence({
-                    'Category': str,
-                    'columns': confuse.Optional(confuse.MappingValues(str)),
-                }),
+        'profile': {
+            'enabled': bool,
+            'pstats_file': confuse.Optional(str),
         },
-    },
-}
+        'recipes': {
+            'streaming': bool,
+            'skip_deprecated': bool,
+            'order_by': confuse.StrSeq(split=True),
+            'csv_file': str,
+            'csv_fields': confuse.StrSeq(split=False),
+            'rules': rules,
+            'steam_file': str,
+            'steam_tables': {
+                'default_columns':
+                    confuse.MappingValues(str),
+                'tables':
+                    confuse.Sequence({
+                        'SkillType': str,
+                        'RecipeType': confuse.Optional(str, default='*'),
+                        'columns': confuse.Optional(confuse.MappingValues(str)),
+                    }),
+            },
+        },
+        'game_items': {
+            'skip_files': confuse.StrSeq(split=False),
+            'order_by': confuse.StrSeq(split=True),
+            'order_by_category': confuse.Optional(order_by_category, default={}),
+            'csv_file': str,
+            'remove_keys': confuse.StrSeq(split=False),
+            'rules': rules,
+            'steam_file': str,
+            'steam_tables': {
+                'default_columns':
+                    confuse.MappingValues(str),
+                'tables':
+                    confuse.Sequence({
+                        'Category': str,
+                        'columns': confuse.Optional(confuse.MappingValues(str)),
+                    }),
+            },
+        },
+    }
+
+
+@functools.cache
+def _project_info() -> tuple[str, str]:
+    """Read the version and description from pyproject.toml."""
+    import toml
+
+    pyprj = toml.load(Path(__file__).parent.parent / 'pyproject.toml')
+    return pyprj['tool']['poetry']['version'], pyprj['tool']['poetry']['description']
+
+
+class _ArgumentParser(argparse.ArgumentParser):
+    """Argument parser that only reads the description when showing help."""
+
+    def format_help(self) -> str:
+        self.description = f'Survivalist Gamedata - {_project_info()[1]}'
+        return super().format_help()
+
 
+class _VersionAction(argparse.Action):
+    """Like argparse's 'version' action, but only reads the version when used."""
 
-def _init_conf() -> confuse.templates.AttrDict:
-    """Read the config file."""
-    here = Path(__file__).parent
-    pyprj = toml.load(here.parent / 'pyproject.toml')
-    version = pyprj['tool']['poetry']['version']
-    desc = pyprj['tool']['poetry']['description']
+    def __init__(self, option_strings: list[str], dest: str, **kwargs: object) -> None:
+        super().__init__(option_strings,
+                         dest,
+                         nargs=0,
+                         default=argparse.SUPPRESS,
+                         **kwargs)
 
-    # Get arguments from the command line.
-    argp = argparse.ArgumentParser(description=(f'Survivalist Gamedata - {desc}'))
-    argp.add_argument('--version',
-                      action='version',
-                      version=f'Survivalist Gamedata {version}')
+    def __call__(self, parser: argparse.ArgumentParser, *_args: object) -> None:
+        parser.exit(message=f'Survivalist Gamedata {_project_info()[0]}\n')
+
+
+def parse_args(argv: list[str] | None = None) -> argparse.Namespace:
+    """Get arguments from the command line."""
+    argp = _ArgumentParser()
+    argp.add_argument('--version', action=_VersionAction, help='show version and exit')
     argp.add_argument(
         '--dump-config',
         dest='dump_config',
         action='store_true',
         help='Dump config and exit',
     )
-    args = argp.parse_args()
+    argp.add_argument(
+        '--parallel',
+        dest='parallel.mode',
+        choices=['serial', 'thread', 'process'],
+        help='Parse XML files one at a time, or with a thread or process pool',
+    )
+    argp.add_argument(
+        '--workers',
+        dest='parallel.workers',
+        type=int,
+        help='Number of parallel workers (default: number of CPUs)',
+    )
+    argp.add_argument(
+        '--concurrent',
+        dest='parallel.pipelines',
+        action='store_const',
+        const=True,
+        help='Extract recipes and items at the same time, in separate processes',
+    )
+    argp.add_argument(
+        '--no-cache',
+        dest='parse_cache.enabled',
+        action='store_const',
+        const=False,
+        help='Parse all XML files, ignoring the parse cache',
+    )
+    argp.add_argument(
+        '--parser',
+        dest='parser.backend',
+        choices=['xmltodict', 'etree', 'lxml'],
+        help='Parse XML files with xmltodict, ElementTree or lxml (if installed)',
+    )
+    argp.add_argument(
+        '--incremental',
+        dest='incremental.enabled',
+        action='store_const',
+        const=True,
+        help='Only regenerate outputs and tables whose inputs have changed',
+    )
+    argp.add_argument(
+        '--watch',
+        dest='watch.enabled',
+        action='store_const',
+        const=True,
+        help='Keep running and extract again when the game files change',
+    )
+    argp.add_argument(
+        '--serve',
+        dest='serve.enabled',
+        action='store_const',
+        const=True,
+        help='Keep running and answer queries on the items and recipes over HTTP',
+    )
+    argp.add_argument(
+        '--port',
+        dest='serve.port',
+        type=int,
+        help='With --serve, the port to listen on',
+    )
+    argp.add_argument(
+        '--output',
+        dest='outputs.formats',
+        action='append',
+        choices=['sqlite', 'parquet'],
+        help='Also write the items and recipes in this format, can be given twice',
+    )
+    argp.add_argument(
+        '--category',
+        dest='select.categories',
+        action='append',
+        metavar='PREFIX',
+        help='Only extract the items whose Category starts with PREFIX, '
+        'can be given more than once',
+    )
+    argp.add_argument(
+        '--skill-type',
+        dest='select.skill_types',
+        action='append',
+        help='Only extract the recipes of this SkillType, can be given more than once',
+    )
+    argp.add_argument(
+        '--recipe-type',
+        dest='select.recipe_types',
+        action='append',
+        help='Only extract the recipes of this RecipeType, can be given more than once',
+    )
+    argp.add_argument(
+        '--files',
+        dest='select.files',
+        action='append',
+        metavar='GLOB',
+        help='Only read the game files matching GLOB, e.g. "Equipment/Knife*.xml"',
+    )
+    argp.add_argument(
+        '--batch',
+        nargs='+',
+        metavar='ROOT',
+        help='Extract the game versions installed in the ROOT directories, '
+        'parsing files they share only once',
+    )
+    argp.add_argument(
+        '--diff',
+        dest='diff_versions',
+        nargs=2,
+        metavar=('OLD', 'NEW'),
+        help='Write a changelog of the items and recipes between two extracted '
+        'game versions',
+    )
+    argp.add_argument(
+        '--profile',
+        dest='profile.enabled',
+        action='store_const',
+        const=True,
+        help='Print the time and memory used by each stage',
+    )
+    argp.add_argument(
+        '--profile-output',
+        dest='profile.pstats_file',
+        metavar='FILE',
+        help='With --profile, also write cProfile statistics to FILE',
+    )
+    return argp.parse_args(argv)
+
+
+def load_config(args: argparse.Namespace | None = None,
+                *,
+                config_file: Path | None = None,
+                overrides: dict | None = None,
+                create: bool = False) -> 'Config':
+    """Read the config file and apply command line arguments and overrides.
 
-    # make confuse understand where config.yaml is
-    os.environ['CONFDIR'] = str(Path().absolute())
+    The config file defaults to config.yaml in the working directory. Directives
+    missing from it are taken from config_default.yaml. If create is set, a
+    missing config file is created as a copy of config_default.yaml.
+    """
+    import confuse  # type: ignore  # noqa: PGH003
+
+    if config_file is None:
+        config_file = Path() / 'config.yaml'
 
     # ensure there is a config.yaml file
-    configfile = Path() / 'config.yaml'
-    if not configfile.exists():
-        configfile.parent.mkdir(parents=True, exist_ok=True)
-        shutil.copy(Path(__file__).parent / 'config_default.yaml', configfile)
-        log.warning('Default config.yaml created in %s', os.environ['CONFDIR'])
+    if create and not config_file.exists():
+        config_file.parent.mkdir(parents=True, exist_ok=True)
+        shutil.copy(Path(__file__).parent / 'config_default.yaml', config_file)
+        log.warning('Default config.yaml created in %s', config_file.parent.absolute())
 
     # get all config
-    config = confuse.Configuration('CONF', __name__)
-    config.set_args(args, dots=True)
-
-    return config.get(_template)
+    config = confuse.Configuration('CONF', __name__, read=False)
+    config.read(user=False, defaults=True)
+    if config_file.exists():
+        config.set_file(str(config_file))
+    if args is not None:
+        config.set_args(args, dots=True)
+    if overrides:
+        config.set(overrides)
 
+    return config.get(_template())
 
-conf: confuse.templates.AttrDict = _init_conf()
 
-# Dump config
-if conf.dump_config:
+def dump_config(conf: 'Config') -> None:
     log.warning(json.dumps(path2str(conf), indent=4))
-    sys.exit()
+
+
+_active_conf: ContextVar['Config | None'] = ContextVar('active_conf', default=None)
+
+
+@functools.cache
+def _default_conf() -> 'Config':
+    return load_config()
+
+
+def get_conf() -> 'Config':
+    """Get the config in use, loading config.yaml on first use if none was set."""
+    conf = _active_conf.get()
+    if conf is None:
+        conf = _default_conf()
+    return conf
+
+
+@contextmanager
+def use_config(conf: 'Config | None') -> Iterator['Config']:
+    """Use conf as the config within this context, or the current config if None."""
+    if conf is None:
+        yield get_conf()
+        return
+    token = _active_conf.set(conf)
+    try:
+        yield conf
+    finally:
+        _active_conf.reset(token)
+
+
+def __getattr__(name: str) -> Any:  # noqa: ANN401
+    # keep 'from survivalist_gamedata.config import conf' working, lazily
+    if name == 'conf':
+        return get_conf()
+    msg = f'module {__name__!r} has no attribute {name!r}'
+    raise AttributeError(msg)
@@ -0,0 +1,150 @@
+"""Changelog of the items and recipes between two extracted game versions."""
+
+import csv
+import logging
+from collections.abc import Iterable, Sequence
+from pathlib import Path
+from typing import NamedTuple
+
+from .common import ExtractsError, render_table, write_csv
+from .config import get_conf
+
+log = logging.getLogger(__name__)
+
+CHANGE_FIELDS = ('Type', 'Key', 'Change', 'Field', 'Old', 'New')
+
+# headers of the Steam markup tables, after a column with the name of the item or
+# recipe
+_STEAM_COLUMNS = {
+    'Change': 'Change',
+    'Field': 'Field',
+    'Old': 'Old',
+    'New': 'New',
+}
+
+# rows of an extracted CSV file by their key
+_Records = dict[str, dict[str, str]]
+
+
+class Change(NamedTuple):
+    type: str  # Item or Recipe
+    key: str
+    change: str  # added, removed or changed
+    field: str = ''
+    old: str = ''
+    new: str = ''
+
+    def as_row(self) -> dict[str, str]:
+        return dict(zip(CHANGE_FIELDS, self, strict=True))
+
+
+def read_csv_records(csv_path: Path, key: str) -> _Records:
+    """Read the rows of an extracted CSV file by their key field.
+
+    Rows with a key that was seen before get ' #2', ' #3' and so on appended to
+    it, so duplicates are matched by the order they are in.
+    """
+    records: _Records = {}
+    seen: dict[str, int] = {}
+    with csv_path.open(newline='') as csv_file:
+        reader = csv.DictReader(csv_file)
+        if reader.fieldnames is None or key not in reader.fieldnames:
+            msg = f'{csv_path} has no {key} column'
+            raise ExtractsError(msg)
+        for row in reader:
+            row_key = row[key]
+            n = seen[row_key] = seen.get(row_key, 0) + 1
+            if n > 1:
+                row_key = f'{row_key} #{n}'
+            records[row_key] = row
+    return records
+
+
+def diff_records(type_: str,
+                 old: _Records,
+                 new: _Records,
+                 ignore_fields: Iterable[str] = ()) -> list[Change]:
+    """Compare records matched by key, listing added, removed and changed fields.
+
+    Changes are in the order of the new records, followed by the removed records.
+    Fields missing from a record are compared as empty.
+    """
+    ignore = frozenset(ignore_fields)
+    changes = []
+    for key, new_rec in new.items():
+        old_rec = old.get(key)
+        if old_rec is None:
+            changes.append(Change(type_, key, 'added'))
+            continue
+        if old_rec == new_rec:
+            continue
+        for field in dict.fromkeys([*old_rec, *new_rec]):
+            if field in ignore:
+                continue
+            old_value = old_rec.get(field) or ''
+            new_value = new_rec.get(field) or ''
+            if old_value != new_value:
+                changes.append(Change(type_, key, 'changed', field, old_value, new_value))
+
+    changes.extend(Change(type_, key, 'removed') for key in old if key not in new)
+    return changes
+
+
+def _csv_path(csv_file: str, version: str) -> Path:
+    csv_path = Path(csv_file.format(version=version))
+    if not csv_path.exists():
+        msg = f'{csv_path} not found, extract game version {version} first'
+        raise ExtractsError(msg)
+    return csv_path
+
+
+def diff_versions(old_version: str, new_version: str) -> list[Change]:
+    """Compare the items and recipes extracted for two game versions."""
+    conf = get_conf()
+    ignore_fields = conf.diff.ignore_fields
+    changes = []
+    for type_, csv_file, key in (('Item', conf.game_items.csv_file, 'NativeName'),
+                                 ('Recipe', conf.recipes.csv_file, 'UniqueID')):
+        old = read_csv_records(_csv_path(csv_file, old_version), key)
+        new = read_csv_records(_csv_path(csv_file, new_version), key)
+        type_changes = diff_records(type_, old, new, ignore_fields)
+        log.info('%s: %s added, %s removed, %s changed fields', type_,
+                 sum(1 for c in type_changes if c.change == 'added'),
+                 sum(1 for c in type_changes if c.change == 'removed'),
+                 sum(1 for c in type_changes if c.change == 'changed'))
+        changes.extend(type_changes)
+    return changes
+
+
+def save_changes_as_csv(changes: Iterable[Change], filename: str) -> None:
+    csv_path = Path(filename)
+    csv_path.parent.mkdir(parents=True, exist_ok=True)
+    log.info('Writing changelog CSV to %s', csv_path)
+    write_csv(csv_path, CHANGE_FIELDS, (change.as_row() for change in changes))
+
+
+def render_changes_steamml(changes: Sequence[Change]) -> str:
+    """Render a table of item changes and a table of recipe changes."""
+    markups = []
+    for type_ in ('Item', 'Recipe'):
+        rows = [change.as_row() for change in changes if change.type == type_]
+        if rows:
+            markups.append(render_table({'Key': type_} | _STEAM_COLUMNS, rows))
+    return ''.join(markups)
+
+
+def save_changes_as_steamml(changes: Sequence[Change], filename: str) -> None:
+    markup_path = Path(filename)
+    markup_path.parent.mkdir(parents=True, exist_ok=True)
+    log.info('Writing changelog Steam markup to %s', markup_path)
+    markup_path.write_text(render_changes_steamml(changes))
+
+
+def write_changelog(old_version: str, new_version: str) -> None:
+    """Write the changes between two extracted game versions as CSV and Steam markup."""
+    conf = get_conf()
+    changes = diff_versions(old_version, new_version)
+    save_changes_as_csv(changes,
+                        conf.diff.csv_file.format(old=old_version, new=new_version))
+    save_changes_as_steamml(changes,
+                            conf.diff.steam_file.format(old=old_version, new=new_version))
@@ -1,28 +1,51 @@
-import csv
 import itertools
 import logging
 from collections import OrderedDict
+from collections.abc import Iterable, Iterator, Mapping, Sequence
 from pathlib import Path
-
-import xmltodict
-
-from .common import ExtractsError, expand_names
-from .config import conf
+from typing import TYPE_CHECKING, NamedTuple
+
+from .cache import ParseCache, open_parse_cache
+from .common import ExtractsError, iter_xml_files, render_table, splice_tables, write_csv
+from .config import get_conf, use_config
+from .manifest import TableCache, config_digest, open_manifest, table_digest
+from .parsers import XmlParser
+from .profiling import profiler
+from .rules import RuleSet, rule_fields
+from .selection import Selection, load_selection, selected_files
+from .store import RecordTable, SortKey, make_sort_key
+from .writers import item_tables, open_writers
+
+if TYPE_CHECKING:
+    from .config import Config
 
 log = logging.getLogger(__name__)
 
 
-def item_cmp(x: dict) -> tuple:
-    """Sort items."""
-    name = x['NativeName']
-    cat = x['Category']
-    bp = float(x.get('BasePrice', '-1').split('/')[0])
-    dmg = x.get('Damage', '')
+def item_sort_key() -> SortKey:
+    """Make the sort key of items from the configured orderings.
+
+    A category uses the ordering configured for the longest prefix of it in
+    order_by_category, or else order_by.
+    """
+    conf = get_conf()
+    default_key = make_sort_key(conf.game_items.order_by)
+    prefix_keys = {
+        prefix: make_sort_key(fields)
+        for prefix, fields in conf.game_items.order_by_category.items()
+    }
+    by_category: dict[str, SortKey] = {}
 
-    if cat.startswith('2:Weapons/Melee'):
-        return (cat, dmg, name)
+    def sort_key(item: Mapping) -> tuple:
+        cat = item.get('Category', '')
+        key = by_category.get(cat)
+        if key is None:
+            prefixes = [prefix for prefix in prefix_keys if cat.startswith(prefix)]
+            key = prefix_keys[max(prefixes, key=len)] if prefixes else default_key
+            by_category[cat] = key
+        return key(item)
 
-    return (cat, bp, name)
+    return sort_key
 
 
 def lootloc_str(equip: dict) -> str:
@@ -48,29 +71,117 @@ def lootloc_str(equip: dict) -> str:
     return '\n'.join(things_strs)
 
 
-def load_items() -> list[OrderedDict]:
-    items = []
+class LootLocation(NamedTuple):
+    name: str
+    scarcity: str
+
+
+def loot_list(equip: dict) -> tuple[LootLocation, ...]:
+    """Get the locations an item can be looted from, with the scarcity at each."""
+    if 'LootableFromLocations' not in equip or 'Scarcity' not in equip:
+        return ()
 
+    loot_from = equip['LootableFromLocations']['LootableFrom']
+    if isinstance(loot_from, dict):
+        loot_from = [loot_from]
+    return tuple(
+        LootLocation(loc['Name'], loc.get('OverrideScarcity', equip['Scarcity']))
+        for loc in loot_from)
+
+
+def item_files(*, selected: bool = True) -> list[Path]:
+    """Get the item files.
+
+    Only those matching the configured file patterns, unless selected is false.
+    """
+    conf = get_conf()
     xml_files = itertools.chain(
         *(Path(conf.base_dir, p, 'Equipment').glob('*.xml') for p in conf.gamedata_dirs),
         *(Path(conf.base_dir, p, 'Liquid').glob('*.xml') for p in conf.gamedata_dirs))
+    xml_paths = []
     for xml_file in xml_files:
         if xml_file.name in conf.game_items.skip_files:
             log.debug('Skipping %s', xml_file.name)
             continue
-
-        log.debug('Loading gameitem from %s', xml_file)
-        item = xmltodict.parse(xml_file.open('rb'))
+        xml_paths.append(xml_file)
+
+    # glob returns files in arbitrary order
+    xml_paths.sort()
+    return selected_files(xml_paths) if selected else xml_paths
+
+
+def iter_items(cache: ParseCache | None = None,
+               xml_paths: list[Path] | None = None,
+               selection: Selection | None = None,
+               failed: list[Path] | None = None) -> Iterator[OrderedDict]:
+    """Yield the items as they are loaded.
+
+    The files that cannot be parsed are added to failed, if it is given.
+
+    With a selection, files whose items cannot be in the selected categories are
+    not parsed. Their entries in the cache are kept.
+    """
+    cnt = 0
+
+    if xml_paths is None:
+        xml_paths = item_files()
+    if selection is not None and selection.categories:
+        selected = [path for path in xml_paths if selection.may_select_item_file(path)]
+        log.info('Reading %s out of %s item files for the selected categories',
+                 len(selected), len(xml_paths))
+        if cache is not None:
+            cache.keep(xml_paths)
+        xml_paths = selected
+    for xml_file, item in iter_xml_files(xml_paths, cache, item_parser(), failed):
+        log.debug('Loaded gameitem from %s', xml_file)
         item['xml_file_name'] = xml_file.name
-        items.append(item)
+        cnt += 1
+        yield item
+
+    log.info('Found %s items', cnt)
 
-    log.info('Found %s items', len(items))
 
-    return items
+def load_items(cache: ParseCache | None = None,
+               xml_paths: list[Path] | None = None,
+               selection: Selection | None = None) -> list[OrderedDict]:
+    return list(iter_items(cache, xml_paths, selection))
 
 
-def process_items(items: list[OrderedDict]) -> list[OrderedDict]:
-    clean_items = []
+# fields kept as tuples for other outputs than the CSV file and the tables
+_STRUCTURED_FIELDS = ('LootList',)
+
+
+def _dropped_item_fields() -> set[str]:
+    """Get the fields removed from the CSV file that are not needed otherwise either."""
+    conf = get_conf()
+    used = {'Category', *conf.game_items.order_by}
+    for fields in conf.game_items.order_by_category.values():
+        used.update(fields)
+    used.update(conf.game_items.steam_tables.default_columns)
+    for table in conf.game_items.steam_tables.tables:
+        used.update(table.columns or ())
+    return set(conf.game_items.remove_keys) - used
+
+
+# fields that are not written, but read while processing the items
+_PROCESSED_ITEM_FIELDS = {'LootableFromLocations', 'Scarcity'}
+
+
+def item_parser() -> XmlParser:
+    """Make the parser of the item files, which leaves out the fields dropped anyway."""
+    conf = get_conf()
+    skip: set[str] = set()
+    if conf.parser.filter_fields:
+        skip = _dropped_item_fields() - _PROCESSED_ITEM_FIELDS
+        skip.difference_update(*map(rule_fields, conf.game_items.rules))
+    return XmlParser(conf.parser.backend, record_depth=1, skip=skip)
+
+
+def process_items(items: Iterable[OrderedDict],
+                  selection: Selection | None = None) -> RecordTable:
+    conf = get_conf()
+    rules = RuleSet(conf.game_items.rules)
+    clean_items = RecordTable(drop=_dropped_item_fields(), sort_key=item_sort_key())
     for xml in items:
         # identify type
         if 'EquipmentPrototype' in xml:
@@ -86,142 +197,215 @@ def process_items(items: list[OrderedDict]) -> list[OrderedDict]:
             log.warning('Adding property NativeName to %s', xml['xml_file_name'])
             item['NativeName'] = xml['xml_file_name']
 
-        # re-organise some categories
-        if item['Category'] == '5:Food/Seeds':
-            item['Category'] = '5:Seeds'
-        elif item['Category'] == '4:Clothing/Backpacks':
-            item['Category'] = '4:Backpacks'
-
-        # relocate some items to another category
-        if item['NativeName'] in 'Sugar':
-            item['Category'] = '5:Food/Dishes'
-        elif item['NativeName'] in 'Urine':
-            item['Category'] = '5:Food/Drink'
+        # the configured rules normalise the fields
+        rules.apply(item)
+        if selection is not None and not selection.item_selected(item):
+            continue
 
-        # make friendly loot location strings
+        # make friendly loot location strings, keeping the structure for other outputs
+        item['LootList'] = loot_list(item)
         item['LootLocations'] = lootloc_str(item)
 
-        # flatten some lists
-        if 'GiftFor' in item and item['GiftFor']:
-            if isinstance(item['GiftFor']['string'], list):
-                item['GiftFor'] = ', '.join(item['GiftFor']['string'])
-            else:
-                item['GiftFor'] = item['GiftFor']['string']
-        if 'BadGiftFor' in item and item['BadGiftFor']:
-            if isinstance(item['BadGiftFor']['string'], list):
-                item['BadGiftFor'] = ', '.join(item['BadGiftFor']['string'])
-            else:
-                item['BadGiftFor'] = item['BadGiftFor']['string']
-        if 'FoodForAnimal' in item and item['FoodForAnimal']:
-            if isinstance(item['FoodForAnimal']['BaseObjectType'], list):
-                item['FoodForAnimal'] = ', '.join(item['FoodForAnimal']['BaseObjectType'])
-            else:
-                item['FoodForAnimal'] = item['FoodForAnimal']['BaseObjectType']
-        if 'AmmoTypes' in item and item['AmmoTypes']:
-            if isinstance(item['AmmoTypes']['string'], list):
-                item['AmmoTypes'] = ', '.join(item['AmmoTypes']['string'])
-            else:
-                item['AmmoTypes'] = item['AmmoTypes']['string']
-
-        # make friendly skill bonus strings
-        if 'SkillBonus' in item:
-            item['SkillBonus'] = item['SkillBonus'] + ' ' + item['SkillBonusType']
-
-        # add property at level 5 skill level strings
-        if 'DamageBonusPerSkillLevel' in item:
-            dmg_l5 = float(item['Damage']) + 5 * float(item['DamageBonusPerSkillLevel'])
-            item['Damage'] = f'{float(item["Damage"]):.2f} / {dmg_l5:.2f}'
-        if 'RangeBonusPerSkillLevel' in item:
-            rg_l5 = float(item['Range']) + 5 * float(item['RangeBonusPerSkillLevel'])
-            item['Range'] = f'{item["Range"]} / {rg_l5:.0f}'
-        if 'AccurateRangeBonusPerSkillLevel' in item:
-            rg_l5 = float(item['AccurateRange']) + 5 * float(
-                item['AccurateRangeBonusPerSkillLevel'])
-            item['AccurateRange'] = f'{item["AccurateRange"]} / {rg_l5:.0f}'
-        if 'CarryWeightBonusPerSkillLevel' in item:
-            rg_l5 = float(
-                item['CarryWeight']) + 5 * float(item['CarryWeightBonusPerSkillLevel'])
-            item['CarryWeight'] = f'{item["CarryWeight"]} / {rg_l5:.0f}'
-
-        # merge /item and /floz columns
-        if 'BasePricePerFlOz' in item:
-            item['BasePrice'] = item['BasePricePerFlOz'] + ' / FlOz'
-        if 'NutritionPerFlOz' in item:
-            item['Nutrition'] = item['NutritionPerFlOz'] + ' / FlOz'
-        if 'SkillOnConsumptionProgression' in item:
-            item['SkillOnConsumption'] = (item['SkillOnConsumptionProgression'] + ' ' +
-                                          item['SkillOnConsumptionType'])
-        elif 'SkillOnConsumptionProgressionPerFlOz' in item:
-            item['SkillOnConsumption'] = (item['SkillOnConsumptionProgressionPerFlOz'] +
-                                          ' ' + item['SkillOnConsumptionType'] +
-                                          ' / FlOz')
-
+        # the parsed file is not kept, only the fields of the item that are used
         clean_items.append(item)
 
     return clean_items
 
 
-def save_items_as_csv(items: list[OrderedDict], filename: str) -> None:
-    """Write data to CSV file."""
+def item_fields(items: Sequence[Mapping]) -> list[str]:
+    """Get the fields of the items that are exported, in the order they are first found.
+
+    This is the same order in every run, since the item files are read in sorted
+    order.
+    """
+    conf = get_conf()
+    if isinstance(items, RecordTable):
+        all_keys = items.columns
+    else:
+        all_keys = list(dict.fromkeys(key for item in items for key in item))
+    remove_keys = {*conf.game_items.remove_keys, *_STRUCTURED_FIELDS}
+    return [key for key in all_keys if key not in remove_keys]
+
+
+def save_items_as_csv(items: Sequence[Mapping], filename: str) -> None:
+    """Write data to CSV file, with the columns in the order of item_fields()."""
     csv_path = Path(filename)
     csv_path.parent.mkdir(parents=True, exist_ok=True)
     log.info('Writing CSV to %s', csv_path.name)
 
-    with csv_path.open('w', newline='\n') as csv_file:
-        all_keys = set().union(*(d.keys() for d in items))
-        export_keys = all_keys - set(conf.game_items.remove_keys)
+    write_csv(csv_path, item_fields(items), items)
+
+
+def route_items(items: Iterable[Mapping], tables: list) -> list[list[Mapping]]:
+    """Distribute items over the tables they belong in, in a single pass.
+
+    An item goes in every table whose Category is a prefix of the item's Category,
+    in the original order. Matching tables are looked up once per distinct Category.
+    """
+    by_prefix: dict[str, list[int]] = {}
+    for i, table in enumerate(tables):
+        by_prefix.setdefault(table.Category, []).append(i)
 
-        writer = csv.DictWriter(csv_file, fieldnames=export_keys, extrasaction='ignore')
-        writer.writeheader()
-        writer.writerows(items)
+    buckets: list[list[Mapping]] = [[] for _ in tables]
+    matches: dict[str, list[int]] = {}
+    for item in items:
+        cat = item['Category']
+        if cat not in matches:
+            # the tables of each prefix of the Category, including the Category
+            found = (by_prefix.get(cat[:n], ()) for n in range(len(cat) + 1))
+            matches[cat] = sorted(i for indices in found for i in indices)
+        for i in matches[cat]:
+            buckets[i].append(item)
 
+    return buckets
 
-def save_items_as_steamml(items: list[OrderedDict], filename: str) -> int:
+
+def render_item_tables(
+        items: Iterable[Mapping],
+        table_cache: TableCache | None = None,
+        selection: Selection | None = None) -> tuple[list[str | None], int]:
+    """Render the item tables, or None for the tables that are not selected."""
+    conf = get_conf()
     cnt_added = 0
 
+    tables = conf.game_items.steam_tables.tables
+    buckets = route_items(items, tables)
+
+    markups: list[str | None] = []
+    for table, table_items in zip(tables, buckets, strict=True):
+        if selection is not None and not selection.item_table_selected(table):
+            markups.append(None)
+            continue
+        log.debug('Making table %s', table.Category)
+        cols = (table.columns
+                if table.columns else conf.game_items.steam_tables.default_columns)
+
+        for item in table_items:
+            log.debug('%s goes in %s', item['NativeName'], table.Category)
+        cnt_added += len(table_items)
+
+        digest = ''
+        markup = None
+        if table_cache is not None:
+            digest = table_digest(cols, table_items)
+            markup = table_cache.get(digest)
+        if markup is None:
+            markup = render_table(cols, table_items)
+        if table_cache is not None:
+            table_cache.add(digest, markup)
+        markups.append(markup)
+
+    log.info('Matched %s items with a table', cnt_added)
+
+    return markups, cnt_added
+
+
+def render_items_steamml(items: Iterable[Mapping],
+                         table_cache: TableCache | None = None) -> tuple[str, int]:
+    """Render the item tables, reusing unchanged tables from table_cache if given.
+
+    Returns the Steam markup and the number of items added to the tables.
+    """
+    markups, cnt_added = render_item_tables(items, table_cache)
+    return ''.join(markup for markup in markups if markup is not None), cnt_added
+
+
+def save_items_as_steamml(items: Iterable[Mapping],
+                          filename: str,
+                          table_cache: TableCache | None = None,
+                          selection: Selection | None = None) -> int:
+    """Write the item tables, reusing unchanged tables from table_cache if given.
+
+    With a selection, only the selected tables are replaced in the file.
+    """
     markup_path = Path(filename)
     markup_path.parent.mkdir(parents=True, exist_ok=True)
     log.info('Writing Steam markup to %s', markup_path.name)
 
-    with markup_path.open('w') as markup_buff:
-        for table in conf.game_items.steam_tables.tables:
-            log.debug('Making table %s', table.Category)
-            cols = (table.columns
-                    if table.columns else conf.game_items.steam_tables.default_columns)
-
-            # table start and header row
-            markup_buff.write('[table]\n')
-            markup_buff.write(' [tr]\n')
-            for val in cols.values():
-                markup_buff.write(f'  [th]{val}[/th]\n')
-            markup_buff.write(' [/tr]\n')
-
-            for item in items:
-                # add item to the right table
-                if item['Category'].startswith(table.Category):
-                    log.debug('%s goes in %s', item['NativeName'], table.Category)
-                    cnt_added += 1
-                    markup_buff.write(' [tr]\n')
-                    for col in cols:
-                        val = expand_names(item.get(col, ''))
-                        markup_buff.write(f'  [td]{val}[/td]\n')
-                    markup_buff.write(' [/tr]\n')
-
-            markup_buff.write('[/table]\n\n')
-
-    log.info('Matched %s items with a table', cnt_added)
+    markups, cnt_added = render_item_tables(items, table_cache, selection)
+    if selection is not None and selection.items_partial:
+        if all(markup is None for markup in markups):
+            log.warning('No item table has only selected items')
+        markup = splice_tables(markup_path, markups)
+    else:
+        markup = ''.join(markup for markup in markups if markup is not None)
+    markup_path.write_text(markup)
 
     return cnt_added
 
 
-def extract_items(version: str) -> None:
-    items = load_items()
-    items_proc = process_items(items)
-    items_proc.sort(key=item_cmp)
-    save_items_as_csv(items_proc, conf.game_items.csv_file.format(version=version))
-    found_cnt = save_items_as_steamml(items_proc,
-                                      conf.game_items.steam_file.format(version=version))
-    if len(items) != found_cnt:
-        log.warning(
-            'Only %s out of %s items have been saved/skipped. '
-            'Are there new Categories?', found_cnt, len(items))
+def extract_items(version: str,
+                  conf: 'Config | None' = None,
+                  cache: ParseCache | None = None) -> None:
+    """Extract the items of a game version.
+
+    Uses the given parse cache, which may be kept in memory between calls, instead
+    of opening the parse cache of the version. With a selection configured, only
+    the selected tables of the Steam markup file are written.
+    """
+    with use_config(conf) as cfg:
+        csv_path = Path(cfg.game_items.csv_file.format(version=version))
+        steam_path = Path(cfg.game_items.steam_file.format(version=version))
+
+        all_paths = item_files(selected=False)
+        xml_paths = selected_files(all_paths)
+        left_out = sorted(set(all_paths).difference(xml_paths))
+        selection = load_selection()
+        selection.leave_out_item_files(left_out)
+        partial = selection.items_partial
+        if partial and not xml_paths:
+            log.warning('None of the selected files are item files')
+            return
+        if partial:
+            log.info('Extracting the selected items, only their tables are written')
+        writers = open_writers(version) if not partial else []
+        manifest = open_manifest('items', version) if not partial else None
+        if manifest is not None:
+            inputs = manifest.digests(xml_paths)
+            config = config_digest(cfg.base_dir, cfg.gamedata_dirs, cfg.replacements,
+                                   cfg.game_items, cfg.outputs)
+            if (manifest.is_current('items', inputs, config, [csv_path, steam_path]) and
+                    all(w.is_written('items') for w in writers)):
+                log.info('Items are up to date')
+                return
+            table_cache = manifest.table_cache('items', config, steam_path)
+        else:
+            table_cache = None
+
+        with profiler.stage('items.load', bytes_in=profiler.size_of(xml_paths)) as st:
+            if cache is None:
+                cache = open_parse_cache('items', version)
+            if cache is not None:
+                cache.keep(left_out)
+            # processed while loading, so that the parsed files are not all kept
+            items_proc = process_items(iter_items(cache, xml_paths, selection), selection)
+            if cache is not None:
+                cache.save()
+            st.rows_out = len(items_proc)
+        with profiler.stage('items.sort', rows_in=len(items_proc)) as st:
+            items_proc.sort()
+            st.rows_out = len(items_proc)
+        if not partial:
+            with profiler.stage('items.csv', rows_in=len(items_proc)) as st:
+                save_items_as_csv(items_proc, str(csv_path))
+                st.bytes_out = profiler.size_of([csv_path])
+        with profiler.stage('items.steamml', rows_in=len(items_proc)) as st:
+            found_cnt = save_items_as_steamml(items_proc, str(steam_path), table_cache,
+                                              selection)
+            st.rows_out = found_cnt
+            st.bytes_out = profiler.size_of([steam_path])
+        for writer in writers:
+            with profiler.stage(f'items.{writer.format}', rows_in=len(items_proc)) as st:
+                writer.write('items', item_tables(items_proc, item_fields(items_proc)))
+                st.bytes_out = profiler.size_of(writer.paths('items'))
+        # with a selection, the tables that are not selected have not been counted
+        if not partial and len(items_proc) != found_cnt:
+            log.warning(
+                'Only %s out of %s items have been saved/skipped. '
+                'Are there new Categories?', found_cnt, len(items_proc))
+
+        if manifest is not None and table_cache is not None:
+            log.info('Reused %s out of %s item tables', table_cache.reused,
+                     len(table_cache.tables))
+            manifest.record('items', inputs, config, [csv_path, steam_path], table_cache)
+            manifest.save()
@@ -0,0 +1,141 @@
+"""Manifest of the inputs and config that output files were generated from."""
+
+import hashlib
+import json
+import logging
+from pathlib import Path
+from typing import Any
+
+from .cache import file_digest
+from .config import _project_info, get_conf, path2str
+
+log = logging.getLogger(__name__)
+
+# bump when the layout of the manifest changes
+_MANIFEST_FORMAT = 1
+
+
+def config_digest(*sections: Any) -> str:  # noqa: ANN401
+    """Hash the config sections that affect an output.
+
+    The version of the extractor is included, as processing may change with it.
+    """
+    version = _project_info()[0]
+    data = json.dumps([version, *path2str(list(sections))], sort_keys=True, default=str)
+    return hashlib.sha256(data.encode()).hexdigest()
+
+
+def table_digest(cols: dict[str, str], rows: list[dict]) -> str:
+    """Hash the cells of a Steam markup table before names are expanded."""
+    h = hashlib.sha256(repr(list(cols.items())).encode())
+    for row in rows:
+        h.update(repr([row.get(col, '') for col in cols]).encode())
+    return h.hexdigest()
+
+
+class TableCache:
+    """Markup of the tables of a previous run, by the digest of their content."""
+
+    def __init__(self, previous: dict[str, str] | None = None) -> None:
+        self.previous = previous or {}
+        self.tables: list[tuple[str, int]] = []
+        self.reused = 0
+
+    def get(self, digest: str) -> str | None:
+        markup = self.previous.get(digest)
+        if markup is not None:
+            self.reused += 1
+        return markup
+
+    def add(self, digest: str, markup: str) -> None:
+        self.tables.append((digest, len(markup)))
+
+
+class Manifest:
+    """Input file hashes, config hash and table hashes per pipeline stage."""
+
+    def __init__(self, manifest_path: Path) -> None:
+        self.manifest_path = manifest_path
+        self.stages: dict[str, dict] = {}
+        self._files: dict[str, list] = {}
+        if manifest_path.exists():
+            try:
+                data = json.loads(manifest_path.read_text())
+            except (OSError, ValueError) as err:
+                log.warning('Ignoring unreadable manifest %s: %s', manifest_path, err)
+                return
+            if data.get('format') == _MANIFEST_FORMAT:
+                self.stages = data['stages']
+                self._files = data['files']
+
+    def digests(self, paths: list[Path]) -> dict[str, str]:
+        """Hash files, skipping files whose mtime and size have not changed."""
+        digests = {}
+        for path in paths:
+            key = str(path)
+            st = path.stat()
+            known = self._files.get(key)
+            if known and known[0] == st.st_mtime_ns and known[1] == st.st_size:
+                digests[key] = known[2]
+            else:
+                digests[key] = file_digest(path)
+                self._files[key] = [st.st_mtime_ns, st.st_size, digests[key]]
+        return digests
+
+    def is_current(self, stage: str, inputs: dict[str, str], config: str,
+                   outputs: list[Path]) -> bool:
+        """Check if the outputs of a stage were generated from the same inputs."""
+        prev = self.stages.get(stage)
+        if not prev or prev['config'] != config or prev['inputs'] != inputs:
+            return False
+        if any(not p.exists() for p in outputs):
+            return False
+        return prev['outputs'] == self.digests(outputs)
+
+    def table_cache(self, stage: str, config: str, steam_path: Path) -> TableCache:
+        """Get the tables of the previous Steam markup file, if it can be reused."""
+        prev = self.stages.get(stage)
+        if not prev or prev['config'] != config or not steam_path.exists():
+            return TableCache()
+        key = str(steam_path)
+        if self.digests([steam_path]).get(key) != prev['outputs'].get(key):
+            log.info('%s was modified, regenerating all tables', steam_path.name)
+            return TableCache()
+
+        markup = steam_path.read_text()
+        previous = {}
+        pos = 0
+        for digest, length in prev['tables']:
+            previous[digest] = markup[pos:pos + length]
+            pos += length
+        if pos != len(markup):
+            return TableCache()
+        return TableCache(previous)
+
+    def record(self, stage: str, inputs: dict[str, str], config: str, outputs: list[Path],
+               tables: TableCache) -> None:
+        self.stages[stage] = {
+            'config': config,
+            'inputs': inputs,
+            'outputs': self.digests(outputs),
+            'tables': tables.tables,
+        }
+
+    def save(self) -> None:
+        stages = self.stages.values()
+        live = {key for s in stages for key in [*s['inputs'], *s['outputs']]}
+        files = {k: v for k, v in self._files.items() if k in live}
+        data = {'format': _MANIFEST_FORMAT, 'stages': self.stages, 'files': files}
+        self.manifest_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.manifest_path.with_suffix('.tmp')
+        tmp_path.write_text(json.dumps(data, indent=1))
+        tmp_path.replace(self.manifest_path)
+
+
+def open_manifest(name: str, version: str) -> Manifest | None:
+    """Open the manifest called name for a game version, if incremental mode is on."""
+    conf = get_conf()
+    if not conf.incremental.enabled:
+        return None
+    manifest_file = conf.incremental.manifest_file.format(version=version, name=name)
+    return Manifest(Path(manifest_file))
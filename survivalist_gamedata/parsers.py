@@ -0,0 +1,125 @@
+"""Parsers turning XML documents into nested dicts shaped like xmltodict's.
+
+The backends give the same dicts: attributes as '@name' keys, text next to
+attributes or children as '#text', repeated elements as lists and empty elements
+as None. Namespace prefixes are kept as they are in the document.
+"""
+
+import hashlib
+import logging
+import xml.etree.ElementTree as ET
+from collections.abc import Iterable
+from typing import Any
+
+import xmltodict
+
+from .common import ExtractsError
+from .xmlstream import _XML_NS, _qname, element_to_dict
+
+log = logging.getLogger(__name__)
+
+BACKENDS = ('xmltodict', 'etree', 'lxml')
+
+
+class XmlParser:
+    """Parses XML documents with a backend, optionally keeping only some fields.
+
+    The fields are the children and attributes of the elements at record_depth,
+    where the root element is at depth 1. Fields in skip, or not in keep if it is
+    given, are left out, and are not converted to dicts at all by the etree and
+    lxml backends.
+    """
+
+    def __init__(self,
+                 backend: str = 'xmltodict',
+                 record_depth: int = 1,
+                 keep: Iterable[str] | None = None,
+                 skip: Iterable[str] = ()) -> None:
+        if backend not in BACKENDS:
+            msg = f'Unknown XML parser {backend}, use one of {", ".join(BACKENDS)}'
+            raise ExtractsError(msg)
+        if backend == 'lxml':
+            try:
+                import lxml.etree  # type: ignore  # noqa: F401, PGH003
+            except ImportError as err:
+                msg = 'The lxml XML parser is not installed, install it with pip'
+                raise ExtractsError(msg) from err
+        self.backend = backend
+        self.record_depth = record_depth
+        self.keep = frozenset(keep) if keep is not None else None
+        self.skip = frozenset(skip)
+
+    @property
+    def filtered(self) -> bool:
+        return self.keep is not None or bool(self.skip)
+
+    @property
+    def key(self) -> str:
+        """Identifies the shape of the parsed documents.
+
+        The backend is left out, as it does not change the shape.
+        """
+        if not self.filtered:
+            return ''
+        keep = sorted(self.keep) if self.keep is not None else None
+        fields = repr((self.record_depth, keep, sorted(self.skip)))
+        return hashlib.sha256(fields.encode()).hexdigest()[:16]
+
+    def wanted(self, name: str) -> bool:
+        return name not in self.skip and (self.keep is None or name in self.keep)
+
+    def parse(self, data: bytes) -> dict:
+        if self.backend == 'xmltodict':
+            return self._parse_xmltodict(data)
+        if self.backend == 'lxml':
+            import lxml.etree  # type: ignore  # noqa: PGH003
+
+            pull = lxml.etree.XMLPullParser(events=('start-ns', 'start'),
+                                            remove_comments=True,
+                                            remove_pis=True)
+        else:
+            pull = ET.XMLPullParser(events=('start-ns', 'start'))
+        pull.feed(data)
+        # raises on a truncated document
+        pull.close()
+        return self._parse_etree(pull.read_events())
+
+    def _parse_xmltodict(self, data: bytes) -> dict:
+        if not self.filtered:
+            return xmltodict.parse(data)
+
+        depth = self.record_depth
+        wanted = self.wanted
+
+        def postprocessor(path: list, key: str, value: object) -> tuple | None:
+            # called with the path to an element for its attributes and its text,
+            # and with the path to a child for the child
+            level = len(path)
+            if ((level == depth and key[0] == '@') or
+                (level == depth + 1 and key[0] not in '@#')) and not wanted(key):
+                return None
+            return key, value
+
+        return xmltodict.parse(data, postprocessor=postprocessor)
+
+    def _parse_etree(self, events: Iterable[tuple[str, Any]]) -> dict:
+        prefixes = {_XML_NS: 'xml'}
+        # namespace declarations by the element they are on
+        ns_decls: dict[Any, list[tuple[str, str]]] = {}
+        declared: list[tuple[str, str]] = []
+        root = None
+        for event, obj in events:
+            if event == 'start-ns':
+                prefix, uri = obj
+                prefixes[uri] = prefix
+                declared.append((prefix, uri))
+            else:
+                if root is None:
+                    root = obj
+                if declared:
+                    ns_decls[obj] = declared
+                    declared = []
+
+        wanted = self.wanted if self.filtered else None
+        doc = element_to_dict(root, prefixes, ns_decls, wanted, self.record_depth - 1)
+        return {_qname(root.tag, prefixes): doc}
@@ -0,0 +1,124 @@
+"""Timing and memory instrumentation of the pipeline stages."""
+
+import cProfile
+import logging
+import sys
+import time
+import tracemalloc
+from collections.abc import Iterable, Iterator
+from contextlib import contextmanager
+from dataclasses import dataclass
+from pathlib import Path
+
+try:
+    import resource
+except ImportError:  # not available on Windows
+    resource = None  # type: ignore[assignment]
+
+log = logging.getLogger(__name__)
+
+
+@dataclass
+class StageStats:
+    name: str
+    wall: float = 0.0
+    cpu: float = 0.0
+    peak_bytes: int = 0
+    max_rss_bytes: int = 0
+    # None for the stages that read files instead of rows
+    rows_in: int | None = None
+    rows_out: int = 0
+    bytes_in: int = 0
+    bytes_out: int = 0
+
+
+def _summary_line(s: StageStats) -> str:
+    rows_in = '-' if s.rows_in is None else s.rows_in
+    return (f'{s.name:<18}{s.wall:>9.3f}{s.cpu:>9.3f}'
+            f'{s.peak_bytes / 1e6:>9.1f}{s.max_rss_bytes / 1e6:>9.1f}'
+            f'{rows_in:>9}{s.rows_out:>9}'
+            f'{s.bytes_in / 1e3:>9.0f}{s.bytes_out / 1e3:>9.0f}')
+
+
+def _max_rss_bytes() -> int:
+    if resource is None:
+        return 0
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and in kilobytes elsewhere
+    return max_rss if sys.platform == 'darwin' else max_rss * 1024
+
+
+class Profiler:
+    """Collect wall time, CPU time, memory and row and byte counts per stage.
+
+    Stages are only measured while a session is active; otherwise stage() does
+    nothing, so the pipelines can be instrumented unconditionally.
+    """
+
+    def __init__(self) -> None:
+        self.enabled = False
+        self.stages: list[StageStats] = []
+
+    def size_of(self, paths: Iterable[Path]) -> int:
+        """Total size of files, or 0 when not profiling."""
+        if not self.enabled:
+            return 0
+        return sum(p.stat().st_size for p in paths if p.exists())
+
+    @contextmanager
+    def stage(self,
+              name: str,
+              rows_in: int | None = None,
+              bytes_in: int = 0) -> Iterator[StageStats]:
+        stats = StageStats(name, rows_in=rows_in, bytes_in=bytes_in)
+        if not self.enabled:
+            yield stats
+            return
+
+        tracemalloc.reset_peak()
+        mem_start = tracemalloc.get_traced_memory()[0]
+        cpu_start = time.process_time()
+        wall_start = time.perf_counter()
+        try:
+            yield stats
+        finally:
+            stats.wall = time.perf_counter() - wall_start
+            stats.cpu = time.process_time() - cpu_start
+            stats.peak_bytes = max(0, tracemalloc.get_traced_memory()[1] - mem_start)
+            stats.max_rss_bytes = _max_rss_bytes()
+            self.stages.append(stats)
+
+    @contextmanager
+    def session(self, pstats_file: str | None = None) -> Iterator[None]:
+        """Profile the stages run inside this context and log a summary afterwards."""
+        self.enabled = True
+        self.stages = []
+        tracemalloc.start()
+        cprof = cProfile.Profile() if pstats_file else None
+        if cprof:
+            cprof.enable()
+        try:
+            yield
+        finally:
+            if cprof:
+                cprof.disable()
+                Path(pstats_file).parent.mkdir(parents=True, exist_ok=True)
+                cprof.dump_stats(pstats_file)
+                log.info('Profile written to %s', pstats_file)
+            tracemalloc.stop()
+            self.enabled = False
+            for line in self.summary():
+                log.info(line)
+
+    def summary(self) -> list[str]:
+        header = (f"{'stage':<18}{'wall s':>9}{'cpu s':>9}{'peak MB':>9}{'RSS MB':>9}"
+                  f"{'rows in':>9}{'rows out':>9}{'KB in':>9}{'KB out':>9}")
+        lines = [header]
+        lines.extend(_summary_line(s) for s in self.stages)
+        total_wall = sum(s.wall for s in self.stages)
+        total_cpu = sum(s.cpu for s in self.stages)
+        lines.append(f"{'total':<18}{total_wall:>9.3f}{total_cpu:>9.3f}")
+        return lines
+
+
+profiler = Profiler()
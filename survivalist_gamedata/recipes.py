@@ -1,35 +1,123 @@
-import csv
 import logging
+from collections.abc import Iterable, Iterator, Mapping
 from pathlib import Path
+from typing import TYPE_CHECKING, NamedTuple
+
+from .cache import ParseCache, open_parse_cache
+from .common import ExtractsError, iter_xml_files, render_table, splice_tables, write_csv
+from .config import get_conf, use_config
+from .manifest import TableCache, config_digest, open_manifest, table_digest
+from .parsers import XmlParser
+from .profiling import profiler
+from .rules import RuleSet, rule_fields
+from .selection import Selection, load_selection, selected_files
+from .store import RecordTable, leading_number, make_sort_key
+from .writers import open_writers, recipe_tables
+from .xmlstream import iter_elements
+
+if TYPE_CHECKING:
+    from .config import Config
 
-import xmltodict
+log = logging.getLogger(__name__)
 
-from .common import ExtractsError, expand_names
-from .config import conf
 
-log = logging.getLogger(__name__)
+def recipe_files(*, selected: bool = True) -> list[Path]:
+    """Get the recipe files.
+
+    Only those matching the configured file patterns, unless selected is false.
+    """
+    conf = get_conf()
+    xml_files = [Path(conf.base_dir, p, 'Recipes.xml') for p in conf.gamedata_dirs]
+    xml_paths = [xml_file for xml_file in xml_files if xml_file.exists()]
+    return selected_files(xml_paths) if selected else xml_paths
 
 
-def recipes_cmp(rec: dict) -> tuple:
-    return tuple(rec.get(col, '') for col in conf.recipes.order_by)
+def iter_parsed_recipes(cache: ParseCache | None = None,
+                        xml_paths: list[Path] | None = None,
+                        selection: Selection | None = None,
+                        failed: list[Path] | None = None) -> Iterator[dict]:
+    """Yield the recipes of each recipe file as it is loaded.
 
+    The files that cannot be parsed are added to failed, if it is given.
 
-def load_recipes() -> list[dict]:
-    recipes = []
+    With a selection, recipes that cannot be of the selected types are left out.
+    """
+    cnt = 0
 
-    xml_files = [Path(conf.base_dir, p, 'Recipes.xml') for p in conf.gamedata_dirs]
-    for xml_file in xml_files:
-        if xml_file.exists():
-            log.debug('Loading recipes from %s', xml_file)
-            recipes_dict = xmltodict.parse(xml_file.open('rb'))
-            if isinstance(recipes_dict['RecipeList']['Recipes']['Recipe'], list):
-                recipes.extend(recipes_dict['RecipeList']['Recipes']['Recipe'])
-            else:
-                recipes.append(recipes_dict['RecipeList']['Recipes']['Recipe'])
+    if xml_paths is None:
+        xml_paths = recipe_files()
+    for xml_file, recipes_dict in iter_xml_files(xml_paths, cache, recipe_parser(),
+                                                 failed):
+        log.debug('Loaded recipes from %s', xml_file)
+        if isinstance(recipes_dict['RecipeList']['Recipes']['Recipe'], list):
+            recipes = recipes_dict['RecipeList']['Recipes']['Recipe']
+        else:
+            recipes = [recipes_dict['RecipeList']['Recipes']['Recipe']]
+        cnt += len(recipes)
+        if selection is not None:
+            recipes = [rec for rec in recipes if selection.may_select_recipe(rec)]
+        yield from recipes
+
+    log.info('Found %s recipes', cnt)
+
+
+def load_recipes(cache: ParseCache | None = None,
+                 xml_paths: list[Path] | None = None,
+                 selection: Selection | None = None) -> list[dict]:
+    return list(iter_parsed_recipes(cache, xml_paths, selection))
+
+
+def iter_recipes(xml_paths: list[Path] | None = None,
+                 selection: Selection | None = None) -> Iterator[dict]:
+    """Yield recipes one at a time, without holding the recipe files in memory.
+
+    With a selection, recipes that cannot be of the selected types are left out.
+    """
+    cnt = 0
 
-    log.info('Found %s recipes', len(recipes))
+    if xml_paths is None:
+        xml_paths = recipe_files()
+    for xml_file in xml_paths:
+        log.debug('Streaming recipes from %s', xml_file)
+        for rec in iter_elements(xml_file, ('RecipeList', 'Recipes', 'Recipe')):
+            cnt += 1
+            if selection is None or selection.may_select_recipe(rec):
+                yield rec
 
-    return recipes
+    log.info('Found %s recipes', cnt)
+
+
+class Ingredient(NamedTuple):
+    names: tuple[str, ...]  # the prototypes that can be used, any one of them
+    amount: float
+    liquid: bool
+
+
+def ingredient_list(rec: dict) -> tuple[Ingredient, ...]:
+    """Get the ingredients of a recipe, keeping their structure."""
+    if not rec.get('Ingredients') or 'Ingredient' not in rec['Ingredients']:
+        return ()
+    ingrs = rec['Ingredients']['Ingredient']
+    if isinstance(ingrs, dict):
+        ingrs = [ingrs]
+
+    ingr_list = []
+    for ingr in ingrs:
+        if 'PrototypeNames' in ingr:
+            names = ingr['PrototypeNames']['string']
+            amount = ingr.get('Amount')
+            liquid = False
+        elif 'LiquidTypeNames' in ingr:
+            names = ingr['LiquidTypeNames']['string']
+            amount = ingr.get('LiquidAmount')
+            liquid = True
+        else:
+            msg = f'Unexpected ingredient: {ingr}'
+            raise ExtractsError(msg)
+        names = tuple(names) if isinstance(names, list) else (names,)
+        ingr_list.append(Ingredient(names, leading_number(amount) or 1.0, liquid))
+
+    return tuple(ingr_list)
 
 
 def stringify_ingredients(rec: dict) -> str:
@@ -57,113 +145,267 @@ def stringify_ingredients(rec: dict) -> str:
     return ingr_str.replace("'", '')
 
 
-def process_recipes(recipes: list[dict]) -> list[dict]:
+def _kept_recipe_fields() -> set[str]:
+    """Get the fields used for the CSV file, the tables, sorting and cross-referencing."""
+    conf = get_conf()
+    kept = {'UniqueID', 'SkillType', 'RecipeType', 'Deprecated'}
+    kept.update(('ProductPrototypeName', 'ProductAmount', 'IngredientList'))
+    kept.update(conf.recipes.csv_fields, conf.recipes.order_by)
+    kept.update(conf.recipes.steam_tables.default_columns)
+    for table in conf.recipes.steam_tables.tables:
+        kept.update(table.columns or ())
+    return kept
+
+
+def recipe_parser() -> XmlParser:
+    """Make the parser of the recipe files, keeping only the fields that are used."""
+    conf = get_conf()
+    keep = None
+    if conf.parser.filter_fields:
+        # the ingredients are read while processing the recipes
+        keep = {*_kept_recipe_fields(), 'Ingredients'}
+        keep.update(*map(rule_fields, conf.recipes.rules))
+    return XmlParser(conf.parser.backend, record_depth=3, keep=keep)
+
+
+def process_recipes(recipes: Iterable[dict],
+                    selection: Selection | None = None) -> RecordTable:
+    conf = get_conf()
+    recipes_proc = RecordTable(keep=_kept_recipe_fields(),
+                               sort_key=make_sort_key(conf.recipes.order_by))
+    rules = RuleSet(conf.recipes.rules)
     for rec in recipes:
-        # Make product name field consistent
-        if 'ProductPrototypeName' not in rec and 'ProductType' in rec:
-            rec['ProductPrototypeName'] = rec['ProductType']
-        elif 'ProductPrototypeName' not in rec and 'ProductLiquidPrototypeName' in rec:
-            rec['ProductPrototypeName'] = rec['ProductLiquidPrototypeName']
+        # the configured rules make the product fields consistent, among others
+        rules.apply(rec)
+
+        # Ensure RecipeType and SkillLevel are set
+        if 'RecipeType' not in rec or not rec['RecipeType']:
+            rec['RecipeType'] = 'Inventory'
+        if 'SkillLevel' not in rec or not rec['SkillLevel']:
+            rec['SkillLevel'] = '0'
+
+        if selection is not None and not selection.recipe_selected(rec):
+            continue
 
         # Missing ProductPrototypeName fix for Infect AntiqueKatana
         if 'ProductPrototypeName' not in rec:
             log.warning('Adding property ProductPrototypeName to %s', rec['UniqueID'])
             rec['ProductPrototypeName'] = 'Product?'
 
-        # Make product amount field consistent
-        if 'ProductAmount' not in rec and 'ProductLiquidAmount' in rec:
-            rec['ProductAmount'] = rec['ProductLiquidAmount'] + ' FlOz'
-
         rec['Product'] = rec['ProductPrototypeName']
         if 'ProductAmount' in rec and rec['ProductAmount']:
             rec['Product'] += f" ({rec['ProductAmount']})"
 
-        # Stringify ingredients list
+        # Stringify ingredients list, keeping the structure for cross-referencing
+        rec['IngredientList'] = ingredient_list(rec)
         rec['Ingredients'] = stringify_ingredients(rec)
 
-        # Ensure RecipeType and SkillLevel are set
-        if 'RecipeType' not in rec or not rec['RecipeType']:
-            rec['RecipeType'] = 'Inventory'
-        if 'SkillLevel' not in rec or not rec['SkillLevel']:
-            rec['SkillLevel'] = '0'
-
-        # Simplify RecipeType in some cases
-        if rec['RecipeType'].startswith('Campfire_SpitRoast'):
-            rec['RecipeType'] = 'Campfire'
+        recipes_proc.append(rec)
 
-    return recipes
+    return recipes_proc
 
 
-def save_recipes_as_csv(recipes: list[dict], filename: str) -> None:
+def save_recipes_as_csv(recipes: Iterable[Mapping], filename: str) -> None:
+    conf = get_conf()
     csv_path = Path(filename)
     csv_path.parent.mkdir(parents=True, exist_ok=True)
     log.info('Writing CSV to %s', csv_path.name)
 
-    with csv_path.open('w', newline='\n') as csv_file:
-        writer = csv.DictWriter(csv_file,
-                                fieldnames=conf.recipes.csv_fields,
-                                extrasaction='ignore')
-        writer.writeheader()
-        writer.writerows(recipes)
+    write_csv(csv_path, conf.recipes.csv_fields, recipes)
+
 
+def route_recipes(recipes: Iterable[Mapping], tables: list) -> list[list[Mapping]]:
+    """Distribute recipes over the tables they belong in, in a single pass.
 
-def save_recipes_as_steamml(recipes: list[dict], filename: str) -> int:
+    Tables are looked up by (SkillType, RecipeType), where a table's RecipeType
+    may be '*'. A recipe goes in every table it matches, in the original order.
+    """
+    by_type: dict[tuple[str, str], list[int]] = {}
+    for i, table in enumerate(tables):
+        by_type.setdefault((table.SkillType, table.RecipeType), []).append(i)
+
+    buckets: list[list[Mapping]] = [[] for _ in tables]
+    matches: dict[tuple[str, str], list[int]] = {}
+    for rec in recipes:
+        key = (rec['SkillType'], rec['RecipeType'])
+        if key not in matches:
+            matches[key] = sorted({
+                *by_type.get(key, ()),
+                *by_type.get((key[0], '*'), ()),
+            })
+        for i in matches[key]:
+            buckets[i].append(rec)
+
+    return buckets
+
+
+def render_recipe_tables(
+        recipes: Iterable[Mapping],
+        table_cache: TableCache | None = None,
+        selection: Selection | None = None) -> tuple[list[str | None], int]:
+    """Render the recipe tables, or None for the tables that are not selected."""
+    conf = get_conf()
     cnt_added = 0
     cnt_depr = 0
 
-    markup_path = Path(filename)
-    markup_path.parent.mkdir(parents=True, exist_ok=True)
-    log.info('Writing Steam markup to %s', markup_path.name)
-
-    with markup_path.open('w') as markup_buff:
-        for table in conf.recipes.steam_tables.tables:
-            table_id = f'{table.SkillType}/{table.RecipeType}'
-            log.debug('Making table %s', table_id)
-            cols = (table.columns
-                    if table.columns else conf.recipes.steam_tables.default_columns)
-
-            # table start and header row
-            markup_buff.write('[table]\n')
-            markup_buff.write(' [tr]\n')
-            for val in cols.values():
-                markup_buff.write(f'  [th]{val}[/th]\n')
-            markup_buff.write(' [/tr]\n')
-
-            for rec in recipes:
-                # add recipe to the right table
-                if table.SkillType == rec['SkillType'] and (table.RecipeType
-                                                            in ('*', rec['RecipeType'])):
-                    # skip deprecated recipes
-                    if conf.recipes.skip_deprecated and 'Deprecated' in rec and (
-                            rec['Deprecated'] == 'true'):
-                        cnt_depr += 1
-                        log.debug('Skipping deprecated recipe %s', rec['UniqueID'])
-                        continue
-
-                    log.debug('%s goes in %s', rec['UniqueID'], table_id)
-                    cnt_added += 1
-                    markup_buff.write(' [tr]\n')
-                    for col in cols:
-                        val = expand_names(rec.get(col, ''))
-                        markup_buff.write(f'  [td]{val}[/td]\n')
-                    markup_buff.write(' [/tr]\n')
-
-            markup_buff.write('[/table]\n\n')
+    tables = conf.recipes.steam_tables.tables
+    buckets = route_recipes(recipes, tables)
+
+    markups: list[str | None] = []
+    for table, table_recipes in zip(tables, buckets, strict=True):
+        if selection is not None and not selection.recipe_table_selected(table):
+            markups.append(None)
+            continue
+        table_id = f'{table.SkillType}/{table.RecipeType}'
+        log.debug('Making table %s', table_id)
+        cols = (table.columns
+                if table.columns else conf.recipes.steam_tables.default_columns)
+
+        rows = []
+        for rec in table_recipes:
+            # skip deprecated recipes
+            if conf.recipes.skip_deprecated and rec.get('Deprecated') == 'true':
+                cnt_depr += 1
+                log.debug('Skipping deprecated recipe %s', rec['UniqueID'])
+                continue
+
+            log.debug('%s goes in %s', rec['UniqueID'], table_id)
+            cnt_added += 1
+            rows.append(rec)
+
+        digest = ''
+        markup = None
+        if table_cache is not None:
+            digest = table_digest(cols, rows)
+            markup = table_cache.get(digest)
+        if markup is None:
+            markup = render_table(cols, rows)
+        if table_cache is not None:
+            table_cache.add(digest, markup)
+        markups.append(markup)
 
     log.info('Matched %s recipes with a table, %s deprecated recipes were skipped',
              cnt_added, cnt_depr)
 
-    return cnt_added + cnt_depr
+    return markups, cnt_added + cnt_depr
+
+
+def render_recipes_steamml(recipes: Iterable[Mapping],
+                           table_cache: TableCache | None = None) -> tuple[str, int]:
+    """Render the recipe tables, reusing unchanged tables from table_cache if given.
+
+    Returns the Steam markup and the number of recipes added to the tables or
+    skipped because they are deprecated.
+    """
+    markups, cnt = render_recipe_tables(recipes, table_cache)
+    return ''.join(markup for markup in markups if markup is not None), cnt
 
 
-def extract_recipes(version: str) -> None:
-    recipes = load_recipes()
-    rcps_proc = process_recipes(recipes)
-    rcps_proc.sort(key=recipes_cmp)
-    save_recipes_as_csv(rcps_proc, conf.recipes.csv_file.format(version=version))
-    found_cnt = save_recipes_as_steamml(rcps_proc,
-                                        conf.recipes.steam_file.format(version=version))
-    if len(recipes) != found_cnt:
-        log.warning(
-            'Only %s out of %s recipes have been saved/skipped. '
-            'Are there new SkillTypes or RecipeTypes?', found_cnt, len(recipes))
+def save_recipes_as_steamml(recipes: Iterable[Mapping],
+                            filename: str,
+                            table_cache: TableCache | None = None,
+                            selection: Selection | None = None) -> int:
+    """Write the recipe tables, reusing unchanged tables from table_cache if given.
+
+    With a selection, only the selected tables are replaced in the file.
+    """
+    markup_path = Path(filename)
+    markup_path.parent.mkdir(parents=True, exist_ok=True)
+    log.info('Writing Steam markup to %s', markup_path.name)
+
+    markups, cnt = render_recipe_tables(recipes, table_cache, selection)
+    if selection is not None and selection.recipes_partial:
+        if all(markup is None for markup in markups):
+            log.warning('No recipe table has only selected recipes')
+        markup = splice_tables(markup_path, markups)
+    else:
+        markup = ''.join(markup for markup in markups if markup is not None)
+    markup_path.write_text(markup)
+
+    return cnt
+
+
+def extract_recipes(version: str,
+                    conf: 'Config | None' = None,
+                    cache: ParseCache | None = None) -> None:
+    """Extract the recipes of a game version.
+
+    Uses the given parse cache, which may be kept in memory between calls, instead
+    of opening the parse cache of the version. With a selection configured, only
+    the selected tables of the Steam markup file are written.
+    """
+    with use_config(conf) as cfg:
+        csv_path = Path(cfg.recipes.csv_file.format(version=version))
+        steam_path = Path(cfg.recipes.steam_file.format(version=version))
+
+        all_paths = recipe_files(selected=False)
+        xml_paths = selected_files(all_paths)
+        left_out = [path for path in all_paths if path not in xml_paths]
+        selection = load_selection()
+        selection.leave_out_recipe_files(left_out)
+        partial = selection.recipes_partial
+        if partial and not xml_paths:
+            log.warning('None of the selected files are recipe files')
+            return
+        if partial:
+            log.info('Extracting the selected recipes, only their tables are written')
+        writers = open_writers(version) if not partial else []
+        manifest = open_manifest('recipes', version) if not partial else None
+        if manifest is not None:
+            inputs = manifest.digests(xml_paths)
+            config = config_digest(cfg.base_dir, cfg.gamedata_dirs, cfg.replacements,
+                                   cfg.recipes, cfg.outputs)
+            if (manifest.is_current('recipes', inputs, config, [csv_path, steam_path]) and
+                    all(w.is_written('recipes') for w in writers)):
+                log.info('Recipes are up to date')
+                return
+            table_cache = manifest.table_cache('recipes', config, steam_path)
+        else:
+            table_cache = None
+
+        if cfg.recipes.streaming:
+            with profiler.stage('recipes.stream',
+                                bytes_in=profiler.size_of(xml_paths)) as st:
+                rcps_proc = process_recipes(iter_recipes(xml_paths, selection), selection)
+                st.rows_out = len(rcps_proc)
+        else:
+            with profiler.stage('recipes.load',
+                                bytes_in=profiler.size_of(xml_paths)) as st:
+                if cache is None:
+                    cache = open_parse_cache('recipes', version)
+                if cache is not None:
+                    cache.keep(left_out)
+                # processed while loading, so that the parsed files are not all kept
+                rcps_proc = process_recipes(
+                    iter_parsed_recipes(cache, xml_paths, selection), selection)
+                if cache is not None:
+                    cache.save()
+                st.rows_out = len(rcps_proc)
+        with profiler.stage('recipes.sort', rows_in=len(rcps_proc)) as st:
+            rcps_proc.sort()
+            st.rows_out = len(rcps_proc)
+        if not partial:
+            with profiler.stage('recipes.csv', rows_in=len(rcps_proc)) as st:
+                save_recipes_as_csv(rcps_proc, str(csv_path))
+                st.bytes_out = profiler.size_of([csv_path])
+        with profiler.stage('recipes.steamml', rows_in=len(rcps_proc)) as st:
+            found_cnt = save_recipes_as_steamml(rcps_proc, str(steam_path), table_cache,
+                                                selection)
+            st.rows_out = found_cnt
+            st.bytes_out = profiler.size_of([steam_path])
+        for writer in writers:
+            with profiler.stage(f'recipes.{writer.format}', rows_in=len(rcps_proc)) as st:
+                writer.write('recipes', recipe_tables(rcps_proc))
+                st.bytes_out = profiler.size_of(writer.paths('recipes'))
+        # with a selection, the tables that are not selected have not been counted
+        if not partial and len(rcps_proc) != found_cnt:
+            log.warning(
+                'Only %s out of %s recipes have been saved/skipped. '
+                'Are there new SkillTypes or RecipeTypes?', found_cnt, len(rcps_proc))
+
+        if manifest is not None and table_cache is not None:
+            log.info('Reused %s out of %s recipe tables', table_cache.reused,
+                     len(table_cache.tables))
+            manifest.record('recipes', inputs, config, [csv_path, steam_path],
+                            table_cache)
+            manifest.save()
@@ -0,0 +1,196 @@
+"""Normalisation rules for the fields of items and recipes, configured in config.yaml.
+
+A rule belongs to a field, and only runs for records that have that field. It can
+replace values of the field (map), flatten a list of child elements of the field
+(join) and set fields to templates filled in with the fields of the record (set).
+With equals, startswith or unless, it only runs for some values of the field, or
+for records without the unless field.
+"""
+
+import logging
+import string
+from collections import ChainMap
+from collections.abc import Callable, Iterator, Mapping, Sequence
+
+from .common import ExtractsError
+
+log = logging.getLogger(__name__)
+
+_Action = Callable[[dict], None]
+
+# the names available to the templates of rules with a level, besides the fields
+_LEVEL_NAMES = ('value', 'leveled')
+
+
+def _template_fields(template: str) -> Iterator[str]:
+    for _, field, _, _ in string.Formatter().parse(template):
+        if field:
+            yield field.split('.', 1)[0].split('[', 1)[0]
+
+
+def _copied_field(template: str) -> str | None:
+    """Get the field a template consists of, without any text or format spec."""
+    parts = list(string.Formatter().parse(template))
+    if len(parts) == 1:
+        text, field, spec, conversion = parts[0]
+        if not text and field and field.isidentifier() and not spec and not conversion:
+            return field
+    return None
+
+
+def rule_fields(rule: Mapping) -> set[str]:
+    """Get the fields a rule reads or writes."""
+    fields = {rule['field']}
+    for key in ('unless', 'of'):
+        if rule.get(key):
+            fields.add(rule[key])
+    for target, template in (rule.get('set') or {}).items():
+        fields.add(target)
+        fields.update(_template_fields(template))
+    if rule.get('level') is not None:
+        fields.difference_update(_LEVEL_NAMES)
+    return fields
+
+
+def _compile_set(rule: Mapping) -> _Action:
+    field = rule['field']
+    level = rule.get('level')
+    of = rule.get('of')
+    templates = list(rule['set'].items())
+
+    if level is not None:
+        if not of:
+            msg = f'Rule for {field} has a level but no field to level up (of)'
+            raise ExtractsError(msg)
+
+        def set_leveled(rec: dict) -> None:
+            value = float(rec[of])
+            names = {'value': value, 'leveled': value + level * float(rec[field])}
+            context = ChainMap(names, rec)
+            for target, template in templates:
+                rec[target] = template.format_map(context)
+
+        return set_leveled
+
+    # a template of a single field copies its value, even if it is not a string
+    copies = [
+        (target, _copied_field(template), template) for target, template in templates
+    ]
+
+    def set_fields(rec: dict) -> None:
+        for target, source, template in copies:
+            rec[target] = rec[source] if source else template.format_map(rec)
+
+    return set_fields
+
+
+def _compile_rule(rule: Mapping) -> _Action:
+    field = rule['field']
+    equals = rule.get('equals')
+    prefix = rule.get('startswith')
+    unless = rule.get('unless')
+
+    steps: list[_Action] = []
+    if rule.get('map'):
+        mapping = dict(rule['map'])
+
+        def remap(rec: dict) -> None:
+            value = rec[field]
+            if isinstance(value, str) and value in mapping:
+                rec[field] = mapping[value]
+
+        steps.append(remap)
+    if rule.get('join'):
+        child = rule['join']
+
+        def join(rec: dict) -> None:
+            # an element without content is None
+            if rec[field]:
+                values = rec[field][child]
+                rec[field] = ', '.join(values) if isinstance(values, list) else values
+
+        steps.append(join)
+    if rule.get('set'):
+        steps.append(_compile_set(rule))
+    if not steps:
+        msg = f'Rule for {field} does nothing, it needs map, join or set'
+        raise ExtractsError(msg)
+
+    def run(rec: dict) -> None:
+        if equals is not None and rec[field] != equals:
+            return
+        if prefix is not None and not (isinstance(rec[field], str) and
+                                       rec[field].startswith(prefix)):
+            return
+        if unless and unless in rec:
+            return
+        for step in steps:
+            step(rec)
+
+    return run
+
+
+class RuleSet:
+    """Rules compiled into a table of the rules to run for each field.
+
+    A record runs the rules of the fields it has when the rules start, in the
+    order they are configured, so rules for fields it does not have cost nothing.
+    """
+
+    def __init__(self, rules: Sequence[Mapping]) -> None:
+        self.rules = list(rules)
+        self.dispatch: dict[str, list[tuple[int, _Action]]] = {}
+        self.fields: set[str] = set()
+        for i, rule in enumerate(rules):
+            self.dispatch.setdefault(rule['field'], []).append((i, _compile_rule(rule)))
+            self.fields.update(rule_fields(rule))
+        log.debug('Compiled %s rules for %s fields', len(rules), len(self.dispatch))
+
+    def apply(self, rec: dict) -> None:
+        """Run the rules of the fields of rec on it."""
+        matched = self.dispatch.keys() & rec.keys()
+        if not matched:
+            return
+        if len(matched) == 1:
+            steps = self.dispatch[matched.pop()]
+        else:
+            steps = sorted(step for field in matched for step in self.dispatch[field])
+        for _, action in steps:
+            action(rec)
+
+    def outcomes(self, field: str, known: Mapping) -> set | None:
+        """Get the values a field may have after the rules ran on a record.
+
+        Only the known fields of the record are given. None is returned if the rules
+        may set the field to any value.
+
+        Rules whose conditions depend on unknown fields are assumed to run.
+        """
+        if not isinstance(known.get(field), str):
+            return None
+        values = {known[field]}
+        for rule in self.rules:
+            if not _may_run(rule, known):
+                continue
+            mapping = rule.get('map')
+            if rule['field'] == field and mapping:
+                values.update([mapping[v] for v in values if v in mapping])
+            template = (rule.get('set') or {}).get(field)
+            if template is not None:
+                if any(_template_fields(template)):
+                    return None
+                values.add(template.format_map({}))
+        return values
+
+
+def _may_run(rule: Mapping, known: Mapping) -> bool:
+    field = rule['field']
+    if rule.get('unless') in known:
+        return False
+    if field not in known:
+        return True
+    value = known[field]
+    if rule.get('equals') is not None and value != rule['equals']:
+        return False
+    return rule.get('startswith') is None or (isinstance(value, str) and
+                                              value.startswith(rule['startswith']))
@@ -0,0 +1,158 @@
+"""Run the recipes and items pipelines, one after the other or concurrently."""
+
+import logging
+import logging.handlers
+import multiprocessing
+import os
+from collections.abc import Callable, Iterator, Sequence
+from concurrent.futures import Future, ProcessPoolExecutor
+from contextlib import contextmanager, nullcontext
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+from .cache import ParseCache
+from .config import get_conf, use_config
+from .items import extract_items
+from .profiling import profiler
+from .recipes import extract_recipes
+from .selection import load_selection
+
+if TYPE_CHECKING:
+    from .config import Config
+
+log = logging.getLogger(__name__)
+
+PIPELINES: dict[str, Callable[..., None]] = {
+    'recipes': extract_recipes,
+    'items': extract_items,
+}
+
+# what a worker process is running, a pipeline or a game version, used to prefix its
+# log messages
+_worker_label = ''
+
+
+class _PipelinePrefix(logging.Filter):
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if _worker_label:
+            # format the message here, the arguments may not be picklable
+            record.msg = f'[{_worker_label}] {record.getMessage()}'
+            record.args = None
+        return True
+
+
+class _Dispatch(logging.Handler):
+    """Hand records from worker processes to the loggers of this process."""
+
+    def emit(self, record: logging.LogRecord) -> None:
+        logging.getLogger(record.name).handle(record)
+
+
+def _init_worker(queue: multiprocessing.Queue) -> None:
+    # send all log records to the main process instead of writing to the console
+    # and debug.log from several processes
+    handler = logging.handlers.QueueHandler(queue)
+    handler.addFilter(_PipelinePrefix())
+    for logger in (logging.getLogger(), logging.getLogger(__package__)):
+        for old_handler in logger.handlers[:]:
+            logger.removeHandler(old_handler)
+    pkg_logger = logging.getLogger(__package__)
+    pkg_logger.addHandler(handler)
+    pkg_logger.setLevel(logging.DEBUG)
+    pkg_logger.propagate = False
+
+
+def _run_in_worker(label: str,
+                   version: str,
+                   conf: 'Config',
+                   names: Sequence[str],
+                   caches: dict[str, ParseCache] | None = None) -> None:
+    global _worker_label  # noqa: PLW0603
+    _worker_label = label
+
+    pstats_file = conf.profile.pstats_file
+    if pstats_file:
+        # one statistics file per worker
+        pstats_path = Path(pstats_file)
+        pstats_file = str(pstats_path.with_stem(f'{pstats_path.stem}-{label}'))
+    with use_config(conf), (profiler.session(pstats_file)
+                            if conf.profile.enabled else nullcontext()):
+        for name in names:
+            PIPELINES[name](version, cache=caches.get(name) if caches else None)
+
+
+@contextmanager
+def _worker_pool(max_workers: int) -> Iterator[ProcessPoolExecutor]:
+    """Start a process pool whose workers log through the handlers of this process."""
+    mp_context = multiprocessing.get_context()
+    queue = mp_context.Queue()
+    listener = logging.handlers.QueueListener(queue, _Dispatch())
+    listener.start()
+    try:
+        with ProcessPoolExecutor(max_workers=max_workers,
+                                 mp_context=mp_context,
+                                 initializer=_init_worker,
+                                 initargs=(queue,)) as executor:
+            yield executor
+    finally:
+        listener.stop()
+
+
+def _wait_all(futures: dict[str, Future]) -> bool:
+    """Wait for the futures of what is extracted, logging failures.
+
+    Returns whether all succeeded.
+    """
+    ok = True
+    for what, future in futures.items():
+        try:
+            future.result()
+        except Exception:
+            log.exception('Extracting %s failed', what)
+            ok = False
+    return ok
+
+
+def run_pipelines(version: str, names: list[str] | None = None) -> bool:
+    """Run the pipelines, concurrently if configured, and return whether all succeeded.
+
+    When run one after the other, an exception in a pipeline is raised. When run
+    concurrently, every pipeline runs to its end and failures are logged.
+    """
+    conf = get_conf()
+    if names is None:
+        names = load_selection().pipelines(list(PIPELINES))
+
+    if not conf.parallel.pipelines or len(names) < 2:  # noqa: PLR2004
+        with (profiler.session(conf.profile.pstats_file)
+              if conf.profile.enabled else nullcontext()):
+            for name in names:
+                PIPELINES[name](version)
+        return True
+
+    with _worker_pool(len(names)) as executor:
+        futures = {
+            name: executor.submit(_run_in_worker, name, version, conf, [name])
+            for name in names
+        }
+        return _wait_all(futures)
+
+
+def run_versions(jobs: Sequence[tuple[str, 'Config', dict[str, ParseCache]]]) -> bool:
+    """Run all pipelines for several game versions, each in a worker process.
+
+    A job is a game version with its config and the parse caches to use. Every
+    version runs to its end and failures are logged. Returns whether all succeeded.
+    """
+    conf = get_conf()
+    workers = min(len(jobs), conf.parallel.workers or os.cpu_count() or 1)
+    names = load_selection().pipelines(list(PIPELINES))
+    log.info('Extracting %s game versions with %s workers', len(jobs), workers)
+    with _worker_pool(workers) as executor:
+        futures = {}
+        for version, job_conf, caches in jobs:
+            futures[f'version {version}'] = executor.submit(_run_in_worker, version,
+                                                            version, job_conf, names,
+                                                            caches)
+        return _wait_all(futures)
@@ -0,0 +1,180 @@
+"""Extracting some of the items and recipes, to regenerate some of the tables."""
+
+import logging
+import re
+from collections.abc import Iterable, Mapping, Sequence
+from pathlib import Path
+
+from .config import get_conf
+from .rules import RuleSet
+
+log = logging.getLogger(__name__)
+
+# item files are read this much at a time when looking for the fields of the header
+_HEADER_CHUNK = 4096
+
+
+class Selection:
+    """Select the items and recipes to extract, and the tables to regenerate.
+
+    Items are selected by their categories, recipes by their skill and recipe types,
+    and both by the game files they are in.
+
+    Nothing selected means everything. Only the Steam markup tables that have
+    nothing but selected items or recipes are regenerated, and only if none of
+    their items or recipes can be in the files left out. Items and recipes are
+    left out as early as possible, with the rules taken into account.
+    """
+
+    def __init__(self,
+                 *,
+                 categories: Iterable[str] = (),
+                 skill_types: Iterable[str] = (),
+                 recipe_types: Iterable[str] = (),
+                 files: Iterable[str] = (),
+                 item_rules: RuleSet | None = None,
+                 recipe_rules: RuleSet | None = None) -> None:
+        self.categories = tuple(categories)
+        self.skill_types = frozenset(skill_types)
+        self.recipe_types = frozenset(recipe_types)
+        self.files = tuple(files)
+        self.item_rules = item_rules or RuleSet([])
+        self.recipe_rules = recipe_rules or RuleSet([])
+        self._header_fields = self._category_fields()
+        names = '|'.join(re.escape(field) for field in sorted(self._header_fields))
+        self._header_re = re.compile(rf'<({names})>([^<&]*)</\1>'.encode())
+        # the categories the items of the left out files may have, None for any
+        self._left_out_categories: set[str] | None = set()
+        self._recipes_left_out = False
+
+    @property
+    def items_partial(self) -> bool:
+        return bool(self.categories or self.files)
+
+    @property
+    def recipes_partial(self) -> bool:
+        return bool(self.skill_types or self.recipe_types or self.files)
+
+    def pipelines(self, names: Sequence[str]) -> list[str]:
+        """Get the pipelines with a selection, or all of them if nothing is selected."""
+        partial = {'items': self.items_partial, 'recipes': self.recipes_partial}
+        return [name for name in names if partial.get(name)] or list(names)
+
+    def _category_fields(self) -> set[str]:
+        # the category, and the fields of the rules that may change it
+        fields = {'Category'}
+        for rule in self.item_rules.rules:
+            if 'Category' in (rule.get('set') or {}) or rule['field'] == 'Category':
+                fields.update(f for f in (rule['field'], rule.get('unless')) if f)
+        return fields
+
+    def _read_header(self, path: Path) -> dict[str, str]:
+        """Read the fields that decide the category of an item from its file.
+
+        The file is read only up to where they are all found.
+        """
+        found: dict[str, str] = {}
+        head = b''
+        with path.open('rb') as f:
+            while len(found) < len(self._header_fields):
+                chunk = f.read(_HEADER_CHUNK)
+                if not chunk:
+                    break
+                head += chunk
+                for m in self._header_re.finditer(head):
+                    found.setdefault(m.group(1).decode(), m.group(2).decode().strip())
+        return found
+
+    def _item_file_categories(self, path: Path) -> set[str] | None:
+        """Get the categories the items of a file may have, or None if any."""
+        try:
+            header = self._read_header(path)
+        except (OSError, UnicodeDecodeError):
+            return None
+        return self.item_rules.outcomes('Category', header)
+
+    def may_select_item_file(self, path: Path) -> bool:
+        """Check if an item file may have a selected item, without parsing it."""
+        if not self.categories:
+            return True
+        # if unreadable, parsing it will report the problem
+        categories = self._item_file_categories(path)
+        if categories is None:
+            return True
+        return any(category.startswith(self.categories) for category in categories)
+
+    def leave_out_item_files(self, paths: Iterable[Path]) -> None:
+        """Note the item files that are not extracted.
+
+        The tables their items may be in are not regenerated.
+        """
+        for path in paths:
+            if self._left_out_categories is None:
+                return
+            categories = self._item_file_categories(path)
+            if categories is None:
+                self._left_out_categories = None
+            else:
+                self._left_out_categories.update(categories)
+
+    def leave_out_recipe_files(self, paths: Sequence[Path]) -> None:
+        """Note the recipe files that are not extracted.
+
+        Their recipes may be of any type, so no recipe table is regenerated.
+        """
+        self._recipes_left_out = self._recipes_left_out or bool(paths)
+
+    def may_select_recipe(self, rec: Mapping) -> bool:
+        """Check if a recipe may be selected, before it is processed."""
+        if self.skill_types:
+            skill_types = self.recipe_rules.outcomes('SkillType', rec)
+            if skill_types is not None and not skill_types & self.skill_types:
+                return False
+        if self.recipe_types and rec.get('RecipeType'):
+            recipe_types = self.recipe_rules.outcomes('RecipeType', rec)
+            if recipe_types is not None and not recipe_types & self.recipe_types:
+                return False
+        return True
+
+    def item_selected(self, item: Mapping) -> bool:
+        return not self.categories or (item.get('Category') or '').startswith(
+            self.categories)
+
+    def recipe_selected(self, rec: Mapping) -> bool:
+        return ((not self.skill_types or rec.get('SkillType') in self.skill_types) and
+                (not self.recipe_types or rec.get('RecipeType') in self.recipe_types))
+
+    def item_table_selected(self, table: Mapping) -> bool:
+        prefix = table['Category']
+        if self.categories and not prefix.startswith(self.categories):
+            return False
+        left_out = self._left_out_categories
+        return left_out is not None and not any(c.startswith(prefix) for c in left_out)
+
+    def recipe_table_selected(self, table: Mapping) -> bool:
+        if self._recipes_left_out:
+            return False
+        # a table of any RecipeType also has recipes of the types not selected
+        return ((not self.skill_types or table['SkillType'] in self.skill_types) and
+                (not self.recipe_types or table['RecipeType'] in self.recipe_types))
+
+
+def load_selection() -> Selection:
+    """Get the selection of the current config."""
+    conf = get_conf()
+    select = conf.select
+    return Selection(categories=select.categories,
+                     skill_types=select.skill_types,
+                     recipe_types=select.recipe_types,
+                     files=select.files,
+                     item_rules=RuleSet(conf.game_items.rules),
+                     recipe_rules=RuleSet(conf.recipes.rules))
+
+
+def selected_files(xml_paths: Iterable[Path]) -> list[Path]:
+    """Get the files that match the configured file patterns, if any."""
+    conf = get_conf()
+    patterns = conf.select.files
+    if not patterns:
+        return list(xml_paths)
+    return [path for path in xml_paths if any(path.match(p) for p in patterns)]
@@ -0,0 +1,406 @@
+"""Serve the items and recipes of the installed game version over a local HTTP API."""
+
+import hashlib
+import json
+import logging
+import threading
+from collections import OrderedDict
+from collections.abc import Iterable, Mapping, Sequence
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, NamedTuple
+from urllib.parse import parse_qs, unquote, urlsplit
+
+from .cache import ParseCache, open_parse_cache
+from .common import load_game_version
+from .config import get_conf, use_config
+from .items import item_fields, iter_items, process_items, render_item_tables
+from .recipes import iter_parsed_recipes, process_recipes, render_recipe_tables
+from .watch import snapshot, wait_for_changes
+from .writers import recipe_fields
+
+if TYPE_CHECKING:
+    from .config import Config
+
+log = logging.getLogger(__name__)
+
+# the fields the items and recipes can be filtered by; an item's Category matches
+# any category it starts with, like the tables
+ITEM_FILTERS = ('NativeName', 'Category')
+RECIPE_FILTERS = ('UniqueID', 'SkillType', 'RecipeType', 'ProductPrototypeName',
+                  'Ingredient')
+
+_PAGE_PARAMS = ('offset', 'limit')
+
+_Params = dict[str, list[str]]
+
+
+def _json_value(value: Any) -> Any:  # noqa: ANN401
+    if isinstance(value, tuple) and hasattr(value, '_asdict'):
+        return {key: _json_value(v) for key, v in value._asdict().items()}
+    if isinstance(value, tuple | list):
+        return [_json_value(v) for v in value]
+    return value
+
+
+def _rows(records: Iterable[Mapping], fields: Sequence[str]) -> list[dict]:
+    """Turn the records into dicts of the fields they have, ready to encode as JSON."""
+    return [{f: _json_value(rec[f]) for f in fields if f in rec} for rec in records]
+
+
+class _Index:
+    """Positions of the rows by the values of a field.
+
+    A field holding a list is indexed by each of its values.
+    """
+
+    def __init__(self, rows: Sequence[Mapping], field: str) -> None:
+        self.positions: dict[str, list[int]] = {}
+        for i, row in enumerate(rows):
+            value = row.get(field)
+            for key in value if isinstance(value, list) else [value]:
+                if isinstance(key, str):
+                    self.positions.setdefault(key, []).append(i)
+
+    def lookup(self, value: str, *, prefix: bool = False) -> set[int]:
+        if not prefix:
+            return set(self.positions.get(value, ()))
+        return {
+            i for key, positions in self.positions.items() if key.startswith(value)
+            for i in positions
+        }
+
+
+class Dataset:
+    """The processed items and recipes of a game version.
+
+    They come with their indexes and rendered Steam tables.
+
+    A dataset is not changed once it is built, so requests can use it without
+    locking. Reloading builds a new one. failed lists the game files that could not
+    be parsed, whose items or recipes are missing.
+    """
+
+    def __init__(self,
+                 version: str,
+                 items: Sequence[Mapping],
+                 recipes: Sequence[Mapping],
+                 failed: Sequence[Path] = ()) -> None:
+        conf = get_conf()
+        self.version = version
+        self.failed = list(failed)
+        self.items = _rows(items, [*item_fields(items), 'LootList'])
+        self.recipes = _rows(recipes, [*recipe_fields(), 'Deprecated', 'IngredientList'])
+        for row, rec in zip(self.recipes, recipes, strict=True):
+            # an ingredient can be any one of several prototypes
+            row['Ingredient'] = sorted(
+                {name for ingr in rec.get('IngredientList', ()) for name in ingr.names})
+
+        self.item_index = {field: _Index(self.items, field) for field in ITEM_FILTERS}
+        self.recipe_index = {
+            field: _Index(self.recipes, field) for field in RECIPE_FILTERS
+        }
+
+        item_markups, _ = render_item_tables(items)
+        self.item_tables = [{
+            'Category': table.Category,
+            'markup': markup,
+        } for table, markup in zip(
+            conf.game_items.steam_tables.tables, item_markups, strict=True)]
+        recipe_markups, _ = render_recipe_tables(recipes)
+        self.recipe_tables = [{
+            'SkillType': table.SkillType,
+            'RecipeType': table.RecipeType,
+            'markup': markup,
+        } for table, markup in zip(
+            conf.recipes.steam_tables.tables, recipe_markups, strict=True)]
+
+        # identifies the content, so clients can keep responses until it changes
+        content = json.dumps(
+            [version, self.items, self.recipes, self.item_tables, self.recipe_tables],
+            default=str).encode()
+        self.etag = hashlib.sha256(content).hexdigest()[:16]
+
+    def find(self, kind: str, filters: Mapping[str, list[str]]) -> list[dict]:
+        """Get the items or recipes that match all filters, in the order they are sorted.
+
+        A filter matches any of its values.
+        """
+        rows = self.items if kind == 'items' else self.recipes
+        indexes = self.item_index if kind == 'items' else self.recipe_index
+        selected: set[int] | None = None
+        for field, values in filters.items():
+            index = indexes[field]
+            matched = set().union(
+                *(index.lookup(value, prefix=field == 'Category') for value in values))
+            selected = matched if selected is None else selected & matched
+        if selected is None:
+            return rows
+        return [rows[i] for i in sorted(selected)]
+
+
+def load_dataset(version: str, caches: Mapping[str, ParseCache | None]) -> Dataset:
+    """Load, process and index the items and recipes of a game version."""
+    failed: list[Path] = []
+    items = process_items(iter_items(caches['items'], failed=failed))
+    items.sort()
+    recipes = process_recipes(iter_parsed_recipes(caches['recipes'], failed=failed))
+    recipes.sort()
+    for cache in caches.values():
+        if cache is not None:
+            cache.save()
+    dataset = Dataset(version, items, recipes, failed)
+    log.info('Serving %s items and %s recipes of version %s', len(dataset.items),
+             len(dataset.recipes), version)
+    return dataset
+
+
+class _Response(NamedTuple):
+    status: HTTPStatus
+    content_type: str
+    body: bytes
+
+
+class _ResponseCache:
+    """The most recently used responses, by the dataset and the request path."""
+
+    def __init__(self, maxsize: int) -> None:
+        self.maxsize = maxsize
+        self._responses: OrderedDict[tuple[str, str], _Response] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: tuple[str, str]) -> _Response | None:
+        with self._lock:
+            response = self._responses.get(key)
+            if response is not None:
+                self._responses.move_to_end(key)
+            return response
+
+    def put(self, key: tuple[str, str], response: _Response) -> None:
+        with self._lock:
+            self._responses[key] = response
+            self._responses.move_to_end(key)
+            while len(self._responses) > self.maxsize:
+                self._responses.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._responses.clear()
+
+
+class _RequestError(Exception):
+
+    def __init__(self, status: HTTPStatus, message: str) -> None:
+        super().__init__(message)
+        self.status = status
+
+
+def _json_response(data: Any) -> _Response:  # noqa: ANN401
+    body = json.dumps(data, ensure_ascii=False, default=str).encode()
+    return _Response(HTTPStatus.OK, 'application/json; charset=utf-8', body)
+
+
+class GamedataServer(ThreadingHTTPServer):
+    """Answers queries on a dataset.
+
+    The dataset is swapped for a new one when the game files change.
+
+    Requests use the dataset that is current when they start, so a reload never
+    blocks them or changes the data they see.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, conf: 'Config', dataset: Dataset) -> None:
+        self.conf = conf
+        self.dataset = dataset
+        self.page_size = conf.serve.page_size
+        self.max_page_size = conf.serve.max_page_size
+        self.responses = _ResponseCache(conf.serve.cache_size)
+        super().__init__((conf.serve.host, conf.serve.port), _Handler)
+
+    def swap(self, dataset: Dataset) -> None:
+        self.dataset = dataset
+        self.responses.clear()
+
+    def respond(self, dataset: Dataset, path: str, query: str) -> _Response:
+        """Make the response to a request, or raise _RequestError."""
+        parts = [unquote(part) for part in path.strip('/').split('/') if part]
+        params = parse_qs(query, keep_blank_values=True)
+        match parts:
+            case []:
+                return _json_response({
+                    'version': dataset.version,
+                    'items': len(dataset.items),
+                    'recipes': len(dataset.recipes),
+                    'item_tables': len(dataset.item_tables),
+                    'recipe_tables': len(dataset.recipe_tables),
+                })
+            case ['items' | 'recipes' as kind]:
+                return self._list(dataset, kind, params)
+            case ['items', name]:
+                return self._one(dataset, 'items', 'NativeName', name)
+            case ['recipes', unique_id]:
+                return self._one(dataset, 'recipes', 'UniqueID', unique_id)
+            case ['tables', 'items' | 'recipes' as kind]:
+                tables = dataset.item_tables if kind == 'items' else dataset.recipe_tables
+                return _json_response([{'id': i, **t} for i, t in enumerate(tables)])
+            case ['tables', 'items' | 'recipes' as kind, table_id]:
+                tables = dataset.item_tables if kind == 'items' else dataset.recipe_tables
+                if not table_id.isdigit() or int(table_id) >= len(tables):
+                    raise _RequestError(HTTPStatus.NOT_FOUND, f'No table {table_id}')
+                markup = tables[int(table_id)]['markup']
+                return _Response(HTTPStatus.OK, 'text/plain; charset=utf-8',
+                                 markup.encode())
+        raise _RequestError(HTTPStatus.NOT_FOUND, f'No such resource: {path}')
+
+    def _list(self, dataset: Dataset, kind: str, params: _Params) -> _Response:
+        allowed = ITEM_FILTERS if kind == 'items' else RECIPE_FILTERS
+        unknown = set(params) - set(allowed) - set(_PAGE_PARAMS)
+        if unknown:
+            names = ', '.join(sorted(unknown))
+            msg = f'Unknown filters {names}, use {", ".join(allowed)}'
+            raise _RequestError(HTTPStatus.BAD_REQUEST, msg)
+        try:
+            offset = int(params.pop('offset', ['0'])[-1])
+            limit = int(params.pop('limit', [str(self.page_size)])[-1])
+        except ValueError as err:
+            raise _RequestError(HTTPStatus.BAD_REQUEST,
+                                'offset and limit must be numbers') from err
+        if offset < 0 or not 0 < limit <= self.max_page_size:
+            msg = f'offset must be 0 or more, and limit from 1 to {self.max_page_size}'
+            raise _RequestError(HTTPStatus.BAD_REQUEST, msg)
+
+        rows = dataset.find(kind, params)
+        return _json_response({
+            'version': dataset.version,
+            'total': len(rows),
+            'offset': offset,
+            'limit': limit,
+            kind: rows[offset:offset + limit],
+        })
+
+    def _one(self, dataset: Dataset, kind: str, field: str, value: str) -> _Response:
+        rows = dataset.find(kind, {field: [value]})
+        if not rows:
+            raise _RequestError(HTTPStatus.NOT_FOUND, f'No {kind} with {field} {value}')
+        return _json_response(rows[0])
+
+
+def _etag_matches(if_none_match: str | None, etag: str) -> bool:
+    """Check if an If-None-Match header lists an ETag, or is *.
+
+    Weak tags match too, as GET requests compare ETags weakly.
+    """
+    if not if_none_match:
+        return False
+    tags = (tag.strip() for tag in if_none_match.split(','))
+    return any(tag == '*' or tag.removeprefix('W/') == etag for tag in tags)
+
+
+class _Handler(BaseHTTPRequestHandler):
+    server: GamedataServer
+
+    def do_GET(self) -> None:
+        dataset = self.server.dataset
+        etag = f'"{dataset.etag}"'
+        key = (dataset.etag, self.path)
+        response = self.server.responses.get(key)
+        if response is None:
+            url = urlsplit(self.path)
+            try:
+                response = self.server.respond(dataset, url.path, url.query)
+            except _RequestError as err:
+                # errors are not cached, they are cheap to make
+                body = json.dumps({'error': str(err)}).encode()
+                self._send(_Response(err.status, 'application/json', body), etag)
+                return
+            self.server.responses.put(key, response)
+
+        if _etag_matches(self.headers.get('If-None-Match'), etag):
+            self.send_response(HTTPStatus.NOT_MODIFIED)
+            self.send_header('ETag', etag)
+            self.end_headers()
+            return
+        self._send(response, etag)
+
+    def _send(self, response: _Response, etag: str) -> None:
+        self.send_response(response.status)
+        self.send_header('Content-Type', response.content_type)
+        self.send_header('Content-Length', str(len(response.body)))
+        if response.status == HTTPStatus.OK:
+            self.send_header('ETag', etag)
+        self.end_headers()
+        self.wfile.write(response.body)
+
+    def log_message(self, format: str, *args: Any) -> None:  # noqa: A002, ANN401
+        log.debug('%s %s', self.address_string(), format % args)
+
+
+class _Reloader:
+    """Loads the dataset again when the game files change, and swaps it in."""
+
+    def __init__(self, server: GamedataServer, version: str,
+                 caches: dict[str, ParseCache | None]) -> None:
+        self.server = server
+        self.version = version
+        self.caches = caches
+
+    def run(self) -> None:
+        conf = self.server.conf
+        with use_config(conf):
+            state = snapshot()
+            while True:
+                state = wait_for_changes(state, conf.watch.interval, conf.watch.debounce)
+                log.info('Game files changed, reloading')
+                try:
+                    self.reload()
+                except Exception:
+                    # a file being edited may be well-formed, but not complete yet
+                    log.exception('Reloading failed, still serving version %s',
+                                  self.server.dataset.version)
+
+    def reload(self) -> None:
+        version = load_game_version()
+        if version != self.version:
+            self.version = version
+            self.caches = _open_caches(version)
+        dataset = load_dataset(version, self.caches)
+        if dataset.failed:
+            # files may be half-written while they are being edited
+            names = ', '.join(path.name for path in dataset.failed)
+            log.error('Could not parse %s, still serving the previous data', names)
+            return
+        self.server.swap(dataset)
+
+
+def _open_caches(version: str) -> dict[str, ParseCache | None]:
+    # the on-disk cache is read once; after that, the parsed files stay in memory
+    return {
+        name: open_parse_cache(name, version) or ParseCache()
+        for name in ('items', 'recipes')
+    }
+
+
+def serve() -> None:
+    """Serve the items and recipes until interrupted.
+
+    They are reloaded when the game files change.
+    """
+    conf = get_conf()
+    version = load_game_version()
+    caches = _open_caches(version)
+    server = GamedataServer(conf, load_dataset(version, caches))
+    if conf.serve.reload:
+        reloader = _Reloader(server, version, caches)
+        threading.Thread(target=reloader.run, name='reloader', daemon=True).start()
+
+    host, port = server.server_address[:2]
+    log.info('Serving on http://%s:%s/, press Ctrl+C to stop', host, port)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        log.info('Stopped serving')
+    finally:
+        server.server_close()
@@ -0,0 +1,163 @@
+"""Compact storage of processed items and recipes."""
+
+import functools
+import re
+from collections.abc import Callable, Iterable, Iterator, Mapping, Sequence
+from typing import Any
+
+# marks fields that a record does not have
+_MISSING: Any = object()
+
+_NUMBER_RE = re.compile(r'\s*[-+]?(\d+\.?\d*|\.\d+)([eE][-+]?\d+)?\s*')
+_LEADING_NUMBER_RE = re.compile(r'\s*([-+]?(?:\d+\.?\d*|\.\d+)(?:[eE][-+]?\d+)?)')
+
+SortValue = tuple[int, float, str]
+SortKey = Callable[[Mapping], tuple[SortValue, ...]]
+
+
+@functools.lru_cache(maxsize=4096)
+def _sort_value(value: str) -> SortValue:
+    # numbers like '12', '0.5 / FlOz' and '12.00 / 22.00' sort by their first part
+    number = value.split('/', 1)[0]
+    if _NUMBER_RE.fullmatch(number):
+        return (1, float(number), value)
+    return (2, 0.0, value)
+
+
+def leading_number(value: Any) -> float | None:  # noqa: ANN401
+    """Get the number a value starts with, as in '8 FlOz' or '0.5 / FlOz', if any."""
+    if not isinstance(value, str):
+        return None
+    match = _LEADING_NUMBER_RE.match(value)
+    return float(match[1]) if match else None
+
+
+def sort_value(value: Any) -> SortValue:  # noqa: ANN401
+    """Make a value comparable to any other: empty first, then numbers, then text."""
+    if value is None or value == '':
+        return (0, 0.0, '')
+    return _sort_value(str(value))
+
+
+def make_sort_key(fields: Sequence[str]) -> SortKey:
+    """Make a sort key function that orders rows by the fields, in order."""
+    fields = tuple(fields)
+
+    def sort_key(row: Mapping) -> tuple[SortValue, ...]:
+        return tuple(sort_value(row.get(field)) for field in fields)
+
+    return sort_key
+
+
+class Record(Mapping):
+    """A read-only row of a RecordTable, used like a dict of its fields.
+
+    The values are kept in a tuple that is aligned with the columns of the table,
+    instead of in a dict per row.
+    """
+
+    __slots__ = ('_table', '_values', 'sort_key')
+
+    def __init__(self, table: 'RecordTable', values: tuple) -> None:
+        self._table = table
+        self._values = values
+        self.sort_key: tuple = ()
+
+    def __getitem__(self, key: str) -> Any:  # noqa: ANN401
+        value = self.get(key, _MISSING)
+        if value is _MISSING:
+            raise KeyError(key)
+        return value
+
+    def get(self, key: str, default: Any = None) -> Any:  # noqa: ANN401
+        i = self._table.index.get(key)
+        # rows added before a column was added are shorter than the columns
+        if i is None or i >= len(self._values):
+            return default
+        value = self._values[i]
+        return default if value is _MISSING else value
+
+    def pick(self, keys: Sequence[str], default: Any = None) -> list:  # noqa: ANN401
+        """Get the values of several fields at once, faster than get() for each."""
+        index = self._table.index
+        values = self._values
+        n_values = len(values)
+        picked = []
+        for key in keys:
+            i = index.get(key, n_values)
+            value = values[i] if i < n_values else _MISSING
+            picked.append(default if value is _MISSING else value)
+        return picked
+
+    def __contains__(self, key: object) -> bool:
+        return self.get(key, _MISSING) is not _MISSING  # type: ignore[arg-type]
+
+    def __iter__(self) -> Iterator[str]:
+        columns = self._table.columns
+        return (
+            columns[i] for i, value in enumerate(self._values) if value is not _MISSING)
+
+    def __len__(self) -> int:
+        return sum(1 for value in self._values if value is not _MISSING)
+
+    def __repr__(self) -> str:
+        return f'Record({dict(self)!r})'
+
+
+class RecordTable:
+    """Rows with string fields, stored as tuples with one set of column names.
+
+    Equal strings, such as the Category, SkillType and RecipeType of many rows, are
+    stored once. Columns are kept in the order they are first seen. If sort_key is
+    given, the sort key of each row is computed once, when it is added.
+    """
+
+    def __init__(self,
+                 keep: Iterable[str] | None = None,
+                 drop: Iterable[str] = (),
+                 sort_key: SortKey | None = None) -> None:
+        self.columns: list[str] = []
+        self.index: dict[str, int] = {}
+        self.keep = frozenset(keep) if keep is not None else None
+        self.drop = frozenset(drop)
+        self.sort_key = sort_key
+        self._rows: list[Record] = []
+        self._strings: dict[str, str] = {}
+
+    def _keeps(self, key: str) -> bool:
+        return key not in self.drop and (self.keep is None or key in self.keep)
+
+    def append(self, fields: Mapping[str, Any]) -> Record:
+        """Add a row with the fields to keep, or all fields but the fields to drop."""
+        index = self.index
+        values = [_MISSING] * len(self.columns)
+        for key, value in fields.items():
+            i = index.get(key)
+            if i is None:
+                if not self._keeps(key):
+                    continue
+                i = index[key] = len(self.columns)
+                self.columns.append(key)
+                values.append(_MISSING)
+            # share equal strings between the rows
+            values[i] = (self._strings.setdefault(value, value)
+                         if isinstance(value, str) else value)
+
+        record = Record(self, tuple(values))
+        if self.sort_key is not None:
+            record.sort_key = self.sort_key(record)
+        self._rows.append(record)
+        return record
+
+    def sort(self, key: Callable[[Record], Any] | None = None) -> None:
+        """Sort the rows by key, or by their precomputed sort keys."""
+        self._rows.sort(key=key or (lambda record: record.sort_key))
+
+    def __getitem__(self, i: int) -> Record:
+        return self._rows[i]
+
+    def __iter__(self) -> Iterator[Record]:
+        return iter(self._rows)
+
+    def __len__(self) -> int:
+        return len(self._rows)
@@ -0,0 +1,118 @@
+"""Re-extract recipes and items when the game files change."""
+
+import logging
+import time
+from contextlib import nullcontext
+from pathlib import Path
+
+from .cache import ParseCache, open_parse_cache
+from .common import load_game_version
+from .config import get_conf
+from .items import item_files
+from .profiling import profiler
+from .recipes import recipe_files
+from .runner import PIPELINES
+from .selection import load_selection
+
+log = logging.getLogger(__name__)
+
+_Snapshot = dict[str, tuple[int, int]]
+
+
+def _stat_files(paths: list[Path]) -> _Snapshot:
+    snapshot = {}
+    for path in paths:
+        try:
+            st = path.stat()
+        except OSError:  # removed since it was listed
+            continue
+        snapshot[str(path)] = (st.st_mtime_ns, st.st_size)
+    return snapshot
+
+
+def snapshot() -> dict[str, _Snapshot]:
+    """Get the mtime and size of the input files of each pipeline."""
+    conf = get_conf()
+    return {
+        'version': _stat_files([Path(conf.version_file)]),
+        'recipes': _stat_files(recipe_files()),
+        'items': _stat_files(item_files()),
+    }
+
+
+def wait_for_changes(previous: dict[str, _Snapshot], interval: float,
+                     debounce: float) -> dict[str, _Snapshot]:
+    """Poll until the files change, then until they stop changing for debounce seconds."""
+    while True:
+        time.sleep(interval)
+        current = snapshot()
+        if current != previous:
+            break
+
+    while True:
+        time.sleep(debounce)
+        settled = snapshot()
+        if settled == current:
+            return current
+        current = settled
+
+
+class Watcher:
+    """Runs the pipelines whose input files changed, keeping parsed files in memory."""
+
+    def __init__(self) -> None:
+        self.version = ''
+        self.caches: dict[str, ParseCache] = {}
+
+    def _open_caches(self) -> None:
+        # the on-disk cache is read once; after that, the parsed files stay in memory
+        self.caches = {
+            name: open_parse_cache(name, self.version) or ParseCache()
+            for name in PIPELINES
+        }
+
+    def extract(self, names: list[str]) -> None:
+        conf = get_conf()
+        try:
+            version = load_game_version()
+        except OSError:
+            log.exception('Reading the game version failed')
+            return
+        if version != self.version:
+            self.version = version
+            self._open_caches()
+            names = list(PIPELINES)
+        selected = load_selection().pipelines(list(PIPELINES))
+        names = [name for name in names if name in selected]
+
+        with (profiler.session(conf.profile.pstats_file)
+              if conf.profile.enabled else nullcontext()):
+            for name in names:
+                try:
+                    PIPELINES[name](version, cache=self.caches[name])
+                except Exception:
+                    # files may be half-written while they are being edited
+                    log.exception('Extracting %s failed', name)
+
+    def run(self) -> None:
+        """Extract everything, then re-extract on changes until interrupted."""
+        conf = get_conf()
+        state = snapshot()
+        self.extract(list(PIPELINES))
+        log.info('Watching for changes, press Ctrl+C to stop')
+        try:
+            while True:
+                changed = wait_for_changes(state, conf.watch.interval,
+                                           conf.watch.debounce)
+                names = [name for name in PIPELINES if changed[name] != state[name]]
+                if changed['version'] != state['version']:
+                    names = list(PIPELINES)
+                state = changed
+                log.info('Game files changed, extracting %s', ' and '.join(names))
+                self.extract(names)
+        except KeyboardInterrupt:
+            log.info('Stopped watching')
+
+
+def watch() -> None:
+    Watcher().run()
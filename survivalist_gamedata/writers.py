@@ -0,0 +1,263 @@
+"""Output formats for processed items and recipes besides CSV and Steam markup."""
+
+import abc
+import itertools
+import logging
+import sqlite3
+from collections.abc import Callable, Iterable, Iterator, Mapping, Sequence
+from pathlib import Path
+from typing import TYPE_CHECKING, NamedTuple
+
+from .common import ExtractsError, unique
+from .config import get_conf
+from .store import Record
+
+if TYPE_CHECKING:
+    from .config import Config
+
+log = logging.getLogger(__name__)
+
+_LOOT_COLUMNS = {
+    'item_id': 'INTEGER',
+    'NativeName': 'TEXT',
+    'Location': 'TEXT',
+    'Scarcity': 'TEXT',
+}
+
+_INGREDIENT_COLUMNS = {
+    'recipe_id': 'INTEGER',
+    'UniqueID': 'TEXT',
+    # alternative prototypes for an ingredient have the same slot
+    'Slot': 'INTEGER',
+    'PrototypeName': 'TEXT',
+    'Amount': 'REAL',
+    'Liquid': 'INTEGER',
+}
+
+# the tables written by each pipeline
+_PIPELINE_TABLES = {
+    'items': ('items', 'loot_locations'),
+    'recipes': ('recipes', 'ingredients'),
+}
+
+
+class Table(NamedTuple):
+    name: str
+    # the SQL types of the columns; without a type, values are stored as they are
+    columns: dict[str, str]
+    rows: Iterable[tuple]
+    indexes: tuple[str, ...] = ()
+
+
+def _batches(rows: Iterable, size: int) -> Iterator[list]:
+    it = iter(rows)
+    while batch := list(itertools.islice(it, size)):
+        yield batch
+
+
+def _record_rows(records: Iterable[Mapping], fields: list[str]) -> Iterator[tuple]:
+    """Yield the numbered rows of records, with the values of the fields as text."""
+    for i, rec in enumerate(records, 1):
+        if isinstance(rec, Record):
+            values = rec.pick(fields)
+        else:
+            values = [rec.get(field) for field in fields]
+        # like in the CSV files, nested XML elements are written as their repr
+        yield i, *(v if v is None or isinstance(v, str) else str(v) for v in values)
+
+
+def _loot_rows(items: Iterable[Mapping]) -> Iterator[tuple]:
+    for item_id, item in enumerate(items, 1):
+        for loc in item.get('LootList', ()):
+            yield item_id, item['NativeName'], loc.name, loc.scarcity
+
+
+def _ingredient_rows(recipes: Iterable[Mapping]) -> Iterator[tuple]:
+    for recipe_id, rec in enumerate(recipes, 1):
+        for slot, ingr in enumerate(rec.get('IngredientList', ()), 1):
+            for name in ingr.names:
+                yield (recipe_id, rec['UniqueID'], slot, name, ingr.amount,
+                       int(ingr.liquid))
+
+
+def recipe_fields() -> list[str]:
+    """Get the fields of the recipes that are exported: the CSV fields and the product."""
+    conf = get_conf()
+    fields = ['UniqueID', *conf.recipes.csv_fields]
+    return unique([*fields, 'ProductPrototypeName', 'ProductAmount'])
+
+
+def item_tables(items: Sequence[Mapping], fields: list[str]) -> list[Table]:
+    """Make the tables of the items, with the given fields, and of their loot."""
+    columns = {'id': 'INTEGER PRIMARY KEY', **dict.fromkeys(fields, '')}
+    return [
+        Table('items', columns, _record_rows(items, fields), ('Category', 'NativeName')),
+        Table('loot_locations', _LOOT_COLUMNS, _loot_rows(items),
+              ('item_id', 'Location')),
+    ]
+
+
+def recipe_tables(recipes: Sequence[Mapping]) -> list[Table]:
+    """Make the tables of the recipes and of their ingredients.
+
+    The recipes have the fields of the CSV file and the product.
+    """
+    fields = recipe_fields()
+    columns = {'id': 'INTEGER PRIMARY KEY', **dict.fromkeys(fields, '')}
+    rows = _record_rows(recipes, fields)
+    return [
+        Table('recipes', columns, rows, ('SkillType', 'ProductPrototypeName')),
+        Table('ingredients', _INGREDIENT_COLUMNS, _ingredient_rows(recipes),
+              ('recipe_id', 'PrototypeName')),
+    ]
+
+
+class OutputWriter(abc.ABC):
+    """Writes the tables of items and of recipes of a game version in some format.
+
+    The items and the recipes are written separately, possibly by different
+    processes, and replace the tables written before.
+    """
+
+    format = ''
+
+    def __init__(self, version: str, conf: 'Config') -> None:
+        self.version = version
+        self.batch_size = conf.outputs.batch_size
+
+    @abc.abstractmethod
+    def paths(self, pipeline: str) -> list[Path]:
+        """Get the files written for the items or the recipes."""
+
+    def is_written(self, pipeline: str) -> bool:
+        """Check if the tables of the items or the recipes have been written."""
+        return all(path.exists() for path in self.paths(pipeline))
+
+    @abc.abstractmethod
+    def write(self, pipeline: str, tables: list[Table]) -> None:
+        """Write the tables of the items or the recipes."""
+
+
+def _quote(name: str) -> str:
+    """Quote a field name for use as an SQL identifier."""
+    return '"' + name.replace('"', '""') + '"'
+
+
+class SqliteWriter(OutputWriter):
+    """Writes the tables to one indexed database.
+
+    The tables of the items or of the recipes are replaced in a single
+    transaction, inserting the rows in batches.
+    """
+
+    format = 'sqlite'
+
+    def __init__(self, version: str, conf: 'Config') -> None:
+        super().__init__(version, conf)
+        self.db_path = Path(conf.outputs.sqlite_file.format(version=version))
+
+    def paths(self, pipeline: str) -> list[Path]:  # noqa: ARG002
+        return [self.db_path]
+
+    def is_written(self, pipeline: str) -> bool:
+        # the database is shared, so check for the tables
+        if not self.db_path.exists():
+            return False
+        names = _PIPELINE_TABLES[pipeline]
+        con = sqlite3.connect(self.db_path)
+        try:
+            found = con.execute(
+                'SELECT count(*) FROM sqlite_master WHERE type = ? AND name IN (?, ?)',
+                ('table', *names)).fetchone()[0]
+        except sqlite3.DatabaseError:
+            return False
+        finally:
+            con.close()
+        return found == len(names)
+
+    def write(self, pipeline: str, tables: list[Table]) -> None:
+        log.info('Writing %s to %s', pipeline, self.db_path.name)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        # the recipes and items may be written at the same time by two processes
+        con = sqlite3.connect(self.db_path, timeout=60, isolation_level=None)
+        try:
+            con.execute('BEGIN IMMEDIATE')
+            for table in tables:
+                col_defs = ', '.join(f'{_quote(col)} {col_type}'.rstrip()
+                                     for col, col_type in table.columns.items())
+                params = ', '.join('?' * len(table.columns))
+                insert = f'INSERT INTO {table.name} VALUES ({params})'  # noqa: S608
+                con.execute(f'DROP TABLE IF EXISTS {table.name}')
+                con.execute(f'CREATE TABLE {table.name} ({col_defs})')
+                for batch in _batches(table.rows, self.batch_size):
+                    con.executemany(insert, batch)
+                for col in table.indexes:
+                    con.execute(f'CREATE INDEX {table.name}_{col} '
+                                f'ON {table.name} ({_quote(col)})')
+            con.execute('COMMIT')
+        except BaseException:
+            if con.in_transaction:
+                con.execute('ROLLBACK')
+            raise
+        finally:
+            con.close()
+
+
+class ParquetWriter(OutputWriter):
+    """Writes each table to a Parquet file, in row groups of batch_size rows.
+
+    Requires pyarrow.
+    """
+
+    format = 'parquet'
+
+    def __init__(self, version: str, conf: 'Config') -> None:
+        super().__init__(version, conf)
+        try:
+            import pyarrow as pa  # type: ignore  # noqa: PGH003
+            import pyarrow.parquet as pq  # type: ignore  # noqa: PGH003
+        except ImportError as err:
+            msg = 'Writing Parquet files requires pyarrow, install it with pip'
+            raise ExtractsError(msg) from err
+        self.pa = pa
+        self.pq = pq
+        self.parquet_dir = Path(conf.outputs.parquet_dir.format(version=version))
+        self._types: dict[str, Callable] = {
+            'INTEGER': pa.int64,
+            'INTEGER PRIMARY KEY': pa.int64,
+            'REAL': pa.float64,
+            'TEXT': pa.string,
+            '': pa.string,
+        }
+
+    def paths(self, pipeline: str) -> list[Path]:
+        return [
+            self.parquet_dir / f'{name}.parquet' for name in _PIPELINE_TABLES[pipeline]
+        ]
+
+    def write(self, pipeline: str, tables: list[Table]) -> None:
+        log.info('Writing %s to %s', pipeline, self.parquet_dir)
+        self.parquet_dir.mkdir(parents=True, exist_ok=True)
+        for table in tables:
+            schema = self.pa.schema([
+                (col, self._types[col_type]()) for col, col_type in table.columns.items()
+            ])
+            path = self.parquet_dir / f'{table.name}.parquet'
+            with self.pq.ParquetWriter(path, schema) as writer:
+                for batch in _batches(table.rows, self.batch_size):
+                    columns = zip(*batch, strict=True)
+                    writer.write_batch(
+                        self.pa.record_batch([list(col) for col in columns],
+                                             schema=schema))
+
+
+WRITERS: dict[str, type[OutputWriter]] = {
+    'sqlite': SqliteWriter,
+    'parquet': ParquetWriter,
+}
+
+
+def open_writers(version: str) -> list[OutputWriter]:
+    """Get the writers of the configured output formats."""
+    conf = get_conf()
+    return [WRITERS[fmt](version, conf) for fmt in conf.outputs.formats]
@@ -0,0 +1,124 @@
+"""Stream elements from XML files as dicts shaped like xmltodict's."""
+
+import functools
+import logging
+import xml.etree.ElementTree as ET
+from collections.abc import Callable, Iterator
+from pathlib import Path
+from typing import Any, BinaryIO
+
+log = logging.getLogger(__name__)
+
+_XML_NS = 'http://www.w3.org/XML/1998/namespace'
+_CHUNK_SIZE = 64 * 1024
+
+
+def _qname(name: str, prefixes: dict[str, str]) -> str:
+    """Turn an ElementTree '{uri}local' name back into 'prefix:local'."""
+    if name[0] != '{':
+        return name
+    uri, local = name[1:].split('}', 1)
+    prefix = prefixes.get(uri, '')
+    return f'{prefix}:{local}' if prefix else local
+
+
+def element_to_dict(elem: ET.Element,
+                    prefixes: dict[str, str],
+                    ns_decls: dict[ET.Element, list[tuple[str, str]]] | None = None,
+                    wanted: Callable[[str], bool] | None = None,
+                    depth: int = 0) -> Any:  # noqa: ANN401
+    """Convert an element the way xmltodict.parse converts it.
+
+    Elements without attributes or children become their stripped text, or None
+    when empty, and repeated child elements become lists. If wanted is given, the
+    attributes and children of the elements depth levels down whose name it
+    rejects are left out, without converting them.
+    """
+    filtering = wanted is not None and depth == 0
+    child_wanted = wanted if depth > 0 else None
+    item: dict | None = None
+    if ns_decls and elem in ns_decls:
+        item = {}
+        for prefix, uri in ns_decls[elem]:
+            item[f'@xmlns:{prefix}' if prefix else '@xmlns'] = uri
+    if elem.attrib:
+        if item is None:
+            item = {}
+        for key, value in elem.attrib.items():
+            item['@' + _qname(key, prefixes)] = value
+    if filtering and item:
+        item = {key: value for key, value in item.items() if wanted(key)} or None
+
+    text = elem.text or ''
+    for child in elem:
+        if child.tail:
+            text += child.tail
+        key = _qname(child.tag, prefixes)
+        if filtering and not wanted(key):
+            continue
+        if item is None:
+            item = {}
+        value = element_to_dict(child, prefixes, ns_decls, child_wanted, depth - 1)
+        if key in item:
+            if isinstance(item[key], list):
+                item[key].append(value)
+            else:
+                item[key] = [item[key], value]
+        else:
+            item[key] = value
+
+    text = text.strip()
+    if item is None:
+        return text or None
+    if text:
+        item['#text'] = text
+    return item
+
+
+def _read_events(xml_file: BinaryIO) -> Iterator[tuple[str, Any]]:
+    """Parse a file a chunk at a time, yielding the events as they are parsed."""
+    pull = ET.XMLPullParser(events=('start-ns', 'start', 'end'))
+    for chunk in iter(functools.partial(xml_file.read, _CHUNK_SIZE), b''):
+        pull.feed(chunk)
+        yield from pull.read_events()
+    # raises on a truncated document
+    pull.close()
+    yield from pull.read_events()
+
+
+def iter_elements(xml_path: Path, path: tuple[str, ...]) -> Iterator[Any]:
+    """Yield the elements at path, e.g. ('RecipeList', 'Recipes', 'Recipe'), one by one.
+
+    Each element is converted with element_to_dict and then discarded, so memory use
+    does not grow with the size of the file.
+    """
+    prefixes = {_XML_NS: 'xml'}
+    pending_decls: list[tuple[str, str]] = []
+    ns_decls: dict[ET.Element, list[tuple[str, str]]] = {}
+    stack: list[ET.Element] = []
+    depth = len(path)
+
+    with xml_path.open('rb') as xml_file:
+        for event, data in _read_events(xml_file):
+            if event == 'start-ns':
+                prefix, uri = data
+                prefixes[uri] = prefix
+                pending_decls.append((prefix, uri))
+            elif event == 'start':
+                if pending_decls:
+                    ns_decls[data] = pending_decls
+                    pending_decls = []
+                stack.append(data)
+            else:
+                stack.pop()
+                if len(stack) >= depth:
+                    continue
+                if len(stack) == depth - 1 and all(
+                        _qname(e.tag, prefixes) == p
+                        for e, p in zip([*stack, data], path, strict=True)):
+                    yield element_to_dict(data, prefixes, ns_decls)
+                # the element has been dealt with, so free it
+                if stack:
+                    stack[-1].remove(data)
+                data.clear()
+                ns_decls.pop(data, None)
@@ -0,0 +1,280 @@
+"""Cross-reference of recipes and the items they produce and consume."""
+
+import logging
+import math
+from collections.abc import Iterable, Iterator, Mapping
+from dataclasses import dataclass
+from typing import TYPE_CHECKING
+
+from .cache import open_parse_cache
+from .config import use_config
+from .items import iter_items, process_items
+from .recipes import Ingredient, iter_parsed_recipes, process_recipes
+from .store import leading_number
+
+if TYPE_CHECKING:
+    from .config import Config
+
+log = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class CraftingTree:
+    """How a prototype is made: the recipe used and the trees of its ingredients.
+
+    Raw materials, which no recipe produces, have no recipe and no ingredients.
+    The ingredient amounts are those of one crafting, which makes product_amount
+    of the prototype.
+    """
+
+    name: str
+    recipe: str | None = None
+    product_amount: float = 1.0
+    ingredients: tuple[tuple[float, 'CraftingTree'], ...] = ()
+
+
+class CraftingIndex:
+    """Items and recipes by prototype name, with memoized crafting trees and costs.
+
+    Prototypes are looked up by NativeName for items and by ProductPrototypeName
+    and ingredient prototype names for recipes. Deprecated recipes are left out.
+    Recipes in a cycle, whose ingredients are made from their product, are not
+    used for the costs and trees, so that those do not depend on the query order.
+    """
+
+    def __init__(self, items: Iterable[Mapping], recipes: Iterable[Mapping]) -> None:
+        self.items: dict[str, Mapping] = {}
+        self.recipes: dict[str, Mapping] = {}
+        self.producers: dict[str, list[Mapping]] = {}
+        self.consumers: dict[str, list[Mapping]] = {}
+        self._costs: dict[str, float | None] = {}
+        self._trees: dict[str, CraftingTree] = {}
+
+        for item in items:
+            self.items.setdefault(item['NativeName'], item)
+        for rec in recipes:
+            if rec.get('Deprecated') == 'true':
+                continue
+            self.recipes[rec['UniqueID']] = rec
+            self.producers.setdefault(rec['ProductPrototypeName'], []).append(rec)
+            for ingr in rec.get('IngredientList', ()):
+                for name in ingr.names:
+                    consumers = self.consumers.setdefault(name, [])
+                    if not consumers or consumers[-1] is not rec:
+                        consumers.append(rec)
+        self._makers = self._acyclic_producers()
+
+    def _acyclic_producers(self) -> dict[str, list[Mapping]]:
+        """Get the producers, without the recipes in a cycle."""
+        graph = {
+            name: [
+                n for rec in recs for n in _ingredient_names(rec) if n in self.producers
+            ] for name, recs in self.producers.items()
+        }
+        component = _components(graph)
+        makers = {
+            name: [
+                rec for rec in recs if all(
+                    component.get(n) != component[name] for n in _ingredient_names(rec))
+            ] for name, recs in self.producers.items()
+        }
+        cnt = sum(len(recs) for recs in self.producers.values()) - sum(
+            len(recs) for recs in makers.values())
+        if cnt:
+            log.debug('Not using %s recipes in a cycle for the costs', cnt)
+        return makers
+
+    def item(self, name: str) -> Mapping | None:
+        return self.items.get(name)
+
+    def produced_by(self, name: str) -> list[Mapping]:
+        """Get the recipes that make a prototype."""
+        return self.producers.get(name, [])
+
+    def used_in(self, name: str) -> list[Mapping]:
+        """Get the recipes that take a prototype as an ingredient."""
+        return self.consumers.get(name, [])
+
+    def _base_price(self, name: str) -> float | None:
+        item = self.items.get(name)
+        return leading_number(item.get('BasePrice')) if item is not None else None
+
+    def _recipe_cost(self, rec: Mapping) -> float | None:
+        """Get the raw material cost of one unit of the product of a recipe."""
+        total = 0.0
+        for ingr in rec.get('IngredientList', ()):
+            unit_cost = self._ingredient_cost(ingr)
+            if unit_cost is None:
+                return None
+            total += ingr.amount * unit_cost
+        return total / (leading_number(rec.get('ProductAmount')) or 1.0)
+
+    def _ingredient_cost(self, ingr: Ingredient) -> float | None:
+        # any of the prototypes can be used, so use the cheapest
+        costs = [self._cost(name) for name in ingr.names]
+        known = [cost for cost in costs if cost is not None]
+        return min(known) if known else None
+
+    def _cheapest_recipe(self, name: str) -> tuple[Mapping | None, float]:
+        best, best_cost = None, math.inf
+        for rec in self._makers.get(name, ()):
+            cost = self._recipe_cost(rec)
+            if cost is not None and cost < best_cost:
+                best, best_cost = rec, cost
+        return best, best_cost
+
+    def _dependencies(self, name: str) -> Iterator[str]:
+        for rec in self._makers.get(name, ()):
+            yield from _ingredient_names(rec)
+
+    def _post_order(self, name: str, done: Mapping[str, object]) -> list[str]:
+        """List name and the prototypes it is made from, ingredients first.
+
+        Prototypes in done are left out. Iterative, as the chains of recipes may be
+        longer than the recursion limit.
+        """
+        order: list[str] = []
+        if name in done:
+            return order
+        seen = {name}
+        stack = [(name, self._dependencies(name))]
+        while stack:
+            node, deps = stack[-1]
+            for dep in deps:
+                if dep not in seen and dep not in done:
+                    seen.add(dep)
+                    stack.append((dep, self._dependencies(dep)))
+                    break
+            else:
+                stack.pop()
+                order.append(node)
+        return order
+
+    def _cost(self, name: str) -> float | None:
+        if name not in self._costs:
+            # the ingredients first, so that each cost is made from known costs
+            for node in self._post_order(name, self._costs):
+                self._costs[node] = self._node_cost(node)
+        return self._costs[name]
+
+    def _node_cost(self, name: str) -> float | None:
+        if not self._makers.get(name):
+            # a raw material, or made only in a cycle: use the price of the item
+            return self._base_price(name)
+
+        rec, cost = self._cheapest_recipe(name)
+        return cost if rec is not None else self._base_price(name)
+
+    def raw_cost(self, name: str) -> float | None:
+        """Get the BasePrice of the raw materials needed for one unit of a prototype.
+
+        Uses the cheapest recipe and the cheapest of interchangeable ingredients.
+        Returns None if the price of a raw material is not known.
+        """
+        return self._cost(name)
+
+    def _tree(self, name: str) -> CraftingTree:
+        if name not in self._trees:
+            for node in self._post_order(name, self._trees):
+                self._trees[node] = self._node_tree(node)
+        return self._trees[name]
+
+    def _node_tree(self, name: str) -> CraftingTree:
+        if not self._makers.get(name):
+            return CraftingTree(name)
+
+        rec, _ = self._cheapest_recipe(name)
+        if rec is None:
+            rec = self._makers[name][0]
+        ingredients = []
+        for ingr in rec.get('IngredientList', ()):
+            costs = [(self.raw_cost(n), n) for n in ingr.names]
+            known = [c for c in costs if c[0] is not None]
+            ingr_name = min(known)[1] if known else ingr.names[0]
+            ingredients.append((ingr.amount, self._trees[ingr_name]))
+
+        return CraftingTree(name, rec['UniqueID'],
+                            leading_number(rec.get('ProductAmount')) or 1.0,
+                            tuple(ingredients))
+
+    def crafting_tree(self, name: str) -> CraftingTree:
+        """How to make a prototype from raw materials, with the cheapest recipes."""
+        return self._tree(name)
+
+    def raw_materials(self, name: str, amount: float = 1.0) -> dict[str, float]:
+        """Get the amounts of raw materials needed to make an amount of a prototype."""
+        totals: dict[str, float] = {}
+        stack = [(self.crafting_tree(name), amount)]
+        while stack:
+            tree, tree_amount = stack.pop()
+            if tree.recipe is None:
+                totals[tree.name] = totals.get(tree.name, 0.0) + tree_amount
+                continue
+            crafts = tree_amount / tree.product_amount
+            # reversed, so that the ingredients are added in their order
+            stack.extend((subtree, crafts * ingr_amount)
+                         for ingr_amount, subtree in reversed(tree.ingredients))
+        return totals
+
+
+def _ingredient_names(rec: Mapping) -> Iterator[str]:
+    for ingr in rec.get('IngredientList', ()):
+        yield from ingr.names
+
+
+def _components(graph: Mapping[str, Iterable[str]]) -> dict[str, int]:
+    """Find the strongly connected components of a graph, with Tarjan's algorithm.
+
+    Each node is mapped to the number of its component. Iterative, as the chains of
+    recipes may be longer than the recursion limit.
+    """
+    index: dict[str, int] = {}
+    low: dict[str, int] = {}
+    component: dict[str, int] = {}
+    stack: list[str] = []
+    for root in graph:
+        if root in index:
+            continue
+        index[root] = low[root] = len(index)
+        stack.append(root)
+        work = [(root, iter(graph[root]))]
+        while work:
+            node, edges = work[-1]
+            for succ in edges:
+                if succ not in index:
+                    index[succ] = low[succ] = len(index)
+                    stack.append(succ)
+                    work.append((succ, iter(graph.get(succ, ()))))
+                    break
+                if succ not in component:
+                    low[node] = min(low[node], index[succ])
+            else:
+                work.pop()
+                if work:
+                    parent = work[-1][0]
+                    low[parent] = min(low[parent], low[node])
+                if low[node] == index[node]:
+                    while True:
+                        member = stack.pop()
+                        component[member] = index[node]
+                        if member == node:
+                            break
+    return component
+
+
+def load_crafting_index(version: str, conf: 'Config | None' = None) -> CraftingIndex:
+    """Load and process the items and recipes of a game version, and index them."""
+    with use_config(conf):
+        # only reading the game files, so the caches of other versions are kept
+        caches = {
+            name: open_parse_cache(name, version, evict=False)
+            for name in ('items', 'recipes')
+        }
+        items = process_items(iter_items(caches['items']))
+        recipes = process_recipes(iter_parsed_recipes(caches['recipes']))
+        for cache in caches.values():
+            if cache is not None:
+                cache.save()
+        index = CraftingIndex(items, recipes)
+    log.info('Indexed %s items and %s recipes', len(index.items), len(index.recipes))
+    return index
@@ -0,0 +1,23 @@
+"""Fixtures shared by the tests."""
+
+from collections.abc import Iterator
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+import pytest
+
+from survivalist_gamedata.config import load_config, use_config
+
+if TYPE_CHECKING:
+    from confuse.templates import AttrDict as Config  # type: ignore  # noqa: PGH003
+
+PACKAGE_DIR = Path(__file__).parents[1] / 'survivalist_gamedata'
+
+
+@pytest.fixture
+def conf(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> Iterator['Config']:
+    """Use the default config, with tmp_path as the working directory."""
+    monkeypatch.chdir(tmp_path)
+    config = load_config(config_file=PACKAGE_DIR / 'config_default.yaml')
+    with use_config(config):
+        yield config
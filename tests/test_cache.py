@@ -0,0 +1,107 @@
+"""The parse cache reuses parsed files until they change."""
+
+import os
+import pickle
+from pathlib import Path
+
+import pytest
+
+from survivalist_gamedata.cache import ParseCache
+from survivalist_gamedata.common import parse_xml_files
+
+pytestmark = pytest.mark.usefixtures('conf')
+
+
+@pytest.fixture
+def xml_paths(tmp_path: Path) -> list[Path]:
+    paths = []
+    for name in ('Knife', 'Axe'):
+        path = tmp_path / f'{name}.xml'
+        path.write_text(f'<Equipment><NativeName>{name}</NativeName></Equipment>')
+        paths.append(path)
+    return paths
+
+
+def test_reused_after_save(tmp_path: Path, xml_paths: list[Path]) -> None:
+    cache_path = tmp_path / 'cache' / 'items.pickle'
+    cache = ParseCache(cache_path)
+    docs = parse_xml_files(xml_paths, cache)
+    assert (cache.hits, cache.misses) == (0, 2)
+    cache.save()
+
+    cache = ParseCache(cache_path)
+    assert parse_xml_files(xml_paths, cache) == docs
+    assert (cache.hits, cache.misses) == (2, 0)
+
+
+def test_touched_file_with_same_content_is_reused(xml_paths: list[Path]) -> None:
+    cache = ParseCache()
+    parse_xml_files(xml_paths, cache)
+    st = xml_paths[0].stat()
+    os.utime(xml_paths[0], ns=(st.st_atime_ns, st.st_mtime_ns + 10**9))
+
+    parse_xml_files(xml_paths, cache)
+    assert (cache.hits, cache.misses) == (2, 2)
+
+
+def test_changed_file_is_parsed_again(xml_paths: list[Path]) -> None:
+    cache = ParseCache()
+    parse_xml_files(xml_paths, cache)
+    # the same size, so that only the content hash tells the change
+    xml_paths[0].write_text(xml_paths[0].read_text().replace('Knife', 'Spoon'))
+
+    docs = dict(parse_xml_files(xml_paths, cache))
+    assert docs[xml_paths[0]] == {'Equipment': {'NativeName': 'Spoon'}}
+    assert (cache.hits, cache.misses) == (1, 3)
+
+
+def test_documents_are_copies(xml_paths: list[Path]) -> None:
+    cache = ParseCache()
+    parse_xml_files(xml_paths, cache)
+    cache.get(xml_paths[0])['Equipment']['NativeName'] = 'Changed'
+    assert cache.get(xml_paths[0]) == {'Equipment': {'NativeName': 'Knife'}}
+
+
+def test_save_drops_unused_entries_unless_kept(tmp_path: Path,
+                                               xml_paths: list[Path]) -> None:
+    cache_path = tmp_path / 'cache.pickle'
+    cache = ParseCache(cache_path)
+    parse_xml_files(xml_paths, cache)
+    cache.save()
+
+    cache = ParseCache(cache_path)
+    parse_xml_files(xml_paths[:1], cache)
+    cache.keep(xml_paths[1:])
+    cache.save()
+    assert xml_paths[1] in ParseCache(cache_path)
+
+    cache = ParseCache(cache_path)
+    parse_xml_files(xml_paths[:1], cache)
+    cache.save()
+    assert xml_paths[1] not in ParseCache(cache_path)
+
+
+def test_other_parser_key_parses_again(xml_paths: list[Path]) -> None:
+    cache = ParseCache()
+    parse_xml_files(xml_paths, cache)
+    cache.use_parser('other fields')
+    assert xml_paths[0] not in cache
+
+
+def test_cache_of_other_format_is_ignored(tmp_path: Path, xml_paths: list[Path]) -> None:
+    cache_path = tmp_path / 'cache.pickle'
+    cache = ParseCache(cache_path)
+    parse_xml_files(xml_paths, cache)
+    cache.save()
+    data = pickle.loads(cache_path.read_bytes())  # noqa: S301
+    data['format'] = -1
+    cache_path.write_bytes(pickle.dumps(data))
+
+    assert xml_paths[0] not in ParseCache(cache_path)
+
+
+def test_unreadable_cache_is_ignored(tmp_path: Path) -> None:
+    cache_path = tmp_path / 'cache.pickle'
+    cache_path.write_bytes(b'not a pickle')
+    cache = ParseCache(cache_path)
+    assert cache.get(tmp_path / 'Knife.xml') is None
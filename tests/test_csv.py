@@ -0,0 +1,93 @@
+"""CSV files have the same columns and bytes in every run."""
+
+import os
+import subprocess
+import sys
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+import pytest
+
+from survivalist_gamedata.common import write_csv
+from survivalist_gamedata.items import extract_items
+from survivalist_gamedata.store import RecordTable
+
+from .conftest import PACKAGE_DIR
+
+if TYPE_CHECKING:
+    from confuse.templates import AttrDict as Config  # type: ignore  # noqa: PGH003
+
+# each item has other fields, in another order
+ITEMS = {
+    'Knife': '<Category>2:Weapons/Melee</Category><Damage>4</Damage>'
+             '<BasePrice>10</BasePrice>',
+    'Axe': '<Weight>2</Weight><Category>2:Weapons/Melee</Category>'
+           '<BasePrice>20</BasePrice><Damage>9</Damage>',
+    'Apple': '<BasePrice>3</BasePrice><Category>5:Food/Dishes</Category>'
+             '<Calories>95</Calories>',
+    'Rope': '<Durability>50</Durability><Category>6:Crafting</Category>',
+}
+
+# extracts the items in a new interpreter, with its own hash seed
+EXTRACT_SCRIPT = """
+import sys
+from pathlib import Path
+from survivalist_gamedata.config import load_config, use_config
+from survivalist_gamedata.items import extract_items
+
+conf = load_config(config_file=Path(sys.argv[1]))
+conf.base_dir = sys.argv[2]
+conf.gamedata_dirs = ['BaseStory']
+conf.parallel.mode = sys.argv[3]
+with use_config(conf):
+    extract_items(sys.argv[4])
+"""
+
+
+@pytest.fixture
+def game_dir(conf: 'Config', tmp_path: Path) -> Path:
+    game_dir = tmp_path / 'game'
+    equipment_dir = game_dir / 'BaseStory' / 'Equipment'
+    equipment_dir.mkdir(parents=True)
+    for name, fields in ITEMS.items():
+        (equipment_dir / f'{name}.xml').write_text(
+            f'<EquipmentPrototype><NativeName>{name}</NativeName>{fields}'
+            '</EquipmentPrototype>')
+    conf.base_dir = game_dir
+    conf.gamedata_dirs = ['BaseStory']
+    return game_dir
+
+
+def run_extract(game_dir: Path, mode: str, version: str, hash_seed: int) -> bytes:
+    env = {**os.environ, 'PYTHONHASHSEED': str(hash_seed)}
+    env['PYTHONPATH'] = str(PACKAGE_DIR.parent)
+    args = [PACKAGE_DIR / 'config_default.yaml', game_dir, mode, version]
+    cmd = [sys.executable, '-c', EXTRACT_SCRIPT, *map(str, args)]
+    subprocess.run(cmd, env=env, check=True)  # noqa: S603
+    return Path(f'data/{version}/Items.csv').read_bytes()
+
+
+def test_items_csv_same_in_every_run(game_dir: Path) -> None:
+    extract_items('1.0')
+    csv_bytes = Path('data/1.0/Items.csv').read_bytes()
+    header = csv_bytes.decode().splitlines()[0].split(',')
+    # the columns are in the order they are first found, in the sorted item files
+    fields = ['Calories', 'Weight', 'Damage', 'Durability']
+    assert sorted(fields, key=header.index) == fields
+
+    runs = [('serial', 1), ('thread', 2), ('process', 3)]
+    for i, (mode, hash_seed) in enumerate(runs):
+        assert run_extract(game_dir, mode, f'1.{i + 1}', hash_seed) == csv_bytes
+
+
+def test_write_csv_same_for_records_and_dicts(tmp_path: Path) -> None:
+    rows = [{'B': '1', 'A': 'x,y'}, {'C': '"quoted"', 'A': ''}, {}]
+    table = RecordTable()
+    for row in rows:
+        table.append(row)
+
+    write_csv(tmp_path / 'dicts.csv', ['A', 'B', 'C'], rows)
+    write_csv(tmp_path / 'records.csv', ['A', 'B', 'C'], table)
+    csv_bytes = (tmp_path / 'dicts.csv').read_bytes()
+    assert csv_bytes == b'A,B,C\r\n"x,y",1,\r\n,,"""quoted"""\r\n,,\r\n'
+    assert (tmp_path / 'records.csv').read_bytes() == csv_bytes
@@ -0,0 +1,83 @@
+"""Changelog of the items and recipes between two extracted game versions."""
+
+import csv
+from pathlib import Path
+
+import pytest
+
+from survivalist_gamedata.common import ExtractsError
+from survivalist_gamedata.diff import (
+    Change,
+    diff_records,
+    read_csv_records,
+    write_changelog,
+)
+
+
+def write_rows(csv_path: Path, fields: list[str], rows: list[list[str]]) -> None:
+    csv_path.parent.mkdir(parents=True, exist_ok=True)
+    with csv_path.open('w', newline='') as csv_file:
+        writer = csv.writer(csv_file)
+        writer.writerow(fields)
+        writer.writerows(rows)
+
+
+def test_duplicate_keys_are_numbered(tmp_path: Path) -> None:
+    csv_path = tmp_path / 'Items.csv'
+    write_rows(csv_path, ['NativeName', 'Weight'], [['Knife', '1'], ['Knife', '2']])
+    records = read_csv_records(csv_path, 'NativeName')
+    assert list(records) == ['Knife', 'Knife #2']
+    assert records['Knife #2']['Weight'] == '2'
+
+    with pytest.raises(ExtractsError, match='no UniqueID column'):
+        read_csv_records(csv_path, 'UniqueID')
+
+
+def test_diff_records() -> None:
+    knife = {'Weight': '1', 'Damage': '8', 'xml_file_name': 'Knife.xml'}
+    new_knife = {'Weight': '1', 'Damage': '9', 'Scarcity': 'Common', 'xml_file_name': ''}
+    rock = {'Weight': '3'}
+    axe = {'Weight': '2'}
+    old = {'Knife': knife, 'Rock': rock}
+    new = {'Axe': axe, 'Knife': new_knife}
+    assert diff_records('Item', old, new, ['xml_file_name']) == [
+        Change('Item', 'Axe', 'added'),
+        Change('Item', 'Knife', 'changed', 'Damage', '8', '9'),
+        Change('Item', 'Knife', 'changed', 'Scarcity', '', 'Common'),
+        Change('Item', 'Rock', 'removed'),
+    ]
+    assert diff_records('Item', old, old) == []
+
+
+@pytest.mark.usefixtures('conf')
+def test_write_changelog(tmp_path: Path) -> None:
+    item_fields = ['NativeName', 'BasePrice', 'xml_file_name']
+    write_rows(tmp_path / 'data/1.0/Items.csv', item_fields,
+               [['Knife', '10', 'a.xml'], ['Rock', '1', 'b.xml']])
+    write_rows(tmp_path / 'data/1.1/Items.csv', item_fields,
+               [['Knife', '12', 'c.xml'], ['Rock', '1', 'd.xml']])
+    recipe_fields = ['UniqueID', 'SkillLevel']
+    write_rows(tmp_path / 'data/1.0/Recipes.csv', recipe_fields, [['r1', '1']])
+    write_rows(tmp_path / 'data/1.1/Recipes.csv', recipe_fields,
+               [['r1', '1'], ['r2', '3']])
+
+    write_changelog('1.0', '1.1')
+
+    with (tmp_path / 'data/1.1/Changes-1.0.csv').open(newline='') as csv_file:
+        rows = list(csv.reader(csv_file))
+    assert rows == [
+        ['Type', 'Key', 'Change', 'Field', 'Old', 'New'],
+        ['Item', 'Knife', 'changed', 'BasePrice', '10', '12'],
+        ['Recipe', 'r2', 'added', '', '', ''],
+    ]
+    markup = (tmp_path / 'data/1.1/Changes-1.0.txt').read_text()
+    assert markup.count('[table]') == 2
+    assert 'Knife' in markup
+    assert 'r2' in markup
+
+
+@pytest.mark.usefixtures('conf')
+def test_changelog_needs_both_versions(tmp_path: Path) -> None:
+    write_rows(tmp_path / 'data/1.0/Items.csv', ['NativeName'], [['Knife']])
+    with pytest.raises(ExtractsError, match=r'extract game version 1\.1 first'):
+        write_changelog('1.0', '1.1')
@@ -0,0 +1,80 @@
+"""NameExpander gives the same names as the original expand_names."""
+
+import random
+import re
+from pathlib import Path
+
+import pytest
+import yaml
+
+from survivalist_gamedata.common import NameExpander, expand_names
+
+PACKAGE_DIR = Path(__file__).parents[1] / 'survivalist_gamedata'
+
+
+def expand_names_reference(text: str, replacements: dict[str, str]) -> str:
+    text = re.sub(r'[a-z][A-Z]', lambda x: x.group(0)[0] + ' ' + x.group(0)[1], text)
+    text = re.sub(r'_([a-zA-Z0-9 ]+)', lambda x: f' ({x.group(1)})', text)
+    for orig, repl in replacements.items():
+        text = text.replace(orig, repl)
+    return text
+
+
+def default_replacements() -> dict[str, str]:
+    with (PACKAGE_DIR / 'config_default.yaml').open() as f:
+        return yaml.safe_load(f)['replacements']
+
+
+def make_texts(n: int, pieces: list[str]) -> list[str]:
+    rnd = random.Random(7)
+    return [''.join(rnd.choices(pieces, k=rnd.randint(1, 6))) for _ in range(n)]
+
+
+REPLACEMENTS = {'default': default_replacements()}
+REPLACEMENTS.update(
+    yaml.safe_load("""
+independent: {Fl Oz: FlOz, Sharp Object: Sharp, Blunt Object: Blunt}
+creates a later key: {ab: b, bb: c}
+breaks up a later key: {b: x, abc: y}
+overlapping keys: {abc: '1', cde: '2'}
+deletion: {'4:Clothing/': '', Hats: Caps}
+"""))
+
+PIECES = yaml.safe_load(r"""
+[a, b, c, d, e, ab, bc, cde, ' ', _, _Mk, _Large, Fl, ' Oz', Sharp, ' Object', Blunt,
+ Common at, Uncommon, Very Rare at, Rare at, Legendary at, '4:Clothing/', '5:Food/',
+ Hats, Cooked, Meat, (2), "\n"]
+""")
+
+
+@pytest.mark.parametrize('name', list(REPLACEMENTS))
+def test_same_as_reference(name: str) -> None:
+    replacements = REPLACEMENTS[name]
+    expander = NameExpander(replacements)
+    for text in make_texts(3000, PIECES):
+        assert expander.expand(text) == expand_names_reference(text, replacements), text
+
+
+@pytest.mark.parametrize(('name', 'single_pass'), [
+    ('default', False),
+    ('independent', True),
+    ('creates a later key', False),
+    ('breaks up a later key', False),
+    ('overlapping keys', False),
+    ('deletion', False),
+])
+def test_single_pass_only_when_safe(name: str, single_pass: bool) -> None:  # noqa: FBT001
+    assert NameExpander(REPLACEMENTS[name]).single_pass is single_pass
+
+
+def test_memoized_result_is_not_shared_between_replacements() -> None:
+    text = 'SharpObject_Mk2'
+    assert NameExpander({'Sharp Object': 'Sharp'}).expand(text) == 'Sharp (Mk2)'
+    assert NameExpander({}).expand(text) == 'Sharp Object (Mk2)'
+
+
+@pytest.mark.usefixtures('conf')
+def test_expand_names_uses_the_config_in_use() -> None:
+    assert expand_names('CookedMeat_Large') == 'Cooked Meat (Large)'
+    assert expand_names('4:Clothing/Hats') == 'Hats'
+    assert expand_names(12) == 12
@@ -0,0 +1,105 @@
+"""The manifest tells when outputs are current and which tables can be reused."""
+
+from pathlib import Path
+
+import pytest
+
+from survivalist_gamedata.manifest import (
+    Manifest,
+    TableCache,
+    config_digest,
+    table_digest,
+)
+
+COLS = {'NativeName': 'Name', 'Weight': 'Weight'}
+
+
+@pytest.fixture
+def files(tmp_path: Path) -> dict[str, Path]:
+    paths = {name: tmp_path / name for name in ('Knife.xml', 'Axe.xml', 'Items.txt')}
+    paths['Knife.xml'].write_text('<Equipment>Knife</Equipment>')
+    paths['Axe.xml'].write_text('<Equipment>Axe</Equipment>')
+    return paths
+
+
+def record_run(manifest: Manifest, files: dict[str, Path], config: str) -> dict[str, str]:
+    """Write two tables to Items.txt and record them, like a run of the items."""
+    inputs = manifest.digests([files['Knife.xml'], files['Axe.xml']])
+    tables = TableCache()
+    markups = []
+    for rows in ([{'NativeName': 'Knife'}], [{'NativeName': 'Axe', 'Weight': '2'}]):
+        markup = f'[table]{rows}[/table]\n'
+        tables.add(table_digest(COLS, rows), markup)
+        markups.append(markup)
+    files['Items.txt'].write_text(''.join(markups))
+    manifest.record('items', inputs, config, [files['Items.txt']], tables)
+    return inputs
+
+
+def test_current_until_an_input_changes(tmp_path: Path, files: dict[str, Path]) -> None:
+    manifest = Manifest(tmp_path / 'manifest.json')
+    config = config_digest({'columns': COLS})
+    inputs = record_run(manifest, files, config)
+    manifest.save()
+
+    manifest = Manifest(tmp_path / 'manifest.json')
+    outputs = [files['Items.txt']]
+    assert manifest.is_current('items', inputs, config, outputs)
+    assert not manifest.is_current('recipes', inputs, config, outputs)
+    assert not manifest.is_current('items', inputs, config_digest({}), outputs)
+
+    files['Axe.xml'].write_text('<Equipment>Big axe</Equipment>')
+    changed = manifest.digests([files['Knife.xml'], files['Axe.xml']])
+    assert changed != inputs
+    assert not manifest.is_current('items', changed, config, outputs)
+
+
+def test_outputs_must_be_unchanged(tmp_path: Path, files: dict[str, Path]) -> None:
+    manifest = Manifest(tmp_path / 'manifest.json')
+    inputs = record_run(manifest, files, 'config')
+    files['Items.txt'].write_text('edited')
+    assert not manifest.is_current('items', inputs, 'config', [files['Items.txt']])
+    files['Items.txt'].unlink()
+    assert not manifest.is_current('items', inputs, 'config', [files['Items.txt']])
+
+
+def test_unchanged_tables_are_reused(tmp_path: Path, files: dict[str, Path]) -> None:
+    manifest = Manifest(tmp_path / 'manifest.json')
+    record_run(manifest, files, 'config')
+
+    tables = manifest.table_cache('items', 'config', files['Items.txt'])
+    digest = table_digest(COLS, [{'NativeName': 'Axe', 'Weight': '2'}])
+    assert tables.get(digest) == "[table][{'NativeName': 'Axe', 'Weight': '2'}][/table]\n"
+    assert tables.get(table_digest(COLS, [{'NativeName': 'Spoon'}])) is None
+    assert tables.reused == 1
+
+
+def test_tables_reset_after_a_change(tmp_path: Path, files: dict[str, Path]) -> None:
+    manifest = Manifest(tmp_path / 'manifest.json')
+    record_run(manifest, files, 'config')
+    assert not manifest.table_cache('items', 'other config', files['Items.txt']).previous
+
+    files['Items.txt'].write_text(files['Items.txt'].read_text() + 'edited')
+    assert not manifest.table_cache('items', 'config', files['Items.txt']).previous
+
+
+def test_config_digest_depends_on_the_extractor_version(
+        monkeypatch: pytest.MonkeyPatch) -> None:
+    digest = config_digest({'columns': COLS})
+    assert config_digest({'columns': COLS}) == digest
+    upgraded = ('99.0.0', 'Extracts game data')
+    monkeypatch.setattr('survivalist_gamedata.manifest._project_info', lambda: upgraded)
+    assert config_digest({'columns': COLS}) != digest
+
+
+def test_table_digest_depends_on_the_columns_and_cells() -> None:
+    rows = [{'NativeName': 'Knife', 'Weight': '1'}]
+    assert table_digest(COLS, rows) == table_digest(COLS, [dict(rows[0])])
+    assert table_digest(COLS, rows) != table_digest({'NativeName': 'Name'}, rows)
+    assert table_digest(COLS, rows) != table_digest(COLS, [{'NativeName': 'Knife'}])
+
+
+def test_unreadable_manifest_is_ignored(tmp_path: Path) -> None:
+    manifest_path = tmp_path / 'manifest.json'
+    manifest_path.write_text('{not json')
+    assert Manifest(manifest_path).stages == {}
@@ -0,0 +1,50 @@
+"""Parsing in a thread or process pool gives the same results as parsing serially."""
+
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+import pytest
+
+from survivalist_gamedata.common import iter_xml_files
+
+if TYPE_CHECKING:
+    from confuse.templates import AttrDict as Config  # type: ignore  # noqa: PGH003
+
+
+@pytest.fixture
+def xml_paths(tmp_path: Path) -> list[Path]:
+    paths = []
+    for i in range(20):
+        path = tmp_path / f'Item{i:02}.xml'
+        if i in {3, 11}:
+            path.write_text('<Equipment><NativeName>Broken</Equipment>')
+        else:
+            path.write_text(f'<Equipment><NativeName>Item {i}</NativeName></Equipment>')
+        paths.append(path)
+    # not in name order, to tell the input order apart from a sorted one
+    return paths[::2] + paths[1::2]
+
+
+@pytest.mark.parametrize('mode', ['thread', 'process'])
+def test_same_order_as_serial(conf: 'Config', xml_paths: list[Path], mode: str) -> None:
+    serial = list(iter_xml_files(xml_paths))
+
+    conf.parallel.mode = mode
+    conf.parallel.workers = 3
+    assert list(iter_xml_files(xml_paths)) == serial
+    parsed = [path for path in xml_paths if path.stem not in {'Item03', 'Item11'}]
+    assert [path for path, _ in serial] == parsed
+
+
+@pytest.mark.parametrize('mode', ['serial', 'thread', 'process'])
+def test_failed_files_are_reported(conf: 'Config', xml_paths: list[Path], mode: str,
+                                   caplog: pytest.LogCaptureFixture) -> None:
+    conf.parallel.mode = mode
+    conf.parallel.workers = 3
+    failed: list[Path] = []
+    docs = list(iter_xml_files(xml_paths, failed=failed))
+
+    assert len(docs) == 18
+    assert [path.stem for path in failed] == ['Item03', 'Item11']
+    assert 'Could not parse' in caplog.text
+    assert '2 out of 20 XML files could not be parsed' in caplog.text
@@ -0,0 +1,63 @@
+"""The XML parser backends give the same dicts as xmltodict."""
+
+import pytest
+import xmltodict
+
+from survivalist_gamedata.common import ExtractsError
+from survivalist_gamedata.parsers import BACKENDS, XmlParser
+
+DOC = b"""<?xml version="1.0" encoding="utf-8"?>
+<!-- a comment -->
+<Equipment xmlns:xsi="http://www.w3.org/2001/XMLSchema-instance" Version="2">
+  <NativeName>Knife</NativeName>
+  <Empty />
+  <Weight unit="kg">1.5</Weight>
+  <GiftFor><string>Bob</string><string>Sue</string></GiftFor>
+  <Mixed>text <b>bold</b> tail</Mixed>
+  <Ammo xsi:nil="true" xml:lang="en" />
+  <?pi data?>
+</Equipment>
+"""
+
+
+@pytest.mark.parametrize('backend', BACKENDS)
+def test_same_dicts_as_xmltodict(backend: str) -> None:
+    assert XmlParser(backend).parse(DOC) == xmltodict.parse(DOC)
+
+
+@pytest.mark.parametrize('backend', BACKENDS)
+def test_fields_are_filtered_at_the_record_depth(backend: str) -> None:
+    keep = XmlParser(backend, keep=['NativeName', 'GiftFor', '@Version'])
+    parsed = keep.parse(DOC)['Equipment']
+    gift_for = {'string': ['Bob', 'Sue']}
+    assert parsed == {'@Version': '2', 'NativeName': 'Knife', 'GiftFor': gift_for}
+    skip = XmlParser(backend, skip=['Mixed', 'Ammo', 'Empty', '@xmlns:xsi'])
+    parsed = skip.parse(DOC)['Equipment']
+    assert list(parsed) == ['@Version', 'NativeName', 'Weight', 'GiftFor']
+    # only the fields of the records are filtered
+    assert parsed['Weight'] == {'@unit': 'kg', '#text': '1.5'}
+
+
+@pytest.mark.parametrize('backend', BACKENDS)
+def test_records_deeper_down(backend: str) -> None:
+    doc = (b'<List><Recipe><Id>1</Id><Skip>x</Skip></Recipe>'
+           b'<Recipe><Id>2</Id></Recipe></List>')
+    parser = XmlParser(backend, record_depth=2, skip=['Skip'])
+    assert parser.parse(doc) == {'List': {'Recipe': [{'Id': '1'}, {'Id': '2'}]}}
+
+
+def test_key_depends_on_the_fields_only() -> None:
+    assert XmlParser('etree').key == ''
+    assert XmlParser('etree', keep=['A']).key == XmlParser('xmltodict', keep=['A']).key
+    assert XmlParser('etree', keep=['A']).key != XmlParser('etree', skip=['A']).key
+
+
+@pytest.mark.parametrize('backend', ['etree', 'lxml'])
+def test_truncated_document(backend: str) -> None:
+    with pytest.raises(SyntaxError):
+        XmlParser(backend).parse(DOC[:100])
+
+
+def test_unknown_backend() -> None:
+    with pytest.raises(ExtractsError, match='Unknown XML parser'):
+        XmlParser('sax')
@@ -0,0 +1,108 @@
+"""Rows are routed to the same tables as a scan of every row for every table gives."""
+
+import itertools
+import random
+from collections.abc import Callable
+from types import SimpleNamespace
+from typing import TYPE_CHECKING
+
+import pytest
+import yaml
+
+from survivalist_gamedata.items import render_item_tables, route_items
+from survivalist_gamedata.recipes import render_recipe_tables, route_recipes
+
+if TYPE_CHECKING:
+    from confuse.templates import AttrDict as Config  # type: ignore  # noqa: PGH003
+
+ITEM_TABLES = [
+    SimpleNamespace(Category=cat)
+    for cat in ['5:Food', '2:Weapons/Melee', '5:Food/Dishes', '', '5:Food', '2:Weapons']
+]
+CATEGORIES = yaml.safe_load("""
+[2:Weapons, 2:Weapons/Melee, 2:Weapons/Melee/Axes, 2:Weapons/Ranged, 5:Food,
+ 5:Food/Dishes, 5:Food/Drink, 5:Fo, 6:Crafting, '']
+""")
+
+RECIPE_TABLES = [
+    SimpleNamespace(**table) for table in yaml.safe_load("""
+- {SkillType: Cooking, RecipeType: '*'}
+- {SkillType: Construction, RecipeType: Forge}
+- {SkillType: Cooking, RecipeType: Campfire}
+- {SkillType: Construction, RecipeType: '*'}
+- {SkillType: Cooking, RecipeType: Campfire}
+""")
+]
+RECIPE_TYPES = list(
+    itertools.product(['Cooking', 'Construction', 'Medicine'],
+                      ['Campfire', 'Forge', 'Inventory', '*']))
+
+
+def in_item_table(item: dict, table: SimpleNamespace) -> bool:
+    """Check if an item goes in a table, the way the Steam tables were filled."""
+    return item['Category'].startswith(table.Category)
+
+
+def in_recipe_table(rec: dict, table: SimpleNamespace) -> bool:
+    """Check if a recipe goes in a table, the way the Steam tables were filled."""
+    if table.SkillType != rec['SkillType']:
+        return False
+    return table.RecipeType in {'*', rec['RecipeType']}
+
+
+def scan(rows: list[dict], tables: list, in_table: Callable) -> list[list[dict]]:
+    """Route rows by scanning every row for every table, as before route_*."""
+    return [[row for row in rows if in_table(row, table)] for table in tables]
+
+
+def make_items(n: int) -> list[dict]:
+    rng = random.Random(n)
+    items = [{'Category': cat} for cat in rng.choices(CATEGORIES, k=n)]
+    for i, item in enumerate(items):
+        item['NativeName'] = f'Item {i}'
+    return items
+
+
+def make_recipes(n: int) -> list[dict]:
+    rng = random.Random(n)
+    recipes = []
+    for i in range(n):
+        rec = {'UniqueID': f'recipe{i}', 'Deprecated': rng.choice(['true', 'false'])}
+        rec['SkillType'], rec['RecipeType'] = rng.choice(RECIPE_TYPES)
+        recipes.append(rec)
+    return recipes
+
+
+@pytest.mark.parametrize('n', [0, 1, 200])
+def test_route_items(n: int) -> None:
+    items = make_items(n)
+    assert route_items(items, ITEM_TABLES) == scan(items, ITEM_TABLES, in_item_table)
+
+
+@pytest.mark.parametrize('n', [0, 1, 200])
+def test_route_recipes(n: int) -> None:
+    recipes = make_recipes(n)
+    expected = scan(recipes, RECIPE_TABLES, in_recipe_table)
+    assert route_recipes(recipes, RECIPE_TABLES) == expected
+
+
+def test_item_counts_with_default_tables(conf: 'Config') -> None:
+    items = make_items(200)
+    tables = conf.game_items.steam_tables.tables
+    expected = scan(items, tables, in_item_table)
+    assert route_items(items, tables) == expected
+
+    # the count is what the warning about unsaved items is based on
+    _, cnt_added = render_item_tables(items)
+    assert cnt_added == sum(map(len, expected))
+
+
+def test_recipe_counts_with_default_tables(conf: 'Config') -> None:
+    recipes = make_recipes(200)
+    tables = conf.recipes.steam_tables.tables
+    expected = scan(recipes, tables, in_recipe_table)
+    assert route_recipes(recipes, tables) == expected
+
+    # the count is what the warning about unsaved recipes is based on
+    _, cnt = render_recipe_tables(recipes)
+    assert cnt == sum(map(len, expected))
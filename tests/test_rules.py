@@ -0,0 +1,108 @@
+"""The normalisation rules of items and recipes."""
+
+from typing import TYPE_CHECKING
+
+import pytest
+import yaml
+
+from survivalist_gamedata.common import ExtractsError
+from survivalist_gamedata.rules import RuleSet, rule_fields
+
+if TYPE_CHECKING:
+    from confuse.templates import AttrDict as Config  # type: ignore  # noqa: PGH003
+
+
+@pytest.fixture
+def item_rules(conf: 'Config') -> RuleSet:
+    return RuleSet(conf.game_items.rules)
+
+
+def test_map_and_set(item_rules: RuleSet) -> None:
+    seeds = {'NativeName': 'Seed', 'Category': '5:Food/Seeds'}
+    item_rules.apply(seeds)
+    assert seeds['Category'] == '5:Seeds'
+
+    sugar = {'NativeName': 'Sugar', 'Category': '5:Food/Cooking'}
+    item_rules.apply(sugar)
+    assert sugar['Category'] == '5:Food/Dishes'
+
+
+def test_join(item_rules: RuleSet) -> None:
+    item = {'GiftFor': {'string': ['Bob', 'Sue']}, 'BadGiftFor': {'string': 'Tim'}}
+    item_rules.apply(item)
+    assert item == {'GiftFor': 'Bob, Sue', 'BadGiftFor': 'Tim'}
+
+    empty = {'GiftFor': None}
+    item_rules.apply(empty)
+    assert empty == {'GiftFor': None}
+
+
+def test_level(item_rules: RuleSet) -> None:
+    item = {'Damage': '10', 'DamageBonusPerSkillLevel': '0.5', 'Range': '20'}
+    item_rules.apply(item)
+    assert item['Damage'] == '10.00 / 12.50'
+    assert item['Range'] == '20'
+
+
+def test_rules_run_in_their_order_for_the_fields_a_record_has() -> None:
+    rules = RuleSet(
+        yaml.safe_load("""
+        - field: B
+          set:
+            Out: "b {B}"
+        - field: A
+          set:
+            B: from a
+        - field: B
+          map:
+            from a: mapped
+        """))
+    both = {'A': '1', 'B': '2'}
+    rules.apply(both)
+    assert both == {'A': '1', 'B': 'mapped', 'Out': 'b 2'}
+
+    only_a = {'A': '1'}
+    rules.apply(only_a)
+    assert only_a == {'A': '1', 'B': 'from a'}
+
+
+@pytest.mark.parametrize(('condition', 'arg', 'value', 'runs'), [
+    ('equals', 'Knife', 'Knife', True),
+    ('equals', 'Knife', 'Knife2', False),
+    ('startswith', 'Kni', 'Knife', True),
+    ('startswith', 'Kni', 'Axe', False),
+    ('unless', 'Other', 'Knife', True),
+    ('unless', 'Weight', 'Knife', False),
+])
+def test_conditions(condition: str, arg: str, value: str,
+                    runs: bool) -> None:  # noqa: FBT001
+    rules = RuleSet([{'field': 'NativeName', condition: arg, 'set': {'Tag': 'x'}}])
+    item = {'NativeName': value, 'Weight': '1'}
+    rules.apply(item)
+    assert ('Tag' in item) == runs
+
+
+def test_a_rule_must_do_something() -> None:
+    with pytest.raises(ExtractsError, match='does nothing'):
+        RuleSet([{'field': 'Category', 'equals': 'x'}])
+    with pytest.raises(ExtractsError, match='no field to level up'):
+        RuleSet([{'field': 'Bonus', 'level': 5, 'set': {'X': '{leveled}'}}])
+
+
+def test_rule_fields() -> None:
+    rule = {'field': 'Bonus', 'level': 5, 'of': 'Damage', 'set': {'Damage': '{value}'}}
+    assert rule_fields(rule) == {'Bonus', 'Damage'}
+    rule = {'field': 'A', 'unless': 'B', 'set': {'C': '{D} {E[0]}'}}
+    assert rule_fields(rule) == {'A', 'B', 'C', 'D', 'E'}
+
+
+def test_outcomes(item_rules: RuleSet) -> None:
+    seeds = {'Category': '5:Food/Seeds', 'NativeName': 'Seed'}
+    assert item_rules.outcomes('Category', seeds) == {'5:Food/Seeds', '5:Seeds'}
+    # the name is not known, so it may be Sugar or Urine
+    weapons = item_rules.outcomes('Category', {'Category': '2:Weapons'})
+    assert weapons == {'2:Weapons', '5:Food/Dishes', '5:Food/Drink'}
+    knife = {'Category': '2:Weapons', 'NativeName': 'Knife'}
+    assert item_rules.outcomes('Category', knife) == {'2:Weapons'}
+    assert item_rules.outcomes('Category', {'NativeName': 'Knife'}) is None
+    assert item_rules.outcomes('SkillBonus', {'SkillBonus': '1'}) is None
@@ -0,0 +1,175 @@
+"""Extracting some of the items and recipes, and splicing their tables in."""
+
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+import pytest
+import yaml
+
+from survivalist_gamedata.common import splice_tables
+from survivalist_gamedata.items import extract_items
+from survivalist_gamedata.rules import RuleSet
+from survivalist_gamedata.selection import Selection
+
+if TYPE_CHECKING:
+    from confuse.templates import AttrDict as Config  # type: ignore  # noqa: PGH003
+
+ITEM_RULES = yaml.safe_load("""
+- field: Category
+  map:
+    "5:Food/Seeds": "5:Seeds"
+- field: NativeName
+  equals: Sugar
+  set:
+    Category: "5:Food/Dishes"
+""")
+
+RECIPE_RULES = yaml.safe_load("""
+- field: RecipeType
+  startswith: Campfire_SpitRoast
+  set:
+    RecipeType: Campfire
+""")
+
+
+def write_item(game_dir: Path, name: str, category: str, price: int) -> Path:
+    """Write an item file, a liquid if the category is 5:Food/Drink."""
+    if category == '5:Food/Drink':
+        folder, root = 'Liquid', 'LiquidPrototype'
+    else:
+        folder, root = 'Equipment', 'EquipmentPrototype'
+    path = game_dir / 'BaseStory' / folder / f'{name}.xml'
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text('<?xml version="1.0" encoding="utf-8"?>\n'
+                    f'<{root}><NativeName>{name}</NativeName>'
+                    f'<Category>{category}</Category>'
+                    f'<BasePrice>{price}</BasePrice></{root}>')
+    return path
+
+
+def test_item_tables_with_categories() -> None:
+    selection = Selection(categories=['2:Weapons'])
+    assert selection.item_table_selected({'Category': '2:Weapons/Melee'})
+    assert not selection.item_table_selected({'Category': '5:Food'})
+    # a table of all weapons would also have the weapons of other categories
+    assert not Selection(categories=['2:Weapons/Melee']).item_table_selected(
+        {'Category': '2:Weapons'})
+
+
+def test_item_tables_with_files_left_out(tmp_path: Path) -> None:
+    selection = Selection(files=['Liquid/*.xml'], item_rules=RuleSet(ITEM_RULES))
+    selection.leave_out_item_files([
+        write_item(tmp_path, 'Knife', '2:Weapons/Melee', 10),
+        write_item(tmp_path, 'Seeds', '5:Food/Seeds', 1),
+    ])
+    assert selection.item_table_selected({'Category': '3:Medical'})
+    assert not selection.item_table_selected({'Category': '2:Weapons'})
+    # the rules may move the seeds
+    assert not selection.item_table_selected({'Category': '5:Seeds'})
+    assert not selection.item_table_selected({'Category': '5:Food'})
+
+    # the rules may move sugar to any category of food
+    selection = Selection(files=['Liquid/*.xml'], item_rules=RuleSet(ITEM_RULES))
+    selection.leave_out_item_files([write_item(tmp_path, 'Sugar', '6:Crafting', 1)])
+    assert not selection.item_table_selected({'Category': '5:Food/Dishes'})
+    assert selection.item_table_selected({'Category': '5:Food/Drink'})
+
+
+def test_no_item_table_with_an_unreadable_file_left_out(tmp_path: Path) -> None:
+    selection = Selection(files=['Liquid/*.xml'])
+    selection.leave_out_item_files([tmp_path / 'missing.xml'])
+    assert not selection.item_table_selected({'Category': '9:Special'})
+
+
+def test_item_files_are_skipped_by_their_header(tmp_path: Path) -> None:
+    selection = Selection(categories=['5:Food'], item_rules=RuleSet(ITEM_RULES))
+    assert selection.may_select_item_file(write_item(tmp_path, 'Apple', '5:Food', 1))
+    assert not selection.may_select_item_file(
+        write_item(tmp_path, 'Knife', '2:Weapons/Melee', 10))
+    assert selection.may_select_item_file(write_item(tmp_path, 'Sugar', '6:Crafting', 1))
+    assert selection.may_select_item_file(tmp_path / 'missing.xml')
+
+
+def test_recipes() -> None:
+    selection = Selection(skill_types=['Cooking'],
+                          recipe_types=['Campfire'],
+                          recipe_rules=RuleSet(RECIPE_RULES))
+    campfire = {'SkillType': 'Cooking', 'RecipeType': 'Campfire'}
+    spit_roast = {'SkillType': 'Cooking', 'RecipeType': 'Campfire_SpitRoast_Meat'}
+    assert selection.may_select_recipe(spit_roast)
+    assert not selection.may_select_recipe({'SkillType': 'Cooking', 'RecipeType': 'Kiln'})
+    assert not selection.may_select_recipe({'SkillType': 'Medicine'})
+    assert selection.recipe_selected(campfire)
+    assert selection.recipe_table_selected(campfire)
+    any_type = {'SkillType': 'Cooking', 'RecipeType': '*'}
+    assert not selection.recipe_table_selected(any_type)
+    selection.leave_out_recipe_files([Path('Recipes/Medicine.xml')])
+    assert not selection.recipe_table_selected(campfire)
+
+
+def test_pipelines() -> None:
+    names = ['recipes', 'items']
+    assert Selection().pipelines(names) == names
+    assert Selection(categories=['3:Medical']).pipelines(names) == ['items']
+    assert Selection(skill_types=['Cooking']).pipelines(names) == ['recipes']
+    assert Selection(files=['*/Knife.xml']).pipelines(names) == names
+
+
+def test_splice_tables(tmp_path: Path) -> None:
+    markup_path = tmp_path / 'Items.txt'
+    tables = ['[table]\nA\n[/table]\n\n', '[table]\nB\n[/table]\n\n']
+    new_b = '[table]\nB2\n[/table]\n\n'
+    assert splice_tables(markup_path, [None, new_b]) == new_b
+
+    markup_path.write_text(''.join(tables))
+    assert splice_tables(markup_path, [None, new_b]) == tables[0] + new_b
+    # a file with other tables is not kept
+    assert splice_tables(markup_path, [None, None, new_b]) == new_b
+    markup_path.write_text('edited ' + ''.join(tables))
+    assert splice_tables(markup_path, [None, new_b]) == new_b
+
+
+@pytest.fixture
+def game_dir(conf: 'Config', tmp_path: Path) -> Path:
+    """Make a game dir of two weapons, a dish and a drink, with the items extracted."""
+    game_dir = tmp_path / 'game'
+    conf.base_dir = game_dir
+    conf.gamedata_dirs = ['BaseStory']
+    write_item(game_dir, 'Knife', '2:Weapons/Melee', 10)
+    write_item(game_dir, 'Axe', '2:Weapons/Melee', 20)
+    write_item(game_dir, 'Apple', '5:Food/Dishes', 3)
+    write_item(game_dir, 'Water', '5:Food/Drink', 1)
+    extract_items('1.0')
+    return game_dir
+
+
+def test_files_left_out_keep_their_tables(conf: 'Config', game_dir: Path,
+                                          caplog: pytest.LogCaptureFixture) -> None:
+    csv_text = Path('data/1.0/Items.csv').read_text()
+    markup = Path('data/1.0/Items.txt').read_text()
+    write_item(game_dir, 'Knife', '2:Weapons/Melee', 15)
+
+    # the axe, which is left out, is in the table of the knife
+    conf.select.files = ['Equipment/Knife.xml']
+    extract_items('1.0')
+    assert Path('data/1.0/Items.txt').read_text() == markup
+    assert Path('data/1.0/Items.csv').read_text() == csv_text
+    # the knife is not in a table, as its table is not selected
+    assert 'Are there new Categories?' not in caplog.text
+
+
+def test_selected_tables_are_replaced(conf: 'Config', game_dir: Path) -> None:
+    csv_text = Path('data/1.0/Items.csv').read_text()
+    write_item(game_dir, 'Knife', '2:Weapons/Melee', 15)
+    write_item(game_dir, 'Apple', '5:Food/Dishes', 4)
+
+    conf.select.categories = ['2:Weapons']
+    conf.select.files = ['Equipment/*.xml']
+    extract_items('1.0')
+    markup = Path('data/1.0/Items.txt').read_text()
+    assert '[td]15[/td]' in markup
+    assert '[td]20[/td]' in markup
+    # the food table is kept, as the drink is left out
+    assert '[td]3[/td]' in markup
+    assert '[td]4[/td]' not in markup
+    assert Path('data/1.0/Items.csv').read_text() == csv_text
@@ -0,0 +1,207 @@
+"""Queries on the items and recipes over HTTP."""
+
+import json
+import threading
+import urllib.error
+import urllib.request
+from collections.abc import Iterator
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+import pytest
+
+from survivalist_gamedata.items import process_items
+from survivalist_gamedata.recipes import process_recipes
+from survivalist_gamedata.serve import (
+    Dataset,
+    GamedataServer,
+    _open_caches,
+    _Reloader,
+    load_dataset,
+)
+
+if TYPE_CHECKING:
+    from confuse.templates import AttrDict as Config  # type: ignore  # noqa: PGH003
+
+ITEMS = [
+    ('Knife', '2:Weapons/Melee', '10'),
+    ('Axe', '2:Weapons/Melee', '20'),
+    ('Bow', '2:Weapons/Ranged', '30'),
+    ('Apple', '5:Food/Dishes', '3'),
+]
+
+RECIPES = [
+    ('r1', 'Cooking', 'Campfire', 'Stew', ['Apple', 'Meat']),
+    ('r2', 'Cooking', 'Stove', 'Pie', ['Apple']),
+    ('r3', 'Bushcraft', 'Inventory', 'Bow', ['Stick']),
+]
+
+
+def parsed_item(name: str, category: str, price: str) -> dict:
+    item = {'NativeName': name, 'Category': category, 'BasePrice': price}
+    return {'EquipmentPrototype': item}
+
+
+def parsed_recipe(uid: str, skill_type: str, recipe_type: str, product: str,
+                  ingredients: list[str]) -> dict:
+    ingrs = [{'PrototypeNames': {'string': name}, 'Amount': '1'} for name in ingredients]
+    ingredients_xml = {'Ingredient': ingrs}
+    return {
+        'UniqueID': uid,
+        'SkillType': skill_type,
+        'RecipeType': recipe_type,
+        'ProductPrototypeName': product,
+        'Ingredients': ingredients_xml,
+    }
+
+
+def make_dataset(version: str, items: list[tuple] = ITEMS) -> Dataset:
+    processed = process_items(parsed_item(*item) for item in items)
+    processed.sort()
+    recipes = process_recipes(parsed_recipe(*rec) for rec in RECIPES)
+    recipes.sort()
+    return Dataset(version, processed, recipes)
+
+
+@pytest.fixture
+def server(conf: 'Config') -> Iterator[GamedataServer]:
+    conf.serve.port = 0
+    conf.serve.page_size = 2
+    server = GamedataServer(conf, make_dataset('1.0'))
+    thread = threading.Thread(target=server.serve_forever, args=(0.01,), daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+    thread.join()
+
+
+def get(server: GamedataServer,
+        path: str,
+        headers: dict[str, str] | None = None) -> tuple[int, dict, bytes]:
+    host, port = server.server_address[:2]
+    request = urllib.request.Request(f'http://{host}:{port}{path}', headers=headers or {})
+    try:
+        with urllib.request.urlopen(request) as response:  # noqa: S310
+            return response.status, dict(response.headers), response.read()
+    except urllib.error.HTTPError as err:
+        return err.code, dict(err.headers), err.read()
+
+
+def get_json(server: GamedataServer, path: str) -> dict:
+    status, _, body = get(server, path)
+    assert status == 200
+    return json.loads(body)
+
+
+def names(page: dict, kind: str = 'items', field: str = 'NativeName') -> list[str]:
+    return [row[field] for row in page[kind]]
+
+
+def test_summary(server: GamedataServer) -> None:
+    summary = get_json(server, '/')
+    assert summary['version'] == '1.0'
+    assert (summary['items'], summary['recipes']) == (4, 3)
+
+
+def test_filters(server: GamedataServer) -> None:
+    # a Category matches the categories it starts with
+    weapons = get_json(server, '/items?Category=2:Weapons&limit=10')
+    assert names(weapons) == ['Axe', 'Knife', 'Bow']
+    # each filter matches any of its values
+    either = get_json(server, '/items?NativeName=Bow&NativeName=Apple')
+    assert names(either) == ['Bow', 'Apple']
+    assert names(get_json(server, '/items?Category=2:Weapons&NativeName=Apple')) == []
+    recipes = get_json(server, '/recipes?SkillType=Cooking&Ingredient=Meat')
+    assert names(recipes, 'recipes', 'UniqueID') == ['r1']
+
+
+def test_pagination(server: GamedataServer) -> None:
+    first = get_json(server, '/items')
+    assert (first['total'], first['offset'], first['limit']) == (4, 0, 2)
+    assert len(first['items']) == 2
+    rest = get_json(server, '/items?offset=2&limit=5')
+    assert names(first) + names(rest) == names(get_json(server, '/items?limit=4'))
+
+
+@pytest.mark.parametrize('path', [
+    '/items?Weight=1',
+    '/items?offset=-1',
+    '/items?limit=0',
+    '/items?limit=1001',
+    '/items?limit=ten',
+])
+def test_bad_requests(server: GamedataServer, path: str) -> None:
+    status, _, body = get(server, path)
+    assert status == 400
+    assert 'error' in json.loads(body)
+
+
+def test_one_item_or_recipe(server: GamedataServer) -> None:
+    knife = get_json(server, '/items/Knife')
+    assert knife['Category'] == '2:Weapons/Melee'
+    recipe = get_json(server, '/recipes/r3')
+    stick = {'names': ['Stick'], 'amount': 1.0, 'liquid': False}
+    assert recipe['IngredientList'] == [stick]
+    assert get(server, '/items/Spoon')[0] == 404
+    assert get(server, '/nothing')[0] == 404
+
+
+def test_tables(server: GamedataServer) -> None:
+    tables = get_json(server, '/tables/items')
+    melee = next(t for t in tables if t['Category'] == '2:Weapons/Melee')
+    status, headers, body = get(server, f'/tables/items/{melee["id"]}')
+    assert status == 200
+    assert headers['Content-Type'].startswith('text/plain')
+    assert body.decode() == melee['markup']
+    assert 'Knife' in melee['markup']
+    assert get(server, f'/tables/items/{len(tables)}')[0] == 404
+
+
+def test_etag(server: GamedataServer) -> None:
+    status, headers, _ = get(server, '/items')
+    etag = headers['ETag']
+    assert get(server, '/items', {'If-None-Match': etag})[0] == 304
+    assert get(server, '/recipes', {'If-None-Match': etag})[0] == 304
+    assert get(server, '/items', {'If-None-Match': f'"other", W/{etag}'})[0] == 304
+    assert get(server, '/items', {'If-None-Match': '*'})[0] == 304
+    # only whole tags match
+    assert get(server, '/items', {'If-None-Match': f'"x", {etag}x'})[0] == 200
+    assert get(server, '/items', {'If-None-Match': etag[1:-1]})[0] == 200
+    assert get(server, '/nothing', {'If-None-Match': etag})[0] == 404
+
+    # a new dataset with other content has another ETag
+    server.swap(make_dataset('1.1', [*ITEMS, ('Spoon', '6:Crafting', '1')]))
+    status, headers, body = get(server, '/items', {'If-None-Match': etag})
+    assert status == 200
+    assert headers['ETag'] != etag
+    assert json.loads(body)['total'] == 5
+
+
+def test_reload_keeps_the_data_while_a_file_is_broken(conf: 'Config',
+                                                      tmp_path: Path) -> None:
+    game_dir = tmp_path / 'game' / 'BaseStory'
+    (game_dir / 'Equipment').mkdir(parents=True)
+    conf.base_dir = tmp_path / 'game'
+    conf.gamedata_dirs = ['BaseStory']
+    conf.version_file = game_dir / 'Version.txt'
+    conf.serve.port = 0
+    conf.version_file.write_text('1.0\n')
+    knife = game_dir / 'Equipment' / 'Knife.xml'
+    knife.write_text('<EquipmentPrototype><NativeName>Knife</NativeName>'
+                     '<Category>2:Weapons/Melee</Category></EquipmentPrototype>')
+    caches = _open_caches('1.0')
+    server = GamedataServer(conf, load_dataset('1.0', caches))
+    try:
+        reloader = _Reloader(server, '1.0', caches)
+        dataset = server.dataset
+        knife.write_text('<EquipmentPrototype><NativeName>Kni')
+        reloader.reload()
+        assert server.dataset is dataset
+
+        knife.write_text('<EquipmentPrototype><NativeName>Axe</NativeName>'
+                         '<Category>2:Weapons/Melee</Category></EquipmentPrototype>')
+        reloader.reload()
+        assert [item['NativeName'] for item in server.dataset.items] == ['Axe']
+    finally:
+        server.server_close()
@@ -0,0 +1,94 @@
+"""Records and their sort keys."""
+
+import random
+from typing import TYPE_CHECKING
+
+import pytest
+
+from survivalist_gamedata.items import item_sort_key
+from survivalist_gamedata.store import (
+    RecordTable,
+    leading_number,
+    make_sort_key,
+    sort_value,
+)
+
+if TYPE_CHECKING:
+    from confuse.templates import AttrDict as Config  # type: ignore  # noqa: PGH003
+
+
+def test_empty_values_then_numbers_then_text() -> None:
+    ordered = [None, '-2', '0.5 / FlOz', '9', '10', '12.00 / 22.00', '1x', 'a', 'b']
+    shuffled = random.Random(3).sample(ordered, len(ordered))
+    assert sorted(shuffled, key=sort_value) == ordered
+
+
+@pytest.mark.parametrize(('value', 'number'), [
+    ('8 FlOz', 8.0),
+    ('0.5 / FlOz', 0.5),
+    (' -1.5e2', -150.0),
+    ('FlOz', None),
+    (None, None),
+    (3, None),
+])
+def test_leading_number(value: object, number: float | None) -> None:
+    assert leading_number(value) == number
+
+
+def test_sort_key_orders_by_the_fields_in_turn() -> None:
+    rows = [{'SkillType': 'Cooking', 'SkillLevel': level} for level in ('10', '9')]
+    rows.append({'SkillType': 'Bushcraft'})
+    key = make_sort_key(['SkillType', 'SkillLevel'])
+    assert sorted(rows, key=key) == [rows[2], rows[1], rows[0]]
+
+
+def test_table_sorts_by_the_keys_computed_when_added() -> None:
+    calls = []
+
+    def key(row: dict) -> tuple:
+        calls.append(row['Name'])
+        return (sort_value(row.get('Price')),)
+
+    table = RecordTable(sort_key=key)
+    for name, price in (('Axe', '12'), ('Knife', '8'), ('Rock', None)):
+        table.append({'Name': name, 'Price': price})
+    table.sort()
+    table.sort()
+    assert [row['Name'] for row in table] == ['Rock', 'Knife', 'Axe']
+    assert calls == ['Axe', 'Knife', 'Rock']
+
+
+def test_table_rows_are_mappings() -> None:
+    table = RecordTable(drop=['Scarcity'])
+    first = table.append({'Name': 'Knife', 'Scarcity': 'Common'})
+    second = table.append({'Name': 'Axe', 'Weight': '2'})
+    assert table.columns == ['Name', 'Weight']
+    assert dict(first) == {'Name': 'Knife'}
+    assert 'Weight' not in first
+    assert first.get('Weight', '-') == '-'
+    assert second.pick(['Weight', 'Name', 'Scarcity']) == ['2', 'Axe', None]
+    with pytest.raises(KeyError):
+        first['Scarcity']
+
+
+def item(category: str, name: str, **fields: str) -> dict[str, str]:
+    return {'Category': category, 'NativeName': name, **fields}
+
+
+def test_item_orderings_by_category(conf: 'Config') -> None:
+    conf.game_items.order_by = ['Category', 'BasePrice', 'NativeName']
+    conf.game_items.order_by_category = {
+        '2:Weapons': ['Category', 'Weight'],
+        '2:Weapons/Melee': ['Category', 'Damage', 'NativeName'],
+    }
+    items = [
+        item('2:Weapons/Melee', 'Axe', Damage='30'),
+        item('2:Weapons/Melee', 'Knife', Damage='8'),
+        item('2:Weapons/Ranged', 'Bow', Weight='12'),
+        item('2:Weapons/Ranged', 'Sling', Weight='1.5'),
+        item('3:Food', 'Bread', BasePrice='10'),
+        item('3:Food', 'Apple', BasePrice='10'),
+        item('3:Food', 'Meat', BasePrice='9'),
+    ]
+    names = [item['NativeName'] for item in sorted(items, key=item_sort_key())]
+    assert names == ['Knife', 'Axe', 'Sling', 'Bow', 'Meat', 'Apple', 'Bread']
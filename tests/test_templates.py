@@ -0,0 +1,63 @@
+"""Tables rendered from templates are the same as tables written piece by piece."""
+
+import io
+from collections.abc import Iterable, Mapping
+
+import pytest
+import yaml
+
+from survivalist_gamedata.common import expand_names, render_table
+from survivalist_gamedata.store import RecordTable
+
+pytestmark = pytest.mark.usefixtures('conf')
+
+COLS = {'NativeName': 'Name', 'Category': 'Type {0}', 'BasePrice': 'Price ($)'}
+
+ROWS = yaml.safe_load("""
+- {NativeName: Canteen, Category: 5:Food/Drink, BasePrice: 8 Fl Oz}
+- {NativeName: 'Axe {0} {name}', BasePrice: 12, Weight: '2'}
+- {Category: 2:Weapons/Melee, BasePrice: 1.5, NativeName: null}
+- {NativeName: "Sharp Object\\nBlunt Object", Category: 'Ünïcode \\ [b]'}
+- {}
+""")
+
+
+def concat_table(cols: dict[str, str], rows: Iterable[Mapping]) -> str:
+    """Render a table the way it was written before TableTemplate."""
+    markup_buff = io.StringIO()
+
+    # table start and header row
+    markup_buff.write('[table]\n')
+    markup_buff.write(' [tr]\n')
+    for val in cols.values():
+        markup_buff.write(f'  [th]{val}[/th]\n')
+    markup_buff.write(' [/tr]\n')
+
+    for row in rows:
+        markup_buff.write(' [tr]\n')
+        for col in cols:
+            val = expand_names(row.get(col, ''))
+            markup_buff.write(f'  [td]{val}[/td]\n')
+        markup_buff.write(' [/tr]\n')
+
+    markup_buff.write('[/table]\n\n')
+
+    return markup_buff.getvalue()
+
+
+@pytest.mark.parametrize('rows', [ROWS, ROWS[:1], []])
+def test_same_as_concatenation(rows: list[dict]) -> None:
+    assert render_table(COLS, rows) == concat_table(COLS, rows)
+
+
+def test_records_same_as_concatenation() -> None:
+    table = RecordTable(drop=['Weight'])
+    for row in ROWS:
+        table.append(row)
+    assert render_table(COLS, table) == concat_table(COLS, ROWS)
+
+
+def test_same_columns_with_other_headers() -> None:
+    other_cols = dict.fromkeys(COLS, 'Other')
+    render_table(COLS, ROWS)
+    assert render_table(other_cols, ROWS) == concat_table(other_cols, ROWS)
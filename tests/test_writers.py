@@ -0,0 +1,113 @@
+"""Writing the items and recipes to SQLite and Parquet."""
+
+import sqlite3
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+import pytest
+
+from survivalist_gamedata.items import LootLocation
+from survivalist_gamedata.recipes import Ingredient
+from survivalist_gamedata.store import RecordTable
+from survivalist_gamedata.writers import (
+    ParquetWriter,
+    SqliteWriter,
+    item_tables,
+    open_writers,
+    recipe_tables,
+)
+
+if TYPE_CHECKING:
+    from confuse.templates import AttrDict as Config  # type: ignore  # noqa: PGH003
+
+ITEM_FIELDS = ['Category', 'NativeName', 'Weight']
+
+
+def make_items() -> RecordTable:
+    items = RecordTable()
+    loot = (LootLocation('Forest', 'Common'), LootLocation('Cave', 'Rare'))
+    items.append({'Category': '2:Weapons', 'NativeName': 'Knife', 'LootList': loot})
+    items.append({'Category': '3:Food', 'NativeName': 'Apple', 'Weight': '0.2'})
+    return items
+
+
+def make_recipes() -> list[dict]:
+    rope = Ingredient(('Fiber', 'Grass'), 3.0, liquid=False)
+    water = Ingredient(('Water',), 0.5, liquid=True)
+    return [{
+        'UniqueID': 'r1',
+        'SkillType': 'Bushcraft',
+        'ProductPrototypeName': 'Rope',
+        'ProductAmount': '1',
+        'IngredientList': (rope, water),
+    }]
+
+
+def test_sqlite(conf: 'Config', tmp_path: Path) -> None:
+    conf.outputs.batch_size = 1
+    writer = SqliteWriter('1.0', conf)
+    assert not writer.is_written('items')
+
+    writer.write('items', item_tables(make_items(), ITEM_FIELDS))
+    writer.write('recipes', recipe_tables(make_recipes()))
+    assert writer.is_written('items')
+    assert writer.is_written('recipes')
+
+    con = sqlite3.connect(tmp_path / 'data/1.0/gamedata.sqlite')
+    try:
+        assert con.execute('SELECT * FROM items ORDER BY id').fetchall() == [
+            (1, '2:Weapons', 'Knife', None),
+            (2, '3:Food', 'Apple', '0.2'),
+        ]
+        assert con.execute('SELECT * FROM loot_locations').fetchall() == [
+            (1, 'Knife', 'Forest', 'Common'),
+            (1, 'Knife', 'Cave', 'Rare'),
+        ]
+        ingredients = con.execute('SELECT Slot, PrototypeName, Amount, Liquid '
+                                  'FROM ingredients').fetchall()
+        assert ingredients == [(1, 'Fiber', 3.0, 0), (1, 'Grass', 3.0, 0),
+                               (2, 'Water', 0.5, 1)]
+        indexes = {row[1] for row in con.execute('PRAGMA index_list(recipes)')}
+        assert indexes == {'recipes_SkillType', 'recipes_ProductPrototypeName'}
+    finally:
+        con.close()
+
+
+def test_sqlite_tables_are_replaced(conf: 'Config', tmp_path: Path) -> None:
+    writer = SqliteWriter('1.0', conf)
+    writer.write('items', item_tables(make_items(), ITEM_FIELDS))
+    writer.write('items', item_tables(make_items()[:1], ['NativeName']))
+
+    con = sqlite3.connect(tmp_path / 'data/1.0/gamedata.sqlite')
+    try:
+        assert con.execute('SELECT * FROM items').fetchall() == [(1, 'Knife')]
+    finally:
+        con.close()
+
+
+def test_parquet(conf: 'Config', tmp_path: Path) -> None:
+    pq = pytest.importorskip('pyarrow.parquet')
+    conf.outputs.batch_size = 1
+    writer = ParquetWriter('1.0', conf)
+    writer.write('items', item_tables(make_items(), ITEM_FIELDS))
+    assert writer.is_written('items')
+    assert not writer.is_written('recipes')
+
+    parquet_dir = tmp_path / 'data/1.0/parquet'
+    items = pq.read_table(parquet_dir / 'items.parquet')
+    assert items.num_rows == 2
+    assert items.to_pydict() == {
+        'id': [1, 2],
+        'Category': ['2:Weapons', '3:Food'],
+        'NativeName': ['Knife', 'Apple'],
+        'Weight': [None, '0.2'],
+    }
+    assert pq.ParquetFile(parquet_dir / 'items.parquet').num_row_groups == 2
+    loot = pq.read_table(parquet_dir / 'loot_locations.parquet').to_pydict()
+    assert loot['Location'] == ['Forest', 'Cave']
+
+
+def test_open_writers(conf: 'Config') -> None:
+    assert open_writers('1.0') == []
+    conf.outputs.formats = ['sqlite']
+    assert [writer.format for writer in open_writers('1.0')] == ['sqlite']
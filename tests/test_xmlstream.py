@@ -0,0 +1,59 @@
+"""Streamed elements have the same shape as the documents xmltodict parses."""
+
+from pathlib import Path
+
+import pytest
+import xmltodict
+
+from survivalist_gamedata.xmlstream import iter_elements
+
+RECIPES_XML = """<?xml version="1.0" encoding="utf-8"?>
+<RecipeList xmlns:xsi="http://www.w3.org/2001/XMLSchema-instance">
+  <Recipes>
+    <Recipe>
+      <UniqueID>stick</UniqueID>
+      <ProductPrototypeName>Stick</ProductPrototypeName>
+      <Ingredients><Ingredient>
+        <PrototypeNames><string>Wood</string></PrototypeNames><Amount>1</Amount>
+      </Ingredient></Ingredients>
+    </Recipe>
+    <Recipe Deprecated="true">
+      <UniqueID>rope</UniqueID>
+      <Description xml:lang="en">Twisted <b>tight</b> by hand</Description>
+      <Ingredients>
+        <Ingredient>
+          <PrototypeNames><string>Fiber</string><string>Grass</string></PrototypeNames>
+          <Amount>3</Amount>
+        </Ingredient>
+        <Ingredient xsi:nil="true" />
+        <Ingredient><PrototypeNames /><Amount>0.5</Amount></Ingredient>
+      </Ingredients>
+      <Tools />
+    </Recipe>
+  </Recipes>
+  <Other><Recipe><UniqueID>elsewhere</UniqueID></Recipe></Other>
+</RecipeList>
+"""
+
+SINGLE_RECIPE_XML = """<RecipeList><Recipes>
+  <Recipe><UniqueID>only</UniqueID><Ingredients /></Recipe>
+</Recipes></RecipeList>
+"""
+
+
+@pytest.mark.parametrize('text', [RECIPES_XML, SINGLE_RECIPE_XML])
+def test_same_as_xmltodict(tmp_path: Path, text: str) -> None:
+    xml_path = tmp_path / 'Recipes.xml'
+    xml_path.write_text(text)
+    expected = xmltodict.parse(text)['RecipeList']['Recipes']['Recipe']
+    if not isinstance(expected, list):
+        expected = [expected]
+
+    assert list(iter_elements(xml_path, ('RecipeList', 'Recipes', 'Recipe'))) == expected
+
+
+def test_only_elements_at_path(tmp_path: Path) -> None:
+    xml_path = tmp_path / 'Recipes.xml'
+    xml_path.write_text(RECIPES_XML)
+    elements = iter_elements(xml_path, ('RecipeList', 'Other', 'Recipe'))
+    assert list(elements) == [{'UniqueID': 'elsewhere'}]
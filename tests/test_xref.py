@@ -0,0 +1,166 @@
+"""Crafting trees and raw material costs from the cross-reference of recipes."""
+
+import sys
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+import pytest
+
+from survivalist_gamedata.recipes import Ingredient
+from survivalist_gamedata.xref import (
+    CraftingIndex,
+    CraftingTree,
+    _components,
+    load_crafting_index,
+)
+
+if TYPE_CHECKING:
+    from confuse.templates import AttrDict as Config  # type: ignore  # noqa: PGH003
+
+PRICES = {'Wood': '8', 'Fiber': '2', 'Grass': '1', 'Metal': '50', 'Bow': '500'}
+
+
+def items(prices: dict[str, str]) -> list[dict]:
+    return [{'NativeName': name, 'BasePrice': price} for name, price in prices.items()]
+
+
+def recipe(uid: str,
+           product: str,
+           *ingredients: tuple[tuple[str, ...], float],
+           amount: str = '1',
+           deprecated: str = 'false') -> dict:
+    ingrs = tuple(Ingredient(names, n, liquid=False) for names, n in ingredients)
+    return {
+        'UniqueID': uid,
+        'ProductPrototypeName': product,
+        'ProductAmount': amount,
+        'Deprecated': deprecated,
+        'IngredientList': ingrs,
+    }
+
+
+RECIPES = [
+    recipe('stick', 'Stick', (('Wood',), 1), amount='4'),
+    recipe('rope', 'Rope', (('Fiber', 'Grass'), 3)),
+    recipe('bow', 'Bow', (('Stick',), 2), (('Rope',), 1)),
+    recipe('metal bow', 'Bow', (('Metal',), 1)),
+    recipe('cheap bow', 'Bow', (('Grass',), 1), deprecated='true'),
+]
+
+
+@pytest.fixture
+def index() -> CraftingIndex:
+    return CraftingIndex(items(PRICES), RECIPES)
+
+
+def test_cost_uses_the_cheapest_recipe_and_ingredient(index: CraftingIndex) -> None:
+    assert index.raw_cost('Stick') == 2.0
+    assert index.raw_cost('Rope') == 3.0
+    assert index.raw_cost('Bow') == 7.0
+    assert index.raw_cost('Grass') == 1.0
+    assert index.raw_cost('Unknown') is None
+
+
+def test_deprecated_recipes_are_left_out(index: CraftingIndex) -> None:
+    assert 'cheap bow' not in index.recipes
+    assert [rec['UniqueID'] for rec in index.produced_by('Bow')] == ['bow', 'metal bow']
+    assert [rec['UniqueID'] for rec in index.used_in('Grass')] == ['rope']
+    assert index.used_in('Bow') == []
+
+
+def test_crafting_tree(index: CraftingIndex) -> None:
+    stick = CraftingTree('Stick', 'stick', 4.0, ((1, CraftingTree('Wood')),))
+    rope = CraftingTree('Rope', 'rope', 1.0, ((3, CraftingTree('Grass')),))
+    assert index.crafting_tree('Bow') == CraftingTree('Bow', 'bow', 1.0,
+                                                      ((2, stick), (1, rope)))
+    assert index.crafting_tree('Wood') == CraftingTree('Wood')
+
+
+def test_raw_materials(index: CraftingIndex) -> None:
+    assert index.raw_materials('Bow', 2) == {'Wood': 1.0, 'Grass': 6.0}
+
+
+def test_unknown_price_makes_the_cost_unknown() -> None:
+    index = CraftingIndex(items(PRICES),
+                          [*RECIPES, recipe('arrow', 'Arrow', (('Flint',), 1))])
+    assert index.raw_cost('Arrow') is None
+    assert index.crafting_tree('Arrow') == CraftingTree('Arrow', 'arrow', 1.0,
+                                                        ((1, CraftingTree('Flint')),))
+
+
+@pytest.mark.parametrize('order', [('A', 'B', 'C'), ('C', 'B', 'A')])
+def test_cycles_do_not_depend_on_the_query_order(order: tuple[str, ...]) -> None:
+    recipes = [
+        recipe('a', 'A', (('B',), 1)),
+        recipe('b', 'B', (('A',), 1)),
+        recipe('c', 'C', (('A',), 2)),
+    ]
+    index = CraftingIndex(items({'A': '100', 'B': '5'}), recipes)
+    costs = {name: index.raw_cost(name) for name in order}
+    assert costs == {'A': 100.0, 'B': 5.0, 'C': 200.0}
+    assert index.crafting_tree('A') == CraftingTree('A')
+    assert index.raw_materials('C') == {'A': 2.0}
+
+
+def test_components() -> None:
+    graph = {'a': ['b'], 'b': ['c', 'a'], 'c': ['d'], 'd': ['c'], 'e': ['a', 'x']}
+    component = _components(graph)
+    assert component['a'] == component['b']
+    assert component['c'] == component['d']
+    assert len({component[n] for n in 'abcde'}) == 3
+
+
+def test_components_of_a_long_chain() -> None:
+    n = sys.getrecursionlimit() * 2
+    graph = {str(i): [str(i + 1)] for i in range(n)}
+    graph[str(n)] = ['0']
+    component = _components(graph)
+    assert len(set(component.values())) == 1
+
+
+def test_long_chain_of_recipes() -> None:
+    n = sys.getrecursionlimit() * 2
+    recipes = [recipe(f'r{i}', f'P{i}', ((f'P{i + 1}',), 1)) for i in range(n)]
+    index = CraftingIndex(items({f'P{n}': '3'}), recipes)
+    assert index.raw_cost('P0') == 3.0
+    assert index.raw_materials('P0', 2) == {f'P{n}': 2.0}
+
+    tree = index.crafting_tree('P0')
+    depth = 0
+    while tree.ingredients:
+        ((_, tree),) = tree.ingredients
+        depth += 1
+    assert (tree.name, depth) == (f'P{n}', n)
+
+
+RECIPES_XML = """<?xml version="1.0" encoding="utf-8"?>
+<RecipeList><Recipes><Recipe>
+  <UniqueID>stick</UniqueID><SkillType>Bushcraft</SkillType>
+  <ProductPrototypeName>Stick</ProductPrototypeName><ProductAmount>4</ProductAmount>
+  <Ingredients><Ingredient>
+    <PrototypeNames><string>Wood</string></PrototypeNames><Amount>1</Amount>
+  </Ingredient></Ingredients>
+</Recipe></Recipes></RecipeList>
+"""
+
+
+def test_load_crafting_index(conf: 'Config', tmp_path: Path) -> None:
+    game_dir = tmp_path / 'game' / 'BaseStory'
+    (game_dir / 'Equipment').mkdir(parents=True)
+    (game_dir / 'Equipment' / 'Wood.xml').write_text(
+        '<EquipmentPrototype><NativeName>Wood</NativeName>'
+        '<Category>6:Crafting</Category><BasePrice>8</BasePrice></EquipmentPrototype>')
+    (game_dir / 'Recipes.xml').write_text(RECIPES_XML)
+    conf.base_dir = tmp_path / 'game'
+    conf.gamedata_dirs = ['BaseStory']
+    conf.parse_cache.keep_versions = 1
+    other_cache = Path('data/0.9/cache/items.pickle')
+    other_cache.parent.mkdir(parents=True)
+    other_cache.write_bytes(b'')
+
+    index = load_crafting_index('1.0')
+    assert index.raw_cost('Stick') == 2.0
+    # a query keeps the caches of other versions, and saves its own
+    assert other_cache.exists()
+    assert Path('data/1.0/cache/items.pickle').exists()
+    assert Path('data/1.0/cache/recipes.pickle').exists()